@@ -0,0 +1,343 @@
+"""Adaptive concurrency limits and circuit breaking per upstream origin.
+
+When the CPI tenant or an S/4HANA system slows down, every tool call keeps
+opening another request until they all sit in the 30 s timeout, and the queue
+that builds up in front of the pool makes every caller slower. Admission is a
+transport layer right above the connection pool (PoolRegistry installs it
+below single-flight, so coalesced requests take one slot) that keeps one
+controller per origin:
+
+* an adaptive concurrency limit, gradient style: a short-term average of the
+  request time is compared with a long-term one; while they agree the limit
+  grows by about its square root per adjustment (only while the limit is
+  actually used), when the short-term time rises above ADMISSION_TOLERANCE
+  times the long-term one the limit shrinks with the ratio, and timeouts,
+  connection errors, 429 and 502-504 cut it by a tenth. A request holds its
+  slot until its response body is read or closed;
+* a bounded FIFO wait queue: a request over the limit waits at most
+  ADMISSION_QUEUE_TIMEOUT for a slot, and is rejected at once when
+  ADMISSION_QUEUE requests are already waiting;
+* a circuit breaker: when at least ADMISSION_BREAKER_RATIO of the last
+  ADMISSION_BREAKER_WINDOW requests failed (connection errors, timeouts,
+  502-504), the circuit opens and requests are rejected at once for
+  ADMISSION_BREAKER_COOLDOWN seconds; then a single probe request goes
+  through, and its outcome closes the circuit or opens it again.
+
+Rejected requests raise UpstreamOverloaded, an httpx.TransportError, so tools
+report it like any other request error ("Request error: upstream ... is
+overloaded ...") without waiting for a timeout. Limits, in-flight and queued
+requests, breaker state and counters are in upstream_pools.stats() and on
+/metrics.
+
+Tuning via environment:
+    UPSTREAM_ADMISSION             "false" to send every request without limits
+    ADMISSION_INITIAL_LIMIT        starting concurrency limit per origin (default 20)
+    ADMISSION_MIN_LIMIT            lowest limit (default 2)
+    ADMISSION_MAX_LIMIT            highest limit (default UPSTREAM_MAX_CONNECTIONS or 50)
+    ADMISSION_TOLERANCE            short/long-term request time ratio tolerated
+                                   before the limit shrinks (default 2.0)
+    ADMISSION_QUEUE                requests that may wait for a slot (default 100)
+    ADMISSION_QUEUE_TIMEOUT        seconds a request waits for a slot (default 5)
+    ADMISSION_BREAKER_WINDOW       outcomes the breaker looks at (default 20)
+    ADMISSION_BREAKER_RATIO        failure share that opens the circuit (default 0.5)
+    ADMISSION_BREAKER_COOLDOWN     seconds the circuit stays open (default 10)
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator
+
+import httpx
+from fastmcp.utilities.logging import get_logger
+
+logger = get_logger(__name__)
+
+ADMISSION_INITIAL_LIMIT = float(os.getenv("ADMISSION_INITIAL_LIMIT", "20"))
+ADMISSION_MIN_LIMIT = float(os.getenv("ADMISSION_MIN_LIMIT", "2"))
+ADMISSION_MAX_LIMIT = float(os.getenv("ADMISSION_MAX_LIMIT", os.getenv("UPSTREAM_MAX_CONNECTIONS", "50")))
+ADMISSION_TOLERANCE = float(os.getenv("ADMISSION_TOLERANCE", "2.0"))
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "100"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+ADMISSION_BREAKER_WINDOW = int(os.getenv("ADMISSION_BREAKER_WINDOW", "20"))
+ADMISSION_BREAKER_RATIO = float(os.getenv("ADMISSION_BREAKER_RATIO", "0.5"))
+ADMISSION_BREAKER_COOLDOWN = float(os.getenv("ADMISSION_BREAKER_COOLDOWN", "10"))
+
+# Statuses that say the upstream is overloaded or down, not that the request was wrong
+OVERLOAD_STATUSES = (429, 502, 503, 504)
+FAILURE_STATUSES = (502, 503, 504)
+BREAKER_STATES = ("closed", "open", "half_open")
+
+# Weight of a new request time in the short- and long-term averages
+_SHORT_WEIGHT = 0.2
+_LONG_WEIGHT = 0.01
+# Share of the computed limit taken per adjustment
+_SMOOTHING = 0.2
+_BACKOFF = 0.9
+
+
+class UpstreamOverloaded(httpx.TransportError):
+    """A request was not sent because its upstream is overloaded or its circuit is open."""
+
+
+def origin_of(request: httpx.Request) -> str:
+    url = request.url
+    return f"{url.scheme}://{url.netloc.decode()}"
+
+
+class AdmissionController:
+    """Concurrency limit, wait queue and circuit breaker of one upstream origin."""
+
+    def __init__(self, origin: str, control: "AdmissionControl"):
+        self.origin = origin
+        self.control = control
+        self.limit = control.initial_limit
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._short: float | None = None
+        self._long: float | None = None
+        self._outcomes: deque[bool] = deque(maxlen=control.breaker_window)
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self.counters = {"admitted": 0, "waited": 0, "rejected": 0, "queue_timeouts": 0,
+                         "failures": 0, "breaker_opened": 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _reject(self, reason: str) -> UpstreamOverloaded:
+        self.counters["rejected"] += 1
+        return UpstreamOverloaded(f"upstream {self.origin} is overloaded: {reason}; try again later")
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; True if the request is the half-open probe."""
+        if self.state != "closed":
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.control.breaker_cooldown:
+                self.state = "half_open"
+            if self.state == "open" or self._probing:
+                retry = max(0.0, self.control.breaker_cooldown - (time.monotonic() - self._opened_at))
+                raise self._reject(f"circuit open after repeated failures, retrying in {retry:.0f}s")
+            self._probing = True
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return True
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return False
+        if len(self._waiters) >= self.control.queue_size:
+            raise self._reject(f"{len(self._waiters)} requests already waiting for {int(self.limit)} slots")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.counters["waited"] += 1
+        try:
+            await asyncio.wait_for(waiter, self.control.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release_slot()  # handed a slot just as the wait ended
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.counters["queue_timeouts"] += 1
+                raise self._reject(f"no slot free within {self.control.queue_timeout:g}s") from None
+            raise
+        self.counters["admitted"] += 1
+        return False
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1  # the slot passes straight to the waiter
+                waiter.set_result(None)
+
+    def release(self, probe: bool, elapsed: float | None, failed: bool, overloaded: bool) -> None:
+        """Return a slot with the outcome of its request (elapsed None: cancelled, no sample)."""
+        in_use = self.in_flight
+        self.in_flight -= 1
+        if probe:
+            self._probing = False
+        if elapsed is not None:
+            self._record(probe, failed)
+            if overloaded:
+                self.limit = max(self.control.min_limit, self.limit * _BACKOFF)
+            else:
+                self._sample(elapsed, in_use)
+        elif probe and self.state == "half_open":
+            self._open()  # the probe never finished; wait another cooldown
+        self._wake()
+
+    def _sample(self, elapsed: float, in_use: int) -> None:
+        if self._short is None:
+            self._short = self._long = elapsed
+            return
+        self._short += _SHORT_WEIGHT * (elapsed - self._short)
+        self._long += _LONG_WEIGHT * (elapsed - self._long)
+        if self._long > 2 * self._short:
+            self._long *= 0.95  # latency improved for good; let the baseline follow faster
+        gradient = max(0.5, min(1.0, self.control.tolerance * self._long / self._short))
+        if gradient >= 1.0 and in_use < self.limit / 2:
+            return  # the limit is not what holds requests back; do not grow it on idle samples
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - _SMOOTHING) + target * _SMOOTHING
+        self.limit = max(self.control.min_limit, min(self.control.max_limit, limit))
+
+    def _record(self, probe: bool, failed: bool) -> None:
+        if failed:
+            self.counters["failures"] += 1
+        if probe:
+            if failed:
+                self._open()
+            else:
+                self.state = "closed"
+                self._outcomes.clear()
+                logger.info(f"Upstream {self.origin} recovered; circuit closed")
+            return
+        self._outcomes.append(failed)
+        window = self._outcomes
+        if (self.state == "closed" and len(window) == window.maxlen
+                and sum(window) >= self.control.breaker_ratio * len(window)):
+            self._open()
+
+    def _open(self) -> None:
+        if self.state != "open":
+            self.counters["breaker_opened"] += 1
+            logger.warning(f"Upstream {self.origin} keeps failing; circuit open for "
+                           f"{self.control.breaker_cooldown:g}s")
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(self._reject("circuit opened while waiting"))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "origin": self.origin,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "state": self.state,
+            "short_rtt": round(self._short, 4) if self._short is not None else None,
+            "long_rtt": round(self._long, 4) if self._long is not None else None,
+            **self.counters,
+        }
+
+
+class _AdmittedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, slot: "_Slot"):
+        self._stream = stream
+        self._slot = slot
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except httpx.TransportError:
+            self._slot.finish(failed=True)
+            raise
+        self._slot.finish(failed=False)
+
+    async def aclose(self) -> None:
+        self._slot.finish(failed=False, cancelled=True)
+        await self._stream.aclose()
+
+
+class _Slot:
+    def __init__(self, controller: AdmissionController, probe: bool, overloaded: bool):
+        self.controller = controller
+        self.probe = probe
+        self.overloaded = overloaded
+        self.started = time.perf_counter()
+        self.open = True
+
+    def finish(self, failed: bool, cancelled: bool = False) -> None:
+        if self.open:
+            self.open = False
+            elapsed = None if cancelled else time.perf_counter() - self.started
+            self.controller.release(self.probe, elapsed, failed, self.overloaded or failed)
+
+
+class AdmissionControl:
+    """One AdmissionController per upstream origin, applied as a transport layer."""
+
+    def __init__(
+        self,
+        initial_limit: float = ADMISSION_INITIAL_LIMIT,
+        min_limit: float = ADMISSION_MIN_LIMIT,
+        max_limit: float = ADMISSION_MAX_LIMIT,
+        tolerance: float = ADMISSION_TOLERANCE,
+        queue_size: int = ADMISSION_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        breaker_window: int = ADMISSION_BREAKER_WINDOW,
+        breaker_ratio: float = ADMISSION_BREAKER_RATIO,
+        breaker_cooldown: float = ADMISSION_BREAKER_COOLDOWN,
+    ):
+        self.initial_limit = max(min_limit, min(max_limit, initial_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.breaker_window = breaker_window
+        self.breaker_ratio = breaker_ratio
+        self.breaker_cooldown = breaker_cooldown
+        self._controllers: dict[str, AdmissionController] = {}
+
+    def layer(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """pools.TransportLayer admitting requests sent through transport."""
+        return _AdmissionTransport(self, transport)
+
+    def controller(self, origin: str) -> AdmissionController:
+        controller = self._controllers.get(origin)
+        if controller is None:
+            controller = self._controllers[origin] = AdmissionController(origin, self)
+        return controller
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [controller.stats() for controller in self._controllers.values()]
+
+    def reset(self) -> None:
+        """Forget every controller (their waiters belong to another process after a fork)."""
+        self._controllers.clear()
+
+
+class _AdmissionTransport(httpx.AsyncBaseTransport):
+    def __init__(self, control: AdmissionControl, transport: httpx.AsyncBaseTransport):
+        self.control = control
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        controller = self.control.controller(origin_of(request))
+        probe = await controller.acquire()
+        slot = _Slot(controller, probe, overloaded=False)
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError:
+            slot.finish(failed=True)
+            raise
+        except BaseException:
+            slot.finish(failed=False, cancelled=True)
+            raise
+        status = response.status_code
+        slot.overloaded = status in OVERLOAD_STATUSES
+        if status in FAILURE_STATUSES:
+            slot.finish(failed=True)
+        elif response.is_stream_consumed:
+            slot.finish(failed=False)
+        else:
+            response.stream = _AdmittedStream(response.stream, slot)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,144 @@
+"""Synthetic OData v2 responses shaped like the SAP services behind our specs.
+
+The payloads follow the entity types in the OpenAPI specs and what Gateway
+actually sends for them: every entity carries a __metadata block, navigation
+properties come back as __deferred stubs, and most of the wide S/4HANA entity
+types leave the majority of their fields as "" or null.
+"""
+
+import json
+import random
+from typing import Any
+
+SERVICE_ROOT = "https://s4hana.example.com/sap/opu/odata/sap"
+
+
+def _ref_name(schema: dict[str, Any]) -> str | None:
+    ref = schema.get("$ref")
+    if ref is None and schema.get("allOf"):
+        ref = schema["allOf"][0].get("$ref")
+    return ref.rsplit("/", 1)[1] if ref else None
+
+
+def collection_entity_types(spec: dict[str, Any]) -> dict[str, str]:
+    """entity set path -> entity type schema name, for every GET collection in spec."""
+    types = {}
+    for path, methods in spec.get("paths", {}).items():
+        try:
+            schema = methods["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+            items = schema["properties"]["d"]["properties"]["results"]["items"]
+        except (KeyError, TypeError):
+            continue
+        name = _ref_name(items)
+        if name:
+            types[path] = name
+    return types
+
+
+def _value(prop: dict[str, Any], rng: random.Random) -> Any:
+    kind = prop.get("type")
+    if prop.get("nullable") and rng.random() < 0.15:
+        return None
+    if kind == "boolean":
+        return rng.random() < 0.3
+    if kind == "integer":
+        return rng.randrange(0, 1000)
+    if kind == "number":
+        return round(rng.uniform(0, 10000), 2)
+    example = str(prop.get("example", ""))
+    if example.startswith("/Date("):
+        ms = rng.randrange(18000, 20500) * 86_400_000
+        if not example.endswith("00000)/"):  # timestamp rather than a plain date
+            ms += rng.randrange(86_400) * 1000
+        return f"/Date({ms})/"
+    if prop.get("format") == "decimal":
+        return f"{rng.uniform(0, 10000):.3f}"
+    if prop.get("nullable") and rng.random() < 0.55:
+        return ""  # Gateway sends unset CHAR fields as empty strings
+    length = min(int(prop.get("maxLength", 12)), 20)
+    return "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(max(1, length)))
+
+
+def sample_entity(spec: dict[str, Any], type_name: str, uri: str, rng: random.Random) -> dict[str, Any]:
+    schema = spec["components"]["schemas"][type_name]
+    entity: dict[str, Any] = {"__metadata": {"id": uri, "uri": uri, "type": type_name.removesuffix("Type")}}
+    for name, prop in schema.get("properties", {}).items():
+        if "results" in prop.get("properties", {}) or _ref_name(prop):
+            entity[name] = {"__deferred": {"uri": f"{uri}/{name}"}}
+        else:
+            entity[name] = _value(prop, rng)
+    return entity
+
+
+def sample_properties(spec: dict[str, Any], type_name: str, rng: random.Random) -> dict[str, Any]:
+    """The structural properties of an entity, as an OData v4 service sends them."""
+    schema = spec["components"]["schemas"][type_name]
+    return {
+        name: _value(prop, rng)
+        for name, prop in schema.get("properties", {}).items()
+        if not ("results" in prop.get("properties", {}) or _ref_name(prop) or prop.get("type") == "array")
+    }
+
+
+def _service(spec: dict[str, Any]) -> str:
+    return spec.get("servers", [{}])[0].get("url", "").rstrip("/").rsplit("/", 1)[-1] or "SERVICE_SRV"
+
+
+def _response_schema(spec: dict[str, Any], path: str) -> dict[str, Any]:
+    try:
+        return spec["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    except (KeyError, TypeError):
+        return {}
+
+
+def sample_collection(spec: dict[str, Any], path: str, rows: int, seed: int = 0,
+                      next_link: str | None = None) -> dict[str, Any]:
+    """A raw OData v2 collection response for the GET collection at path."""
+    rng = random.Random(seed)
+    type_name = collection_entity_types(spec)[path]
+    service = _service(spec)
+    entity_set = path.strip("/")
+    results = [
+        sample_entity(spec, type_name, f"{SERVICE_ROOT}/{service}/{entity_set}('{seed * rows + i}')", rng)
+        for i in range(rows)
+    ]
+    body: dict[str, Any] = {"results": results}
+    if next_link:
+        body["__next"] = next_link
+    return {"d": body}
+
+
+def sample_response(spec: dict[str, Any], path: str, rows: int, seed: int = 0,
+                    next_link: str | None = None) -> dict[str, Any]:
+    """A GET response for path (a spec path template) in the shape the spec describes.
+
+    OData v2 collections and entities come as Gateway sends them (d/results,
+    d), OData v4 ones as {"value": [...]} and a plain entity. A response the
+    spec leaves untyped gets a v2 collection of generic text columns.
+    """
+    if path in collection_entity_types(spec):
+        return sample_collection(spec, path, rows, seed, next_link)
+    rng = random.Random(seed)
+    schema = _response_schema(spec, path)
+    properties = schema.get("properties", {})
+    if _ref_name(properties.get("d", {})):
+        uri = f"{SERVICE_ROOT}/{_service(spec)}{path}"
+        return {"d": sample_entity(spec, _ref_name(properties["d"]), uri, rng)}
+    if _ref_name(properties.get("value", {}).get("items", {})):
+        type_name = _ref_name(properties["value"]["items"])
+        body: dict[str, Any] = {"value": [sample_properties(spec, type_name, rng) for _ in range(rows)]}
+        if next_link:
+            body["@odata.nextLink"] = next_link
+        return body
+    if _ref_name(schema):
+        return sample_properties(spec, _ref_name(schema), rng)
+    results = [{f"Field{column:02d}": _value({"maxLength": 12}, rng) for column in range(12)} for _ in range(rows)]
+    generic: dict[str, Any] = {"results": results}
+    if next_link:
+        generic["__next"] = next_link
+    return {"d": generic}
+
+
+def load_spec(path: str) -> dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,124 @@
+"""Helpers shared by the benchmark scripts."""
+
+import multiprocessing
+import os
+import socket
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve_in_thread(app, port: int):
+    """Run an ASGI app with uvicorn on 127.0.0.1:port in a background thread."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _run_factory(factory, port, kwargs):
+    uvicorn.run(factory(**kwargs), host="127.0.0.1", port=port, log_level="warning")
+
+
+@contextmanager
+def serve_in_process(factory, port: int, **kwargs):
+    """Run factory(**kwargs) as an ASGI app in a child process.
+
+    Keeps the stand-in's CPU time out of the process being measured.
+    """
+    process = multiprocessing.Process(target=_run_factory, args=(factory, port, kwargs), daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            httpx.get(url, timeout=1)
+            break
+        except httpx.TransportError:
+            if time.monotonic() > deadline or not process.is_alive():
+                process.terminate()
+                raise RuntimeError(f"stand-in on port {port} did not start")
+            time.sleep(0.05)
+    try:
+        yield url
+    finally:
+        process.terminate()
+        process.join()
+
+
+def process_tree(pid: int) -> list[int]:
+    """pid and all its descendants (Linux; just [pid] elsewhere)."""
+    pids = [pid]
+    for parent in pids:
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def process_usage(pid: int) -> dict:
+    """CPU seconds and memory of pid and its descendants, summed (Linux only).
+
+    peak_rss_mb adds up each process's own high-water mark; pss_mb splits the
+    pages that pre-forked workers share with their parent between them.
+    """
+    ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    cpu, kb = 0.0, {"VmRSS": 0, "VmHWM": 0, "Pss": 0}
+    pids = process_tree(pid)
+    for process in pids:
+        try:
+            with open(f"/proc/{process}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks  # utime, stime
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in kb:
+                        kb[key] += int(value.split()[0])
+            with open(f"/proc/{process}/smaps_rollup") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key == "Pss":
+                        kb["Pss"] += int(value.split()[0])
+        except OSError:
+            continue
+    return {
+        "processes": len(pids),
+        "cpu_s": round(cpu, 2),
+        "rss_mb": round(kb["VmRSS"] / 1024, 1),
+        "peak_rss_mb": round(kb["VmHWM"] / 1024, 1),
+        "pss_mb": round(kb["Pss"] / 1024, 1),
+    }
+
+
+def summarize(latencies: list[float], wall: float) -> dict:
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]  # noqa: E731
+    return {
+        "calls": len(ordered),
+        "wall_s": round(wall, 3),
+        "rps": round(len(ordered) / wall, 1) if wall else None,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p95_ms": round(pick(0.95) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+    }
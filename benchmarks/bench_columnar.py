@@ -0,0 +1,112 @@
+"""Payload size and serialization time of the collection formats (columnar.py).
+
+For every collection response it reports, per format, the bytes an MCP client
+receives (the JSON of the structured result for "rows" and "columns", the text
+for "csv" and "markdown"; a rough token estimate at 4 bytes per token) and the
+time to render the compact result in that format and serialize it as the tool
+result does. "columns_plain" is "columns" without dictionary encoding.
+
+Responses come from --cassette (recorded upstream traffic, see cassette.py;
+every successful JSON collection read in it), from --recordings (a directory of
+raw OData JSON bodies) or, without either, are synthesized from the specs.
+
+    python -m benchmarks.bench_columnar --rows 200
+    python -m benchmarks.bench_columnar --cassette cassettes/upstream.jsonl.gz
+"""
+
+import argparse
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from pydantic_core import to_json
+
+import columnar
+from benchmarks._odata import collection_entity_types, load_spec, sample_collection
+from benchmarks.bench_compaction import DEFAULT_SPECS, best_of
+from odata import collection_of, compact_loads
+
+FORMATS = ("rows", "columns", "columns_plain", "csv", "markdown")
+
+
+def serialize(body: dict[str, Any], format: str) -> bytes:
+    if format == "columns_plain":
+        rest = {key: value for key, value in body.items() if key != "results"}
+        return to_json({**columnar.to_columns(body["results"], dictionary=False), **rest})
+    rendered = columnar.render(body, format)
+    return rendered.encode() if isinstance(rendered, str) else to_json(rendered)
+
+
+def measure(name: str, body: bytes, repeat: int) -> dict[str, Any] | None:
+    compact = collection_of(compact_loads(body))
+    if compact is None or len(compact["results"]) < 2:
+        return None
+    row: dict[str, Any] = {"response": name, "row_count": len(compact["results"])}
+    baseline = len(serialize(compact, "rows"))
+    for format in FORMATS:
+        size = len(serialize(compact, format))
+        row[format] = {
+            "bytes": size,
+            "approx_tokens": size // 4,
+            "vs_rows": round(size / baseline, 3),
+            "serialize_ms": round(best_of(lambda: serialize(compact, format), repeat), 3),
+        }
+    return row
+
+
+def from_cassette(path: str) -> list[tuple[str, bytes]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    bodies = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            interaction = json.loads(line)
+            if interaction.get("method") == "GET" and interaction.get("status") == 200 and "body" in interaction:
+                bodies.append((interaction["url"], interaction["body"].encode()))
+    return bodies
+
+
+def responses(args) -> list[tuple[str, bytes]]:
+    if args.cassette:
+        return from_cassette(args.cassette)
+    if args.recordings:
+        return [(path.name, path.read_bytes()) for path in sorted(Path(args.recordings).glob("*.json"))]
+    bodies = []
+    for spec_path in args.specs:
+        spec = load_spec(spec_path)
+        for path in list(collection_entity_types(spec))[: args.per_spec]:
+            payload = sample_collection(spec, path, args.rows)
+            bodies.append((f"{Path(spec_path).stem}{path}", json.dumps(payload).encode()))
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", help="cassette of recorded upstream traffic")
+    parser.add_argument("--recordings", help="directory of recorded raw OData JSON responses")
+    parser.add_argument("--specs", nargs="*", default=DEFAULT_SPECS)
+    parser.add_argument("--per-spec", type=int, default=3, help="entity sets sampled per spec")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = [row for name, body in responses(args) if (row := measure(name, body, args.repeat)) is not None]
+    total = {format: sum(row[format]["bytes"] for row in rows) for format in FORMATS}
+    print(json.dumps({
+        "responses": rows,
+        "total": {
+            format: {
+                "bytes": size,
+                "vs_rows": round(size / total["rows"], 3) if total["rows"] else None,
+                "serialize_ms": round(sum(row[format]["serialize_ms"] for row in rows), 3),
+            }
+            for format, size in total.items()
+        },
+        "elapsed_s": round(time.perf_counter() - started, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
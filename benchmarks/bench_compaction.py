@@ -0,0 +1,122 @@
+"""Payload size and parse cost of raw vs compacted OData responses.
+
+For every response it reports the bytes an MCP client would receive in raw and
+compact output mode (and a rough token estimate at 4 bytes per token), plus the
+time to parse the raw body, to compact it in one pass (odata.compact_loads) and
+to parse first and compact the resulting tree afterwards.
+
+Responses are read from --recordings (a directory of raw OData JSON bodies, e.g.
+saved with curl from the real services); without it, responses shaped like the
+SAP services are synthesized from the specs.
+
+    python -m benchmarks.bench_compaction --rows 100
+    python -m benchmarks.bench_compaction --recordings recordings/ --convert-dates
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks._odata import collection_entity_types, load_spec, sample_collection
+from odata import compact_loads, sap_date
+
+DEFAULT_SPECS = [
+    "specs/API_SALES_ORDER_SRV.json",
+    "specs/API_PLANNED_ORDERS.json",
+    "specs/API_MATERIAL_STOCK_SRV.json",
+    "specs/payrol_converted.json",
+]
+
+
+def compact_tree(value: Any, convert_dates: bool) -> Any:
+    """The same transformation as compact_loads, applied to an already parsed tree."""
+    if isinstance(value, list):
+        return [compact_tree(item, convert_dates) for item in value]
+    if not isinstance(value, dict):
+        if convert_dates and isinstance(value, str) and value.startswith("/Date("):
+            return sap_date(value)
+        return value
+    if "__deferred" in value:
+        return None
+    out = {}
+    for key, item in value.items():
+        if key == "__metadata":
+            continue
+        item = compact_tree(item, convert_dates)
+        if item is None or item == "" or item == [] or item == {}:
+            if key not in ("d", "results"):
+                continue
+        out[key] = item
+    if len(out) == 1 and isinstance(out.get("results"), list):
+        return out["results"]
+    return out
+
+
+def wire_size(payload: Any) -> int:
+    return len(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode())
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def measure(name: str, body: bytes, convert_dates: bool, repeat: int) -> dict[str, Any]:
+    raw = json.loads(body)
+    compact = compact_loads(body, convert_dates)
+    raw_bytes, compact_bytes = wire_size(raw), wire_size(compact)
+    return {
+        "response": name,
+        "raw_bytes": raw_bytes,
+        "compact_bytes": compact_bytes,
+        "reduction": round(1 - compact_bytes / raw_bytes, 3),
+        "approx_tokens_saved": (raw_bytes - compact_bytes) // 4,
+        "parse_ms": round(best_of(lambda: json.loads(body), repeat), 2),
+        "compact_single_pass_ms": round(best_of(lambda: compact_loads(body, convert_dates), repeat), 2),
+        "compact_two_pass_ms": round(best_of(lambda: compact_tree(json.loads(body), convert_dates), repeat), 2),
+    }
+
+
+def responses(args) -> list[tuple[str, bytes]]:
+    if args.recordings:
+        return [(path.name, path.read_bytes()) for path in sorted(Path(args.recordings).glob("*.json"))]
+    bodies = []
+    for spec_path in args.specs:
+        spec = load_spec(spec_path)
+        for path in list(collection_entity_types(spec))[: args.per_spec]:
+            payload = sample_collection(spec, path, args.rows)
+            bodies.append((f"{Path(spec_path).stem}{path}", json.dumps(payload).encode()))
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", help="directory of recorded raw OData JSON responses")
+    parser.add_argument("--specs", nargs="*", default=DEFAULT_SPECS)
+    parser.add_argument("--per-spec", type=int, default=3, help="entity sets sampled per spec")
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--convert-dates", action="store_true")
+    args = parser.parse_args()
+
+    rows = [measure(name, body, args.convert_dates, args.repeat) for name, body in responses(args)]
+    raw_total = sum(row["raw_bytes"] for row in rows)
+    compact_total = sum(row["compact_bytes"] for row in rows)
+    print(json.dumps({
+        "responses": rows,
+        "total": {
+            "raw_bytes": raw_total,
+            "compact_bytes": compact_total,
+            "reduction": round(1 - compact_total / raw_total, 3) if raw_total else None,
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Memory and startup of the combined endpoint: import_server triple build vs CompositeGateway.
+
+"triple" is how mount_dd_mcp and dd_server used to build it: one http_app per
+backend, a third server that import_server-s copies of every backend's tools,
+its own http_app, and the three lifespans entered one after another.
+"composite" is composite.CompositeGateway. Both serve the same endpoints.
+
+Reported per mode: time to build the servers and apps, time until every
+lifespan has started, memory still allocated once started (tracemalloc) and
+the number of Tool objects alive. --backend-startup-ms gives every backend
+server a lifespan that takes that long (e.g. warming pools or fetching CSRF
+tokens), to show sequential vs parallel startup.
+
+    python -m benchmarks.bench_composite
+    python -m benchmarks.bench_composite --backend-startup-ms 200 \\
+        --backend purchase=specs/mini_purchase_req.json --backend sales=specs/API_SALES_ORDER_SRV_reduced.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import httpx
+from fastmcp import FastMCP
+from fastmcp.tools import Tool
+
+from catalog import build_openapi_mcp
+from composite import CompositeGateway
+from odata import ODataTool
+
+DEFAULT_BACKENDS = ["tools1=specs/simplified_payroll.json", "tools2=specs/odata_h2b.json"]
+
+
+def build_backends(backends: dict[str, str], startup_ms: int) -> dict[str, FastMCP]:
+    @asynccontextmanager
+    async def slow_lifespan(_):
+        await asyncio.sleep(startup_ms / 1000)
+        yield
+
+    servers = {}
+    for prefix, spec in backends.items():
+        client = httpx.AsyncClient(base_url=f"https://{prefix}.example.com/")
+        servers[prefix] = build_openapi_mcp(
+            spec, client=client, tool_factory=ODataTool, name=prefix,
+            stateless_http=True, json_response=True, lifespan=slow_lifespan,
+        )
+    return servers
+
+
+async def triple(backends: dict[str, str], startup_ms: int):
+    servers = build_backends(backends, startup_ms)
+    apps = [server.http_app(path="/mcp") for server in servers.values()]
+    combined = FastMCP(name="combined")
+    for prefix, server in servers.items():
+        await combined.import_server(server, prefix=prefix)
+    apps.append(combined.http_app(path="/mcp"))
+
+    @asynccontextmanager
+    async def lifespan():
+        async with AsyncExitStack() as stack:
+            for app in apps:
+                await stack.enter_async_context(app.router.lifespan_context(app))
+            yield
+
+    return apps, lifespan()
+
+
+async def composite(backends: dict[str, str], startup_ms: int):
+    gateway = CompositeGateway(build_backends(backends, startup_ms))
+    return gateway.apps, gateway.lifespan()
+
+
+async def measure(mode, backends: dict[str, str], startup_ms: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    apps, lifespan = await mode(backends, startup_ms)
+    built = time.perf_counter()
+    async with lifespan:
+        running = time.perf_counter()
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        tools = sum(1 for obj in gc.get_objects() if isinstance(obj, Tool))
+    tracemalloc.stop()
+    return {
+        "mode": mode.__name__,
+        "apps": len(apps),
+        "build_ms": round((built - started) * 1000, 1),
+        "startup_ms": round((running - built) * 1000, 1),
+        "retained_mb": round(retained / 2**20, 2),
+        "tool_objects": tools,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", action="append", help="prefix=spec (repeatable)")
+    parser.add_argument("--backend-startup-ms", type=int, default=0)
+    args = parser.parse_args()
+    backends = dict(item.split("=", 1) for item in (args.backend or DEFAULT_BACKENDS))
+
+    build_backends(backends, 0)  # compile the catalogs, so neither mode pays for it
+    rows = [asyncio.run(measure(mode, backends, args.backend_startup_ms)) for mode in (triple, composite)]
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""CPU and memory per tool call for multi-megabyte responses, by output mode.
+
+Starts the stand-in of bench_workers with --rows wide A_SalesOrder entities per
+response (several MB of JSON), then runs gateway.py against it once per mode
+with ODATA_OUTPUT/ODATA_JSON set and result paging off, and sends --calls
+tools/call requests, --concurrency at a time. Per mode it reports the gateway's
+CPU milliseconds per call, its peak RSS, the latency and the size of the tool
+response the client receives:
+
+* compact: parsed and compacted (the default);
+* raw: parsed and serialized again unchanged;
+* raw_orjson: the same, parsed with orjson (ODATA_JSON=orjson);
+* passthrough: the upstream body streamed into the result as text.
+
+The stand-in runs in its own process, so its CPU is not counted.
+
+    python -m benchmarks.bench_passthrough --rows 5000 --calls 20
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import signal
+import time
+
+import httpx
+
+from benchmarks._server import free_port, process_usage, serve_in_process, summarize
+from benchmarks.bench_workers import TOOL, gateway_config, make_standin, start_gateway
+
+MODES = {
+    "compact": {"ODATA_OUTPUT": "compact"},
+    "raw": {"ODATA_OUTPUT": "raw"},
+    "raw_orjson": {"ODATA_OUTPUT": "raw", "ODATA_JSON": "orjson"},
+    "passthrough": {"ODATA_OUTPUT": "passthrough"},
+}
+
+
+async def call(url: str, calls: int, concurrency: int) -> tuple[list[float], int, float]:
+    """Latencies, bytes of the last response and wall time of calls tools/call requests."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies, size = [], 0
+    headers = {"Accept": "application/json, text/event-stream"}
+    async with httpx.AsyncClient(headers=headers, timeout=120) as client:
+        async def one(i):
+            nonlocal size
+            payload = {"jsonrpc": "2.0", "id": i, "method": "tools/call",
+                       "params": {"name": TOOL, "arguments": {}}}
+            async with gate:
+                started = time.perf_counter()
+                response = await client.post(url, json=payload)
+                response.raise_for_status()
+                if "error" in response.json() or response.json()["result"].get("isError"):
+                    raise RuntimeError(response.text[:500])
+                latencies.append(time.perf_counter() - started)
+                size = len(response.content)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        return latencies, size, time.perf_counter() - started
+
+
+def run_mode(config: str, env: dict[str, str], calls: int, concurrency: int) -> dict:
+    port = free_port()
+    gateway = start_gateway(config, 1, port, env={"RESULT_PAGING": "false", **env})
+    try:
+        url = f"http://127.0.0.1:{port}/sales/mcp"
+        asyncio.run(call(url, 2, 1))  # warm up: imports, pools, first parse
+        before = process_usage(gateway.pid)
+        latencies, size, wall = asyncio.run(call(url, calls, concurrency))
+        after = process_usage(gateway.pid)
+    finally:
+        gateway.send_signal(signal.SIGTERM)
+        gateway.wait(timeout=60)
+    return {
+        "cpu_ms_per_call": round((after["cpu_s"] - before["cpu_s"]) * 1000 / calls, 1),
+        "peak_rss_mb": after["peak_rss_mb"],
+        "response_bytes": size,
+        **summarize(latencies, wall),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--rows", type=int, default=5000, help="entities per upstream response")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    modes = args.modes
+    if importlib.util.find_spec("orjson") is None:
+        modes = [mode for mode in modes if "ODATA_JSON" not in MODES[mode]]
+    runs = {}
+    with serve_in_process(make_standin, free_port(), rows=args.rows, latency_ms=0) as upstream:
+        upstream_bytes = len(httpx.get(f"{upstream}/A_SalesOrder").content)
+        config = gateway_config(upstream)
+        try:
+            for mode in modes:
+                runs[mode] = run_mode(config, MODES[mode], args.calls, args.concurrency)
+        finally:
+            os.unlink(config)
+    print(json.dumps({"upstream_bytes": upstream_bytes, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
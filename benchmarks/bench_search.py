@@ -0,0 +1,159 @@
+"""Knowledge-base search latency: per-call sync clients vs the persistent async backend.
+
+Starts a local HTTP stand-in for the Azure OpenAI embeddings deployment and the
+Cognitive Search index, then issues concurrent search_in_index calls the old way
+(fresh AzureOpenAI + SearchClient per call, pushed onto the default executor) and
+through search.SearchBackend. The stand-in charges --handshake-ms once per new
+TCP connection to approximate the TLS setup that the real endpoints cost.
+
+    python -m benchmarks.bench_search --calls 200 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from benchmarks._server import free_port, serve_in_process, summarize
+
+EMBEDDING_DIMENSIONS = 1536
+
+
+def make_standin(latency_ms: float, handshake_ms: float):
+    seen_connections = set()
+    embedding = [random.random() for _ in range(EMBEDDING_DIMENSIONS)]
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        request = Request(scope, receive)
+        body = await request.body()
+        delay = latency_ms
+        if scope["client"] not in seen_connections:
+            seen_connections.add(scope["client"])
+            delay += handshake_ms
+        await asyncio.sleep(delay / 1000)
+        if "/embeddings" in scope["path"]:
+            inputs = json.loads(body)["input"]
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            payload = {
+                "object": "list",
+                "model": "text-embedding-ada-002",
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": embedding}
+                    for i in range(len(inputs))
+                ],
+                "usage": {"prompt_tokens": 5 * len(inputs), "total_tokens": 5 * len(inputs)},
+            }
+        else:
+            payload = {"value": [
+                {
+                    "@search.score": 1.0 / (i + 1),
+                    "chunk_id": f"chunk-{i}",
+                    "content": "Step 5: check the torque of the mounting bolts.",
+                    "metadata": {"filename": "work_instruction.pdf", "has_image": False},
+                }
+                for i in range(5)
+            ]}
+        await JSONResponse(payload)(scope, receive, send)
+
+    return app
+
+
+def legacy_search_in_index(query, top_k_contexts=5):
+    """The pre-SearchBackend code path: new sync clients on every call."""
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+    from azure.search.documents.models import VectorizedQuery
+    from openai import AzureOpenAI
+
+    from config import ADA_CONFIG, COGNITIVE_SEARCH_CONFIG
+
+    openai_client = AzureOpenAI(
+        api_key=ADA_CONFIG["api_key"],
+        api_version=ADA_CONFIG["api_version"],
+        azure_endpoint=ADA_CONFIG["api_base"],
+        azure_deployment=ADA_CONFIG["deployment_name"],
+    )
+    embedding = openai_client.embeddings.create(input=query, model=ADA_CONFIG["model"]).data[0].embedding
+    openai_client.close()
+
+    search_client = SearchClient(
+        endpoint=COGNITIVE_SEARCH_CONFIG["endpoint"],
+        index_name=COGNITIVE_SEARCH_CONFIG["index_name"],
+        credential=AzureKeyCredential(COGNITIVE_SEARCH_CONFIG["api_key"]),
+    )
+    vector = VectorizedQuery(vector=embedding, k_nearest_neighbors=top_k_contexts, fields="contentVector", exhaustive=True)
+    results = search_client.search(search_text=query, vector_queries=[vector], top=top_k_contexts)
+    contexts = [{"chunk_id": r["chunk_id"], "content": r["content"]} for r in results]
+    search_client.close()
+    return contexts
+
+
+async def drive(call, calls: int, concurrency: int) -> dict:
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with gate:
+            started = time.perf_counter()
+            await call(f"What is on step {i}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    from search import SearchBackend
+
+    async def legacy(query):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, legacy_search_in_index, query, 5)
+
+    backend = SearchBackend(max_concurrency=args.concurrency)
+
+    async def persistent(query):
+        return await backend.search_in_index(query, 5)
+
+    results = {"legacy_per_call_clients": await drive(legacy, args.calls, args.concurrency)}
+    async with backend.lifespan():
+        results["persistent_async_backend"] = await drive(persistent, args.calls, args.concurrency)
+    batches = backend.embedding_batcher.stats()
+    results["embedding_batches"] = {
+        key: batches[key] for key in ("requests", "batches", "mean_batch_size", "batch_size_histogram")
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=15.0, help="stand-in service time per request")
+    parser.add_argument("--handshake-ms", type=float, default=30.0, help="stand-in cost per new connection")
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    for name, value in {
+        "COGNITIVE_SEARCH_API_KEY": "bench", "COGNITIVE_SEARCH_ENDPOINT": base,
+        "COGNITIVE_SEARCH_INDEX_NAME": "bench-index", "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": base, "ADA_API_VERSION": "2024-02-01",
+        "ADA_MODEL": "text-embedding-ada-002", "ADA_DEPLOYMENT_NAME": "ada",
+    }.items():
+        os.environ[name] = value
+
+    with serve_in_process(make_standin, port, latency_ms=args.latency_ms, handshake_ms=args.handshake_ms):
+        results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
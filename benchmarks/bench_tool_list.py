@@ -0,0 +1,101 @@
+"""tools/list latency over streamable HTTP, with and without tool_list.ToolList.
+
+Serves the spec (default the 150 KB payroll spec, which the gateway runs with
+"transform": true) as a stateless JSON MCP endpoint in a child process, once
+per mode, and sends --calls tools/list requests one after another:
+
+* runtime_transform: utils.perform_tool_transformation at boot, every listing
+  built by FastMCP (how the payroll backend used to run);
+* build_transform: the transformation applied to the catalog at build time,
+  every listing built by FastMCP;
+* precomputed: build_transform plus ToolList, serialized listing reused;
+* not_modified: precomputed, requests sending the ETag in If-None-Match.
+
+Per mode it reports the time to build the server, the latency percentiles and
+the response size.
+
+    python -m benchmarks.bench_tool_list --calls 500
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks._server import free_port, serve_in_process, summarize
+from catalog import build_openapi_mcp
+from odata import ODataTool
+from tool_list import ToolList
+from utils import perform_tool_transformation, transform_catalog_entry
+
+PAYROLL_SPEC = "specs/payrol_converted.json"
+MODES = ("runtime_transform", "build_transform", "precomputed", "not_modified")
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def make_app(mode: str, spec: str):
+    started = time.perf_counter()
+    mcp = build_openapi_mcp(
+        spec,
+        client=httpx.AsyncClient(),
+        tool_factory=ODataTool,
+        transform=None if mode == "runtime_transform" else transform_catalog_entry,
+        name="bench",
+        stateless_http=True,
+        json_response=True,
+    )
+    if mode == "runtime_transform":
+        asyncio.run(perform_tool_transformation(mcp))
+    middleware = ToolList(mcp).middleware() if mode in ("precomputed", "not_modified") else None
+    app = mcp.http_app(path="/mcp", middleware=middleware)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    async def with_build_time(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/build_ms":
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": str(build_ms).encode()})
+            return
+        await app(scope, receive, send)
+
+    return with_build_time
+
+
+def measure(url: str, calls: int, conditional: bool) -> dict:
+    payload = {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}
+    latencies = []
+    with httpx.Client(headers=HEADERS, timeout=30) as client:
+        first = client.post(f"{url}/mcp", json=payload)
+        first.raise_for_status()
+        headers = {"If-None-Match": first.headers["etag"]} if conditional else {}
+        size = 0
+        started = time.perf_counter()
+        for i in range(calls):
+            request_started = time.perf_counter()
+            response = client.post(f"{url}/mcp", json={**payload, "id": i}, headers=headers)
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code not in (200, 304):
+                raise RuntimeError(f"tools/list answered {response.status_code}")
+            size = len(response.content)
+        wall = time.perf_counter() - started
+    return {"tools": len(first.json()["result"]["tools"]), "response_bytes": size, **summarize(latencies, wall)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spec", default=PAYROLL_SPEC)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    runs = {}
+    for mode in args.modes:
+        with serve_in_process(make_app, free_port(), mode=mode, spec=args.spec) as url:
+            build_ms = float(httpx.get(f"{url}/build_ms").text)
+            runs[mode] = {"build_ms": round(build_ms, 1), **measure(url, args.calls, mode == "not_modified")}
+    print(json.dumps({"spec": args.spec, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Gateway throughput with 1..N pre-forked workers (serve.py).
+
+Starts an OData stand-in that answers every GET with a wide A_SalesOrder
+collection (synthesized from the full spec, as Gateway sends it), then runs
+gateway.py against it once per --workers value with SERVE_WORKERS set, and
+drives tools/call requests at the sales backend from --clients load processes.
+Per worker count it reports throughput and latency, the speedup over the first
+row, and the memory of the serving processes: RSS counts the pages the workers
+share with the parent once per process, PSS splits them between the sharers.
+
+Worker processes compete with the load processes and the stand-in for cores,
+so scaling flattens well before --workers reaches os.cpu_count() on a small
+machine; run it on one with a few cores more than the largest worker count.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --calls 4000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from starlette.responses import Response
+
+from benchmarks._odata import load_spec, sample_collection
+from benchmarks._server import free_port, process_usage, serve_in_process, summarize
+
+FULL_SPEC = "specs/API_SALES_ORDER_SRV.json"
+SERVED_SPEC = "specs/API_SALES_ORDER_SRV_reduced.json"
+TOOL = "Reads_all_sales_order_headers"
+
+
+def make_standin(rows: int, latency_ms: float):
+    body = json.dumps(sample_collection(load_spec(FULL_SPEC), "/A_SalesOrder", rows)).encode()
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        await Response(body, media_type="application/json")(scope, receive, send)
+
+    return app
+
+
+def gateway_config(upstream: str) -> str:
+    config = {
+        "name": "bench",
+        "combined_path": None,
+        "backends": {
+            "sales": {
+                "spec": SERVED_SPEC,
+                "base_url": f"{upstream}/sap/opu/odata/sap/API_SALES_ORDER_SRV",
+                "headers": {"Accept": "application/json"},
+            }
+        },
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(config, f)
+    return f.name
+
+
+def start_gateway(config: str, workers: int, port: int, env: dict[str, str] | None = None) -> subprocess.Popen:
+    env = {**os.environ, **(env or {}), "GATEWAY_CONFIG": config, "SERVE_WORKERS": str(workers),
+           "HOST": "127.0.0.1", "PORT": str(port)}
+    process = subprocess.Popen([sys.executable, "gateway.py"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).raise_for_status()
+            break
+        except httpx.HTTPError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError(f"gateway with {workers} workers did not start")
+            time.sleep(0.1)
+    return process
+
+
+def _load(url: str, calls: int, concurrency: int, rows: int) -> list[float]:
+    async def run() -> list[float]:
+        gate = asyncio.Semaphore(concurrency)
+        latencies = []
+        headers = {"Accept": "application/json, text/event-stream"}
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=60) as client:
+            async def one(i):
+                payload = {"jsonrpc": "2.0", "id": i, "method": "tools/call",
+                           "params": {"name": TOOL, "arguments": {"$top": rows}}}
+                async with gate:
+                    started = time.perf_counter()
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+
+            await asyncio.gather(*(one(i) for i in range(calls)))
+        return latencies
+
+    return asyncio.run(run())
+
+
+def drive(url: str, calls: int, concurrency: int, clients: int, rows: int) -> dict:
+    _load(url, max(clients, 20), clients, rows)  # warm up every worker's pool
+    share = [(url, calls // clients, max(1, concurrency // clients), rows) for _ in range(clients)]
+    with multiprocessing.Pool(clients) as pool:
+        started = time.perf_counter()
+        results = pool.starmap(_load, share)
+        wall = time.perf_counter() - started
+    return summarize([latency for result in results for latency in result], wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--rows", type=int, default=50, help="entities per upstream response")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="stand-in service time per request")
+    args = parser.parse_args()
+
+    rows = []
+    with serve_in_process(make_standin, free_port(), rows=args.rows, latency_ms=args.latency_ms) as upstream:
+        config = gateway_config(upstream)
+        try:
+            for workers in args.workers:
+                port = free_port()
+                gateway = start_gateway(config, workers, port)
+                try:
+                    result = drive(f"http://127.0.0.1:{port}/sales/mcp", args.calls, args.concurrency,
+                                   args.clients, args.rows)
+                    usage = process_usage(gateway.pid)
+                    rows.append({"workers": workers, **result, "processes": usage["processes"],
+                                 "rss_mb": usage["rss_mb"], "pss_mb": usage["pss_mb"]})
+                finally:
+                    gateway.send_signal(signal.SIGTERM)
+                    gateway.wait(timeout=60)
+        finally:
+            os.unlink(config)
+
+    for row in rows:
+        row["speedup"] = round(row["rps"] / rows[0]["rps"], 2)
+    print(json.dumps({"cpu_count": os.cpu_count(), "runs": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Load test of an MCP entry point against the local stand-in upstream.
+
+Starts benchmarks.standin with every backend of gateway.json, points the
+entry point at it (a copy of gateway.json with each backend's base URL
+replaced, plus the base URL environment variables for scripts that read them
+directly) and starts the entry point as a subprocess. Credentials the config
+asks for get dummy values unless they are already set. Then --concurrency
+fastmcp Clients, each with its own session, send list_tools and call_tool
+requests: --list-ratio of them list_tools, the rest call the tools round-robin.
+Tools are called with --top rows and made-up keys; tools that need structured
+arguments (e.g. batch_read) are skipped unless named with --tool.
+
+Entry points configured through gateway.json can be tested: gateway.py, the
+single-backend scripts (SalesOrderMCP.py, PlannedOrderMCP.py, ...) and
+mount_dd_mcp.py. Reported for the whole run and per operation: requests per
+second, p50/p95/p99 latency and errors; for the server process tree: CPU time
+spent during the measured phase, per request, and peak RSS.
+
+--cassette replays a cassette recorded against the real systems (see
+cassette.py) instead of starting the stand-in: the config is used as it is,
+CASSETTE_MODE=replay is set, and only the credentials get dummy values. The
+cassette replaces the connection pool only; admission control, single-flight
+and the per-client layers run as they do live. Pass
+--env CASSETTE_LATENCY_SCALE=1 to replay with the recorded latencies.
+
+--output saves the report as JSON; --compare reads an earlier report and
+exits non-zero if throughput, latency, CPU per request or peak RSS got worse
+by more than --threshold:
+
+    python -m benchmarks.loadtest --entry SalesOrderMCP.py --requests 2000 --concurrency 16 \\
+        --output results/sales.json
+    python -m benchmarks.loadtest --entry gateway.py --endpoint /combined/mcp --env SERVE_WORKERS=2 \\
+        --compare results/gateway.json
+    python -m benchmarks.loadtest --entry gateway.py --cassette cassettes/upstream.jsonl.gz
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+from fastmcp import Client
+
+from benchmarks._server import free_port, process_usage, serve_in_process, summarize
+from benchmarks.standin import make_standin
+
+DEFAULT_ENDPOINTS = {"gateway.py": "/combined/mcp", "mount_dd_mcp.py": "/combined/mcp"}
+
+# (metric, True if higher is better) compared by --compare
+COMPARED = [
+    ("rps", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("cpu_ms_per_request", False),
+    ("peak_rss_mb", False),
+]
+
+
+def standin_environment(config_path: str, upstream: str | None) -> tuple[dict[str, Any], dict[str, str]]:
+    """gateway config and environment that point every backend at the stand-in (None: leave the URLs)."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    env: dict[str, str] = {}
+    for name, backend in config["backends"].items():
+        if upstream is not None:
+            url = f"{upstream}/{name}"
+            if "base_url_env" in backend:
+                env[backend.pop("base_url_env")] = url
+            backend["base_url"] = url
+            backend.pop("verify", None)
+        auth = backend.get("auth", {})
+        for key in ("user_env", "password_env", "value_env"):
+            if key in auth:
+                env.setdefault(auth[key], os.environ.get(auth[key], "loadtest"))
+    return config, env
+
+
+def start_entry(entry: str, env: dict[str, str], port: int, timeout: float = 120) -> subprocess.Popen:
+    env = {**os.environ, **env, "HOST": "127.0.0.1", "PORT": str(port)}
+    # a file, not a pipe: nobody reads the server's log while it runs, and a
+    # full pipe would block the server
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen([sys.executable, entry], env=env, stdout=subprocess.DEVNULL, stderr=log)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).raise_for_status()
+                return process
+            except httpx.HTTPError:
+                if process.poll() is not None:
+                    log.seek(0)
+                    raise RuntimeError(f"{entry} exited:\n{log.read().decode(errors='replace')[-2000:]}")
+                if time.monotonic() > deadline:
+                    process.kill()
+                    raise RuntimeError(f"{entry} did not answer /healthz within {timeout:g}s")
+                time.sleep(0.2)
+
+
+def _argument(schema: dict[str, Any]) -> Any:
+    kind = schema.get("type")
+    if kind == "integer" or kind == "number":
+        return 1
+    if kind == "boolean":
+        return False
+    if kind in (None, "string"):
+        return "1"
+    raise ValueError(kind)
+
+
+def call_plan(tools: list, only: list[str], top: int) -> list[tuple[str, dict[str, Any]]]:
+    """(tool, arguments) for every tool that can be called with made-up scalar arguments.
+
+    Paging tools (fetch_results) are left out: they only answer cursors of earlier results.
+    """
+    plan = []
+    for tool in tools:
+        if only and tool.name not in only:
+            continue
+        if "paging" in ((tool.meta or {}).get("_fastmcp") or {}).get("tags", []):
+            continue
+        properties = tool.inputSchema.get("properties", {})
+        try:
+            arguments = {name: _argument(properties.get(name, {})) for name in tool.inputSchema.get("required", [])}
+        except ValueError:
+            if only:
+                raise SystemExit(f"--tool {tool.name}: needs structured arguments")
+            continue
+        if "$top" in properties:
+            arguments["$top"] = top
+        plan.append((tool.name, arguments))
+    missing = set(only) - {name for name, _ in plan}
+    if missing:
+        raise SystemExit(f"--tool names unknown tools: {', '.join(sorted(missing))}")
+    return plan
+
+
+async def drive(url: str, plan: list[tuple[str, dict[str, Any]]], args) -> tuple[dict[str, list[float]], dict[str, int], float]:
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    budget = {"left": args.requests, "next": 0}
+    rng = random.Random(0)
+    stop_at = time.monotonic() + args.duration if args.duration else None
+
+    def take() -> bool:
+        if stop_at is not None:
+            return time.monotonic() < stop_at
+        budget["left"] -= 1
+        return budget["left"] >= 0
+
+    async def session() -> None:
+        async with Client(url, timeout=args.timeout) as client:
+            while take():
+                if rng.random() < args.list_ratio:
+                    operation = "list_tools"
+                    call = client.list_tools()
+                else:
+                    name, arguments = plan[budget["next"] % len(plan)]
+                    budget["next"] += 1
+                    operation = f"call_tool:{name}"
+                    call = client.call_tool(name, arguments, raise_on_error=False)
+                started = time.perf_counter()
+                try:
+                    result = await call
+                    failed = getattr(result, "is_error", False)
+                except Exception:
+                    failed = True
+                latencies.setdefault(operation, []).append(time.perf_counter() - started)
+                if failed:
+                    errors[operation] = errors.get(operation, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(args.concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def warm_up(url: str, plan: list[tuple[str, dict[str, Any]]], rounds: int) -> None:
+    async with Client(url) as client:
+        for i in range(rounds):
+            name, arguments = plan[i % len(plan)]
+            await client.call_tool(name, arguments, raise_on_error=False)
+
+
+async def list_plan(url: str, args) -> list[tuple[str, dict[str, Any]]]:
+    async with Client(url) as client:
+        tools = await client.list_tools()
+    return call_plan(tools, args.tool or [], args.top)
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict[str, Any]:
+    endpoint = args.endpoint or DEFAULT_ENDPOINTS.get(os.path.basename(args.entry), "/mcp")
+    standin = {"rows": args.rows, "pages": args.pages, "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms}
+    if args.cassette:
+        upstreams = nullcontext(None)
+    else:
+        upstreams = serve_in_process(make_standin, free_port(), **standin)
+    with upstreams as upstream:
+        config, env = standin_environment(args.config, upstream)
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(config, f)
+        if args.cassette:
+            env.update({"CASSETTE_MODE": "replay", "CASSETTE_PATH": os.path.abspath(args.cassette)})
+        env.update({"GATEWAY_CONFIG": f.name, **dict(item.split("=", 1) for item in args.env or [])})
+        port = free_port()
+        url = f"http://127.0.0.1:{port}{endpoint}"
+        try:
+            started = time.perf_counter()
+            server = start_entry(args.entry, env, port)
+            startup_s = time.perf_counter() - started
+            try:
+                plan = asyncio.run(list_plan(url, args))
+                if not plan:
+                    raise SystemExit(f"No tool on {endpoint} can be called with generated arguments")
+                asyncio.run(warm_up(url, plan, args.warmup))
+                before = process_usage(server.pid)
+                latencies, errors, wall = asyncio.run(drive(url, plan, args))
+                after = process_usage(server.pid)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                try:
+                    server.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+        finally:
+            os.unlink(f.name)
+
+    every = [latency for values in latencies.values() for latency in values]
+    summary = summarize(every, wall)
+    cpu_s = round(after["cpu_s"] - before["cpu_s"], 2)
+    summary.update({
+        "errors": sum(errors.values()),
+        "startup_s": round(startup_s, 2),
+        "cpu_s": cpu_s,
+        "cpu_ms_per_request": round(cpu_s * 1000 / len(every), 3) if every else None,
+        "peak_rss_mb": after["peak_rss_mb"],
+        "pss_mb": after["pss_mb"],
+        "processes": after["processes"],
+    })
+    return {
+        "meta": {
+            "entry": args.entry,
+            "endpoint": endpoint,
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "env": args.env or [],
+            "cassette": args.cassette,
+            "settings": {key: getattr(args, key) for key in (
+                "requests", "duration", "concurrency", "list_ratio", "top", "rows", "pages",
+                "latency_ms", "jitter_ms")},
+        },
+        "summary": summary,
+        "operations": {
+            operation: {**summarize(values, wall), "errors": errors.get(operation, 0)}
+            for operation, values in sorted(latencies.items())
+        },
+    }
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    rows = []
+    for metric, higher_is_better in COMPARED:
+        old, new = baseline["summary"].get(metric), current["summary"].get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        rows.append({"metric": metric, "baseline": old, "current": new,
+                     "change": round(change, 3), "regression": worse > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", default="gateway.py", help="script to start, e.g. SalesOrderMCP.py")
+    parser.add_argument("--endpoint", help="MCP path (default /combined/mcp for the gateways, else /mcp)")
+    parser.add_argument("--config", default="gateway.json", help="gateway config to point at the stand-in")
+    parser.add_argument("--env", action="append", help="KEY=VALUE for the entry point (repeatable)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of --requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent client sessions")
+    parser.add_argument("--list-ratio", type=float, default=0.1, help="share of list_tools requests")
+    parser.add_argument("--tool", action="append", help="only call these tools (repeatable)")
+    parser.add_argument("--top", type=int, default=50, help="$top passed to collection reads")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request client timeout")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured calls before the run")
+    parser.add_argument("--rows", type=int, default=50, help="stand-in entities per collection page")
+    parser.add_argument("--pages", type=int, default=1, help="stand-in pages per collection read")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stand-in service time")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="stand-in random extra latency")
+    parser.add_argument("--cassette", help="replay this cassette instead of starting the stand-in")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as regression")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report, args.threshold)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if any(row["regression"] for row in report.get("comparison", [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Local stand-in for the SAP services behind the specs, for load tests.
+
+Serves every spec under its own prefix (/<name>/...) and answers each path the
+spec describes with a synthesized payload in the spec's shape (see
+benchmarks._odata.sample_response):
+
+* collection reads return min($top, --rows) entities, split into --pages
+  pages linked by __next (or @odata.nextLink) with a $skiptoken;
+* entity reads return one entity for whatever key was asked for;
+* writes are answered with 201 and the entity, or 204 for PATCH/PUT/MERGE/DELETE;
+* the service root hands out an X-CSRF-Token and $batch requests get a
+  multipart/mixed answer with one part per GET;
+* every request waits --latency-ms plus up to --jitter-ms before answering.
+
+Payloads are generated once per (path, rows, page) and kept, so the stand-in
+itself stays cheap next to the server under test. By default it serves every
+backend of gateway.json:
+
+    python -m benchmarks.standin --port 9100 --rows 100 --latency-ms 40
+    python -m benchmarks.standin --service sales=specs/API_SALES_ORDER_SRV.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import parse_qs, unquote
+
+import uvicorn
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from benchmarks._odata import collection_entity_types, load_spec, sample_response
+
+WRITE_STATUS = {"POST": 201, "PUT": 204, "PATCH": 204, "MERGE": 204, "DELETE": 204}
+
+
+def gateway_services(config_path: str = "gateway.json") -> dict[str, str]:
+    """name -> spec path of every backend in the gateway config."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        return {name: backend["spec"] for name, backend in json.load(f)["backends"].items()}
+
+
+def _path_pattern(template: str) -> re.Pattern:
+    parts = re.split(r"(\{[^}]+\})", template)
+    return re.compile("".join("[^/]+?" if part.startswith("{") else re.escape(part) for part in parts) + "/?")
+
+
+class _Service:
+    def __init__(self, name: str, spec_path: str):
+        self.name = name
+        self.spec = load_spec(spec_path)
+        v2_collections = set(collection_entity_types(self.spec))
+        self.collections = {
+            template for template, item in self.spec.get("paths", {}).items()
+            if template in v2_collections or "{" not in template
+            or '"value"' in json.dumps(item.get("get", {}).get("responses", {}).get("200", {}))
+        }
+        # literal paths first, so /A_SalesOrder does not lose to /A_SalesOrder('{SalesOrder}')
+        templates = sorted(self.spec.get("paths", {}), key=lambda path: path.count("{"))
+        self.routes = [(_path_pattern(template), template) for template in templates]
+
+    def match(self, path: str) -> str | None:
+        for pattern, template in self.routes:
+            if pattern.fullmatch(path):
+                return template
+        return None
+
+
+class StandIn:
+    """ASGI app answering the requests of the specs' operations with synthetic payloads."""
+
+    def __init__(self, services: dict[str, str], rows: int = 50, pages: int = 1,
+                 latency_ms: float = 20.0, jitter_ms: float = 0.0, seed: int = 0):
+        self.services = {name: _Service(name, spec) for name, spec in services.items()}
+        self.rows = rows
+        self.pages = max(1, pages)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._bodies: dict[tuple[str, str, int, int], bytes] = {}
+        self.requests = 0
+
+    def body(self, service: _Service, template: str, url: str, rows: int, page: int) -> bytes:
+        key = (service.name, template, rows, page)
+        body = self._bodies.get(key)
+        if body is None:
+            paged = template in service.collections and page + 1 < self.pages
+            link = f"{url}?$skiptoken={page + 1}" if paged else None
+            payload = sample_response(service.spec, template, rows, self.seed + page, link)
+            body = self._bodies[key] = json.dumps(payload).encode()
+        return body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        delay = self.latency_ms + self._rng.random() * self.jitter_ms
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        response = await self.answer(Request(scope, receive))
+        await response(scope, receive, send)
+
+    async def answer(self, request: Request) -> Response:
+        name, _, path = unquote(request.url.path).lstrip("/").partition("/")
+        service = self.services.get(name)
+        if service is None:
+            return _error(404, f"Unknown service {name!r}")
+        path = f"/{path}"
+        if path.rstrip("/") in ("", "/"):
+            return Response(status_code=200, headers={"x-csrf-token": "standin-token"})
+        if path == "/$batch":
+            return await self.batch(service, request)
+        return self.read_or_write(service, request.method, path, str(request.url).split("?")[0],
+                                  parse_qs(request.url.query))
+
+    def read_or_write(self, service: _Service, method: str, path: str, url: str,
+                      query: dict[str, list[str]]) -> Response:
+        template = service.match(path)
+        if template is None:
+            return _error(404, f"Resource not found for segment '{path}'")
+        if method != "GET":
+            status = WRITE_STATUS.get(method, 405)
+            if status == 201:
+                return Response(self.body(service, template, url, 1, 0), status_code=201,
+                                media_type="application/json")
+            return Response(status_code=status)
+        rows = self.rows
+        if "$top" in query and query["$top"][0].isdigit():
+            rows = min(rows, int(query["$top"][0]))
+        page = int(query["$skiptoken"][0]) if query.get("$skiptoken", [""])[0].isdigit() else 0
+        return Response(self.body(service, template, url, rows, page), media_type="application/json")
+
+    async def batch(self, service: _Service, request: Request) -> Response:
+        body = (await request.body()).decode()
+        boundary = "batchresponse_standin"
+        parts = []
+        for line in body.splitlines():
+            if not line.startswith("GET "):
+                continue
+            target = line.split(" ")[1]
+            path, _, query = target.partition("?")
+            answer = self.read_or_write(service, "GET", f"/{unquote(path).lstrip('/')}",
+                                        f"{request.base_url}{service.name}/{path}", parse_qs(query))
+            status = f"{answer.status_code} {HTTPStatus(answer.status_code).phrase}"
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n"
+                f"{answer.body.decode()}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return Response("".join(parts).encode(), status_code=202,
+                        media_type=f"multipart/mixed; boundary={boundary}")
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    # SAP Gateway's error body
+    return JSONResponse({"error": {"code": "STANDIN/000", "message": {"lang": "en", "value": message}}},
+                        status_code=status)
+
+
+def make_standin(services: dict[str, str] | None = None, **options: Any) -> StandIn:
+    """StandIn for services (default: every backend of gateway.json); picklable for serve_in_process."""
+    return StandIn(services or gateway_services(), **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", action="append", help="name=spec (repeatable; default: gateway.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--rows", type=int, default=50, help="entities per collection page")
+    parser.add_argument("--pages", type=int, default=1, help="pages per collection read")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    services = dict(item.split("=", 1) for item in args.service) if args.service else None
+    app = make_standin(services, rows=args.rows, pages=args.pages,
+                       latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Record/replay of upstream HTTP traffic for offline performance runs.
+
+Tuning against the real CPI and S/4HANA systems is noisy and needs network
+access and credentials. Cassette is the innermost transport layer of the
+pool registry, under admission control and single-flight, so a replay goes
+through the same layers as live traffic and only the network is left out::
+
+    upstream_pools.add_layer(cassette.layer, innermost=True)
+    client = upstream_pools.client(base_url, ..., layers=[hedging.layer, tool_metrics.layer, ...])
+
+* record: every request goes upstream as usual; the request, the response
+  (body read completely) and the time until the body was in are appended to
+  the cassette file, one gzip member per interaction;
+* replay: requests are answered from the cassette without touching the
+  network, immediately or after the recorded time scaled by
+  CASSETTE_LATENCY_SCALE;
+* off (default): the layer is not installed at all.
+
+Credentials never reach the file: Authorization, APIKey, Cookie and CSRF
+token headers, and any header registered with redact_header (the gateway
+registers the header of every "header" auth scheme, e.g. X-API-Key), are
+dropped from requests, Set-Cookie is dropped from responses and an
+X-CSRF-Token handed out is replaced by a placeholder; query parameters named
+in REDACTED_PARAMS are blanked. Replay therefore works with dummy
+credentials.
+
+Requests are matched on method, URL path, normalized query (as
+response_cache.normalized_query) and a digest of the body, with multipart
+boundaries ($batch) taken out; the host is not part of the match, so a
+cassette can be replayed with the base URL env vars pointing anywhere as long
+as the paths are the same. Several recordings of the same request are played
+back in turn. A request without a recording fails with a
+httpx.TransportError, or goes upstream with CASSETTE_MISS=passthrough.
+Transport errors seen while recording (timeouts, refused connections) are
+replayed as the same exception type.
+
+Record with a single worker (SERVE_WORKERS=1); concurrent workers appending to
+one file can interleave.
+
+Tuning via environment:
+    CASSETTE_MODE            "off" (default), "record" or "replay"
+    CASSETTE_PATH            cassette file (default cassettes/upstream.jsonl.gz)
+    CASSETTE_LATENCY_SCALE   replay delay as a multiple of the recorded time; 0
+                             answers as fast as possible (default), 1 with the
+                             original latencies
+    CASSETTE_MISS            "error" (default) or "passthrough"
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from typing import Any
+from urllib.parse import parse_qsl, unquote, urlencode
+
+import httpx
+from fastmcp.utilities.logging import get_logger
+
+from response_cache import normalized_query
+
+logger = get_logger(__name__)
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/upstream.jsonl.gz")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "0"))
+CASSETTE_MISS = os.getenv("CASSETTE_MISS", "error").lower()
+
+MODES = ("off", "record", "replay")
+REDACTED_HEADERS = ("authorization", "proxy-authorization", "apikey", "cookie", "x-csrf-token")
+REDACTED_PARAMS = ("sap-password", "sap-user", "password", "apikey", "api_key", "token")
+PLACEHOLDER = "<redacted>"
+# Headers that describe the wire body, not the decoded content kept in the cassette
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "set-cookie")
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+
+
+def _redacted_query(query: bytes | str) -> str:
+    if isinstance(query, bytes):
+        query = query.decode("ascii", "replace")
+    params = parse_qsl(query, keep_blank_values=True)
+    return urlencode([(name, PLACEHOLDER if name.lower() in REDACTED_PARAMS else value) for name, value in params])
+
+
+def _body_digest(request: httpx.Request, content: bytes) -> str:
+    if not content:
+        return ""
+    match = _BOUNDARY.search(request.headers.get("content-type", ""))
+    if match:
+        content = content.replace(match.group(1).encode(), b"BOUNDARY")
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def _encode_body(content: bytes) -> dict[str, str]:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(interaction: dict[str, Any]) -> bytes:
+    if "body_b64" in interaction:
+        return base64.b64decode(interaction["body_b64"])
+    return interaction.get("body", "").encode("utf-8")
+
+
+class Cassette:
+    """Records upstream interactions to a file or answers requests from it."""
+
+    def __init__(
+        self,
+        path: str = CASSETTE_PATH,
+        mode: str = CASSETTE_MODE,
+        latency_scale: float = CASSETTE_LATENCY_SCALE,
+        miss: str = CASSETTE_MISS,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.miss = miss
+        self.redacted_headers = set(REDACTED_HEADERS)
+        self._recordings: dict[str, deque[dict[str, Any]]] | None = None
+        self.counters = {"recorded": 0, "replayed": 0, "misses": 0}
+
+    def layer(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """pools.TransportLayer; install it with upstream_pools.add_layer(..., innermost=True)."""
+        if self.mode == "off":
+            return transport
+        return _CassetteTransport(self, transport)
+
+    def redact_header(self, name: str) -> None:
+        """Keep the request header name (e.g. a configured API key header) out of the file."""
+        self.redacted_headers.add(name.lower())
+
+    def key(self, request: httpx.Request, content: bytes) -> str:
+        url = request.url
+        query = normalized_query(_redacted_query(url.query))
+        return f"{request.method} {unquote(url.path)}?{query} {_body_digest(request, content)}"
+
+    def recordings(self) -> dict[str, deque[dict[str, Any]]]:
+        if self._recordings is None:
+            self._recordings = {}
+            if os.path.exists(self.path):
+                opener = gzip.open if self.path.endswith(".gz") else open
+                with opener(self.path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            interaction = json.loads(line)
+                            self._recordings.setdefault(interaction["key"], deque()).append(interaction)
+            logger.info(f"Cassette {self.path}: {sum(map(len, self._recordings.values()))} interactions")
+        return self._recordings
+
+    def append(self, interaction: dict[str, Any]) -> None:
+        data = (json.dumps(interaction, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        if self.path.endswith(".gz"):
+            data = gzip.compress(data)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, data)  # one write per interaction, so a crash leaves whole members only
+        finally:
+            os.close(fd)
+        self.counters["recorded"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {"mode": self.mode, "path": self.path, **self.counters}
+        if self.mode == "replay" and self._recordings is not None:
+            stats["interactions"] = sum(map(len, self._recordings.values()))
+        return stats
+
+
+class _CassetteTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        content = await request.aread()
+        key = self.cassette.key(request, content)
+        if self.cassette.mode == "replay":
+            return await self._replay(request, key)
+        return await self._record(request, key)
+
+    async def _record(self, request: httpx.Request, key: str) -> httpx.Response:
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in self.cassette.redacted_headers}
+        interaction: dict[str, Any] = {
+            "key": key,
+            "method": request.method,
+            "url": f"{request.url.path}?{_redacted_query(request.url.query)}",
+            "request_headers": headers,
+        }
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+            try:
+                body = await response.aread()
+            finally:
+                await response.aclose()
+        except httpx.TransportError as e:
+            interaction.update({"elapsed": round(time.perf_counter() - started, 4),
+                                "error": type(e).__name__, "message": str(e)})
+            self.cassette.append(interaction)
+            raise
+        response_headers = [
+            (name, PLACEHOLDER if name.lower() == "x-csrf-token" else value)
+            for name, value in response.headers.multi_items() if name.lower() not in _DROPPED_HEADERS
+        ]
+        interaction.update({
+            "elapsed": round(time.perf_counter() - started, 4),
+            "status": response.status_code,
+            "headers": response_headers,
+            **_encode_body(body),
+        })
+        self.cassette.append(interaction)
+        return httpx.Response(response.status_code, headers=response_headers, content=body, request=request)
+
+    async def _replay(self, request: httpx.Request, key: str) -> httpx.Response:
+        recorded = self.cassette.recordings().get(key)
+        if not recorded:
+            self.cassette.counters["misses"] += 1
+            if self.cassette.miss == "passthrough":
+                return await self.transport.handle_async_request(request)
+            raise httpx.TransportError(f"No recorded interaction for {key}", request=request)
+        interaction = recorded[0]
+        recorded.rotate(-1)
+        self.cassette.counters["replayed"] += 1
+        if self.cassette.latency_scale > 0:
+            await asyncio.sleep(interaction["elapsed"] * self.cassette.latency_scale)
+        if "error" in interaction:
+            error = getattr(httpx, interaction["error"], httpx.TransportError)
+            raise error(interaction["message"], request=request)
+        return httpx.Response(interaction["status"], headers=interaction["headers"],
+                              content=_decode_body(interaction), request=request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+cassette = Cassette()
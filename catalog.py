@@ -0,0 +1,319 @@
+"""Compiled tool-catalog cache for FastMCP.from_openapi.
+
+FastMCP.from_openapi parses the whole spec, resolves its schemas and builds every
+tool definition on each boot. build_openapi_mcp does that work once per
+(spec content, fastmcp version) and pickles the parsed routes together with the
+finished tool definitions into CATALOG_CACHE_DIR. A warm boot loads the pickle
+and only constructs the tool objects around the live httpx client.
+
+A transform (e.g. utils.transform_catalog_entry: links stripped from the
+descriptions, route tags) is applied to the tool definitions before they are
+cached, so it costs nothing at boot or per request, unlike a FastMCP tool
+transformation, which wraps every tool.
+
+Prebuild the cache at deploy time and compare cold vs warm startup with:
+
+    python catalog.py build specs/API_SALES_ORDER_SRV_reduced.json specs/payrol_converted.json
+    python catalog.py build --operation-ids specs/API_PLANNED_ORDERS.json
+    python catalog.py build --transform specs/payrol_converted.json
+    python catalog.py report specs/API_SALES_ORDER_SRV.json
+
+Cache files are named <spec stem>-<variant>-<key>.pickle: the variant hashes
+the spec path and the options (prepare, transform), the key also the spec
+content and library versions. Writing a catalog drops the older ones of the
+same variant only, so servers building one spec with different options, or
+same-named specs from different directories, keep their catalogs side by side.
+
+The cache files are plain pickles written by this process, so CATALOG_CACHE_DIR
+must only ever contain files produced by this module.
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import fastmcp
+import httpx
+import pydantic
+from fastmcp import FastMCP
+from fastmcp.server.openapi import FastMCPOpenAPI, OpenAPITool
+from fastmcp.tools import Tool
+from fastmcp.utilities.logging import get_logger
+
+from utils import ensure_operation_ids, transform_catalog_entry
+
+logger = get_logger(__name__)
+
+CATALOG_CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", ".catalog_cache")
+CATALOG_FORMAT = 1
+
+# Pickled routes are only valid for the library versions that produced them
+_LIBRARY_VERSIONS = (
+    f"fastmcp={fastmcp.__version__};pydantic={pydantic.VERSION};"
+    f"python={sys.version_info.major}.{sys.version_info.minor}"
+)
+
+SpecPrepare = Callable[[dict[str, Any]], dict[str, Any]]
+# Maps one compiled tool definition (see compile_catalog) to its final form
+ToolTransform = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+def _options(prepare: SpecPrepare | None, transform: ToolTransform | None) -> str:
+    options = []
+    if prepare is not None:
+        options.append(f"prepare={prepare.__module__}.{prepare.__qualname__}")
+    if transform is not None:
+        options.append(f"transform={transform.__module__}.{transform.__qualname__}")
+    return ";".join(options)
+
+
+def catalog_key(spec_bytes: bytes, prepare: SpecPrepare | None = None, transform: ToolTransform | None = None) -> str:
+    """Hash of everything that influences the compiled catalog."""
+    digest = hashlib.sha256(spec_bytes)
+    digest.update(f"{_LIBRARY_VERSIONS};format={CATALOG_FORMAT}".encode())
+    digest.update(_options(prepare, transform).encode())
+    return digest.hexdigest()[:24]
+
+
+def catalog_variant(spec_path: Path, prepare: SpecPrepare | None = None, transform: ToolTransform | None = None) -> str:
+    """Hash of which catalog a cache file holds: spec location and options, not content.
+
+    The location is taken relative to the working directory, like
+    CATALOG_CACHE_DIR, so a catalog prebuilt in a checkout is still found
+    after the tree is deployed elsewhere.
+    """
+    location = os.path.relpath(spec_path.resolve())
+    return hashlib.sha256(f"{location};{_options(prepare, transform)}".encode()).hexdigest()[:8]
+
+
+def compile_catalog(spec: dict[str, Any]) -> dict[str, Any]:
+    """Run the regular OpenAPI conversion once and keep only its results.
+
+    Each entry holds the keyword arguments OpenAPITool needs apart from the
+    client: the parsed HTTPRoute (with its resolved schema definitions), the
+    final tool name, enhanced description, input/output schemas and tags.
+    """
+    server = FastMCPOpenAPI(openapi_spec=spec, client=httpx.AsyncClient(), name="catalog")
+    tools = []
+    for tool in server._tool_manager._tools.values():
+        if not isinstance(tool, OpenAPITool):
+            continue
+        tools.append({
+            "route": tool._route,
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": tool.parameters,
+            "output_schema": tool.output_schema,
+            "tags": set(tool.tags),
+        })
+    return {"format": CATALOG_FORMAT, "versions": _LIBRARY_VERSIONS, "tools": tools}
+
+
+def _cache_path(
+    spec_path: Path, key: str, prepare: SpecPrepare | None = None, transform: ToolTransform | None = None
+) -> Path:
+    variant = catalog_variant(spec_path, prepare, transform)
+    return Path(CATALOG_CACHE_DIR) / f"{spec_path.stem}-{variant}-{key}.pickle"
+
+
+def _write_catalog(path: Path, catalog: dict[str, Any]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        # Drop catalogs compiled from older versions of the same spec file with
+        # the same options; other options or a same-named spec elsewhere keep theirs
+        variant = path.stem.rsplit("-", 1)[0]
+        for stale in path.parent.glob(f"{variant}-{'?' * 24}.pickle"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"Could not write tool catalog {path}: {e}")
+
+
+def _read_catalog(path: Path) -> dict[str, Any] | None:
+    # Unpickling allocates tens of thousands of small objects; keep the cyclic
+    # GC from repeatedly walking them while the catalog is being loaded.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as f:
+            catalog = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable tool catalog {path}: {e}")
+        return None
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    if catalog.get("format") != CATALOG_FORMAT or catalog.get("versions") != _LIBRARY_VERSIONS:
+        return None
+    return catalog
+
+
+def load_catalog(
+    spec_path: str | Path,
+    prepare: SpecPrepare | None = None,
+    use_cache: bool = True,
+    transform: ToolTransform | None = None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Return the compiled catalog for spec_path and a timing report.
+
+    The report records whether the catalog came from the cache ("warm") or was
+    compiled from the spec ("cold") together with the time spent in each step.
+    """
+    spec_path = Path(spec_path)
+    started = time.perf_counter()
+    spec_bytes = spec_path.read_bytes()
+    key = catalog_key(spec_bytes, prepare, transform)
+    cache_path = _cache_path(spec_path, key, prepare, transform)
+
+    report: dict[str, Any] = {"spec": str(spec_path), "key": key}
+    catalog = _read_catalog(cache_path) if use_cache else None
+    if catalog is not None:
+        report["mode"] = "warm"
+        report["load_s"] = time.perf_counter() - started
+        return catalog, report
+
+    report["mode"] = "cold"
+    spec = json.loads(spec_bytes)
+    if prepare is not None:
+        spec = prepare(spec)
+    parsed = time.perf_counter()
+    report["parse_s"] = parsed - started
+
+    catalog = compile_catalog(spec)
+    if transform is not None:
+        catalog["tools"] = [transform(entry) for entry in catalog["tools"]]
+    report["compile_s"] = time.perf_counter() - parsed
+    if use_cache:
+        _write_catalog(cache_path, catalog)
+    return catalog, report
+
+
+def materialize(
+    catalog: dict[str, Any],
+    client: httpx.AsyncClient,
+    name: str,
+    tool_factory: Callable[..., Tool] = OpenAPITool,
+    timeout: float | None = None,
+    **settings: Any,
+) -> FastMCP:
+    """Build a FastMCP server from a compiled catalog."""
+    mcp = FastMCP(name=name, **settings)
+    for entry in catalog["tools"]:
+        mcp.add_tool(tool_factory(client=client, timeout=timeout, **entry))
+    return mcp
+
+
+def build_openapi_mcp(
+    spec_path: str | Path,
+    client: httpx.AsyncClient,
+    name: str,
+    prepare: SpecPrepare | None = None,
+    tool_factory: Callable[..., Tool] = OpenAPITool,
+    timeout: float | None = None,
+    transform: ToolTransform | None = None,
+    **settings: Any,
+) -> FastMCP:
+    """Drop-in replacement for FastMCP.from_openapi that goes through the catalog cache.
+
+    Args:
+        spec_path: Path of the OpenAPI spec file.
+        client: httpx client used by the generated tools.
+        name: Server name.
+        prepare: Optional function applied to the parsed spec before conversion
+            (e.g. utils.ensure_operation_ids). It is part of the cache key.
+        tool_factory: Tool class (or factory) called with the OpenAPITool arguments.
+        timeout: Optional per-request timeout for the generated tools.
+        transform: Optional function applied to every tool definition before
+            it is cached (e.g. utils.transform_catalog_entry). It is part of
+            the cache key.
+        **settings: Passed through to FastMCP (stateless_http, json_response, ...).
+    """
+    catalog, report = load_catalog(spec_path, prepare=prepare, transform=transform)
+    started = time.perf_counter()
+    mcp = materialize(catalog, client, name, tool_factory=tool_factory, timeout=timeout, **settings)
+    report["materialize_s"] = time.perf_counter() - started
+    logger.info(format_report(report, len(catalog["tools"])))
+    return mcp
+
+
+def format_report(report: dict[str, Any], tool_count: int) -> str:
+    steps = ", ".join(
+        f"{step[:-2]} {report[step] * 1000:.1f} ms"
+        for step in ("load_s", "parse_s", "compile_s", "materialize_s")
+        if step in report
+    )
+    return f"Tool catalog {report['spec']} ({report['mode']}, {tool_count} tools): {steps}"
+
+
+def _cli_build(args: argparse.Namespace) -> None:
+    prepare = ensure_operation_ids if args.operation_ids else None
+    transform = transform_catalog_entry if args.transform else None
+    for spec_path in args.specs:
+        catalog, report = load_catalog(spec_path, prepare=prepare, use_cache=False, transform=transform)
+        _write_catalog(_cache_path(Path(spec_path), report["key"], prepare, transform), catalog)
+        print(format_report(report, len(catalog["tools"])))
+
+
+def _cli_report(args: argparse.Namespace) -> None:
+    prepare = ensure_operation_ids if args.operation_ids else None
+    transform = transform_catalog_entry if args.transform else None
+    client = httpx.AsyncClient()
+    print(f"{'spec':<45} {'tools':>5} {'cold ms':>9} {'warm ms':>9} {'speedup':>8}")
+    for spec_path in args.specs:
+        # make sure the warm run really reads from the cache
+        load_catalog(spec_path, prepare=prepare, transform=transform)
+        timings = {}
+        for mode, use_cache in (("cold", False), ("warm", True)):
+            gc.collect()
+            started = time.perf_counter()
+            catalog, _ = load_catalog(spec_path, prepare=prepare, use_cache=use_cache, transform=transform)
+            materialize(catalog, client, "report")
+            timings[mode] = time.perf_counter() - started
+            tool_count = len(catalog["tools"])
+            # free this run's objects outside of the next measurement
+            del catalog
+        print(
+            f"{spec_path:<45} {tool_count:>5} {timings['cold'] * 1000:>9.1f} "
+            f"{timings['warm'] * 1000:>9.1f} {timings['cold'] / timings['warm']:>7.1f}x"
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compiled tool-catalog cache for OpenAPI MCP servers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command, func, help_text in (
+        ("build", _cli_build, "compile the catalog for each spec into CATALOG_CACHE_DIR"),
+        ("report", _cli_report, "print cold vs warm startup timings for each spec"),
+    ):
+        cmd = sub.add_parser(command, help=help_text)
+        cmd.add_argument("specs", nargs="+")
+        cmd.add_argument(
+            "--operation-ids",
+            action="store_true",
+            help="synthesize missing operationIds (as PlannedOrderMCP.py does)",
+        )
+        cmd.add_argument(
+            "--transform",
+            action="store_true",
+            help="strip links and set route tags at build time (gateway.json \"transform\")",
+        )
+        cmd.set_defaults(func=func)
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,139 @@
+"""Columnar and tabular renderings of compact OData collection results.
+
+A compact collection result is a list of objects that repeat every property
+name in every row; for the wide S/4HANA and SuccessFactors entity sets the
+names are most of the bytes. render() turns the collection body of a compact
+result into one of these formats:
+
+* "rows": unchanged, the list of objects (default);
+* "columns": ``{"columns": [...], "rows": [[...], ...]}`` with one array per
+  row in column order and null where a row has no value. String columns in
+  which values repeat often enough to save bytes (plants, units, status
+  codes, document types) are dictionary-encoded: their distinct values are
+  listed once under ``"dictionaries": {"<column>": [...]}`` and the rows hold
+  indexes into that list;
+* "csv": a header line plus one line per row, as text;
+* "markdown": the same as a Markdown table, as text.
+
+Nested values (expanded navigation properties) stay JSON values in "columns"
+and are written as compact JSON in the text formats. The other members of the
+collection (``__count``, ``__next`` and the ``__cursor``/``__remaining`` of a
+paged result) are kept next to the columns, or appended to the text formats
+as "name: value" lines after a blank line.
+
+ODataTool applies the format per tool (collection_format=, see odata.py);
+gateway.json backends choose it with "collection_format": either one format
+for every tool or a mapping of tool names to formats with "*" as default.
+"""
+
+import csv
+import io
+import json
+from typing import Any
+
+FORMATS = ("rows", "columns", "csv", "markdown")
+
+# Dictionary-encode a column only if it has at least this many rows
+_MIN_DICTIONARY_ROWS = 4
+
+
+def _columns(rows: list[Any]) -> list[str]:
+    seen: dict[str, None] = {}
+    for row in rows:
+        if isinstance(row, dict):
+            for key in row:
+                if key not in seen:
+                    seen[key] = None
+    return list(seen)
+
+
+def _dictionary(values: tuple[Any, ...]) -> list[str] | None:
+    """The distinct values of a string column if encoding them saves bytes, else None."""
+    if len(values) < _MIN_DICTIONARY_ROWS:
+        return None
+    try:
+        distinct = dict.fromkeys(values)
+    except TypeError:  # nested values
+        return None
+    distinct.pop(None, None)
+    present = len(values) - values.count(None)
+    if len(distinct) * 2 > present or not all(type(value) is str for value in distinct):
+        return None
+    plain = sum(len(value) + 2 for value in values if value is not None)
+    encoded = sum(len(value) + 3 for value in distinct) + len(str(len(distinct))) * present
+    return list(distinct) if encoded < plain else None
+
+
+def to_columns(rows: list[Any], dictionary: bool = True) -> dict[str, Any]:
+    """{"columns", "rows"[, "dictionaries"]} for a list of row objects."""
+    columns = _columns(rows)
+    table = [[row.get(column) for column in columns] if isinstance(row, dict) else [row] for row in rows]
+    out: dict[str, Any] = {"columns": columns}
+    if dictionary and table and all(isinstance(row, dict) for row in rows):
+        dictionaries = {}
+        for index, values in enumerate(zip(*table)):
+            distinct = _dictionary(values)
+            if distinct is None:
+                continue
+            positions = {value: position for position, value in enumerate(distinct)}
+            for row in table:
+                value = row[index]
+                if value is not None:
+                    row[index] = positions[value]
+            dictionaries[columns[index]] = distinct
+        if dictionaries:
+            out["dictionaries"] = dictionaries
+    out["rows"] = table
+    return out
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return str(value)
+
+
+def to_csv(rows: list[Any]) -> str:
+    columns = _columns(rows)
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(row.get(column)) for column in columns] if isinstance(row, dict) else [_cell(row)])
+    return out.getvalue()
+
+
+def _markdown_cell(value: Any) -> str:
+    return _cell(value).replace("\\", "\\\\").replace("|", "\\|").replace("\r", " ").replace("\n", " ")
+
+
+def to_markdown(rows: list[Any]) -> str:
+    columns = _columns(rows)
+    lines = [
+        "| " + " | ".join(_markdown_cell(column) for column in columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    for row in rows:
+        cells = [row.get(column) for column in columns] if isinstance(row, dict) else [row]
+        lines.append("| " + " | ".join(_markdown_cell(cell) for cell in cells) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def render(body: dict[str, Any], format: str) -> Any:
+    """A compact collection body ({"results": [...], ...}) in format; str for csv and markdown."""
+    if format == "rows":
+        return body
+    rows = body["results"]
+    rest = {key: value for key, value in body.items() if key != "results"}
+    if format == "columns":
+        return {**to_columns(rows), **rest}
+    if format not in ("csv", "markdown"):
+        raise ValueError(f"Unknown collection format {format!r}, expected one of {FORMATS}")
+    text = to_csv(rows) if format == "csv" else to_markdown(rows)
+    if rest:
+        text += "\n" + "".join(f"{key}: {_cell(value)}\n" for key, value in rest.items())
+    return text
@@ -0,0 +1,105 @@
+"""Several FastMCP backends behind one ASGI app, with a combined endpoint.
+
+mount_dd_mcp and dd_server expose every backend under its own path plus a
+combined endpoint holding the tools of all of them. CompositeGateway builds
+that without copying anything: the combined server mounts the backend servers
+(FastMCP.mount, a live prefixed view) instead of import_server-ing copies of
+their tools, so each backend has exactly one tool registry and one upstream
+client no matter how many paths serve it.
+
+Startup runs in two parallel stages: the backend servers' own lifespans first
+(FastMCP only enters a server's lifespan once, so the combined server then
+reuses them), then the session managers of all HTTP apps.
+
+    gateway = CompositeGateway({"tools1": payroll_mcp, "tools2": odata_mcp}, combined_path="/")
+    app = FastAPI(lifespan=gateway.lifespan)
+    gateway.mount(app)
+"""
+
+import asyncio
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, AsyncIterator
+
+from fastmcp import FastMCP
+from fastmcp.utilities.logging import get_logger
+from starlette.applications import Starlette
+
+from tool_list import ToolList
+
+logger = get_logger(__name__)
+
+
+async def _hold(context: AbstractAsyncContextManager, entered: asyncio.Future, stop: asyncio.Event) -> None:
+    async with context:
+        entered.set_result(None)
+        await stop.wait()
+
+
+@asynccontextmanager
+async def parallel_lifespan(*contexts: AbstractAsyncContextManager) -> AsyncIterator[None]:
+    """Enter contexts concurrently and exit them together.
+
+    Each context is entered and exited in a task of its own, as the task groups
+    inside the MCP session managers require. If one fails to start, the others
+    are shut down again and its error is raised.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    entered = [loop.create_future() for _ in contexts]
+    tasks = [asyncio.create_task(_hold(context, ready, stop)) for context, ready in zip(contexts, entered)]
+    try:
+        for task, ready in zip(tasks, entered):
+            await asyncio.wait([task, ready], return_when=asyncio.FIRST_COMPLETED)
+            if not ready.done():
+                task.result()
+                raise RuntimeError("lifespan finished before it started")
+        yield
+    finally:
+        stop.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Lifespan failed during shutdown: {result!r}")
+
+
+class CompositeGateway:
+    """Backends at /<prefix>/mcp and all of them at <combined_path>/mcp with prefixed tool names."""
+
+    def __init__(
+        self,
+        backends: dict[str, FastMCP],
+        combined_path: str | None = "/combined",
+        name: str = "combined",
+        mcp_path: str = "/mcp",
+        paths: dict[str, str] | None = None,
+        **settings: Any,
+    ):
+        self.backends = backends
+        self.combined = FastMCP(name=name, **settings)
+        for prefix, server in backends.items():
+            self.combined.mount(server, prefix=prefix)
+
+        # mount path per backend; "/<prefix>" unless given in paths
+        self.paths = {prefix: (paths or {}).get(prefix, f"/{prefix}") for prefix in backends}
+        self.combined_path = combined_path
+        servers = {self.paths[prefix]: server for prefix, server in backends.items()}
+        if combined_path is not None:
+            # last, so that a combined endpoint at "/" does not shadow the backends
+            servers[combined_path] = self.combined
+        # every endpoint answers tools/list from a precomputed listing (tool_list.py)
+        self.tool_lists = {path: ToolList(server) for path, server in servers.items()}
+        self.apps: dict[str, Starlette] = {
+            path: server.http_app(path=mcp_path, middleware=self.tool_lists[path].middleware())
+            for path, server in servers.items()
+        }
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any = None) -> AsyncIterator[None]:
+        async with parallel_lifespan(*(server._lifespan_manager() for server in self.backends.values())):
+            async with parallel_lifespan(*(sub.router.lifespan_context(sub) for sub in self.apps.values())):
+                yield
+
+    def mount(self, app: Starlette) -> None:
+        """Mount every endpoint on app; add app's own routes before calling this."""
+        for path, sub in self.apps.items():
+            app.mount(path, sub)
@@ -18,3 +18,19 @@ ADA_CONFIG = {
     'model': os.environ['ADA_MODEL'],
     'deployment_name': os.environ['ADA_DEPLOYMENT_NAME']
 }
+
+SEARCH_LIMITS = {
+    'max_concurrency': int(os.getenv('SEARCH_MAX_CONCURRENCY', '8')),
+    'timeout': float(os.getenv('SEARCH_TIMEOUT', '10'))
+}
+
+EMBEDDING_CACHE = {
+    'max_bytes': int(os.getenv('EMBEDDING_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+    'ttl': float(os.getenv('EMBEDDING_CACHE_TTL', str(7 * 24 * 3600))),
+    'dir': os.getenv('EMBEDDING_CACHE_DIR') or None
+}
+
+EMBEDDING_BATCH = {
+    'window_ms': float(os.getenv('EMBEDDING_BATCH_WINDOW_MS', '10')),
+    'max_batch': int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '16'))
+}
@@ -1,19 +1,25 @@
 import os
 import json
-import asyncio
-import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from fastmcp import FastMCP
 import uvicorn
+from catalog import build_openapi_mcp
+from composite import CompositeGateway
+from odata import ODataTool
+from pools import upstream_pools
+from response_cache import response_cache
+from metrics import tool_metrics
+from cassette import cassette
+from hedging import hedging
+from result_store import add_fetch_tool
 
 
 
 #MCP app with 2 diffrent MCP tools combined with fast api as tools1/mcp, tools2/mcp and /mcp for both
 
-async def build_apps():
+def build_gateway():
     load_dotenv()
 
     sf_headers = {
@@ -21,65 +27,63 @@ async def build_apps():
         "Accept": "application/json",
         "DataServiceVersion": "2.0",
     }
-    tools1_client = httpx.AsyncClient(
+    upstream_pools.add_layer(cassette.layer, innermost=True)
+    tools1_client = upstream_pools.client(
         base_url="https://sandbox.api.sap.com/successfactors/odata/v2",
         headers=sf_headers,
         timeout=30.0,
+        layers=[hedging.layer, tool_metrics.layer, response_cache.layer],
     )
 
-    with open("specs/simplified_payroll.json", "r", encoding="utf-8") as f:
-        tools1_spec = json.load(f)
-
-    tools1_mcp = FastMCP.from_openapi(
-        openapi_spec=tools1_spec,
+    tools1_mcp = build_openapi_mcp(
+        "specs/simplified_payroll.json",
         client=tools1_client,
+        tool_factory=ODataTool,
         name="clockinclockout",
         stateless_http=True,
         json_response=True,
     )
-    tools1_app = tools1_mcp.http_app(path="/mcp")  # -> /tools1/mcp when mounted
 
     creduser = os.getenv("CREDUSERNAME")
     credpass = os.getenv("CREDPASS")
     if not creduser or not credpass:
         raise RuntimeError("Missing env vars: CREDUSERNAME and/or CREDPASS")
 
-    odata_client = httpx.AsyncClient(
+    odata_client = upstream_pools.client(
         base_url=("https://ntt-pi-dev.it-cpi001-rt.cfapps.eu10.hana.ondemand.com/"
                   "http/df.nrw-sfd100-odata/zpp_workerassistant_srv/"),
         auth=(creduser, credpass),
         headers={"Accept": "application/json"},
         timeout=30.0,
         verify=True,
+        layers=[hedging.layer, tool_metrics.layer, response_cache.layer],
     )
 
-    with open("specs/odata_h2b.json", "r", encoding="utf-8") as f:
-        tools2_spec = json.load(f)
-
-    tools2_mcp = FastMCP.from_openapi(
-        openapi_spec=tools2_spec,
+    tools2_mcp = build_openapi_mcp(
+        "specs/odata_h2b.json",
         client=odata_client,
+        tool_factory=ODataTool,
         name="OData MCP",
         stateless_http=True,
         json_response=True,
     )
-    tools2_app = tools2_mcp.http_app(path="/mcp")  
 
-    combined = FastMCP(name="combined")
-    await combined.import_server(tools1_mcp, prefix="tools1")
-    await combined.import_server(tools2_mcp, prefix="tools2")
-    combined_app = combined.http_app(path="/mcp")  
+    add_fetch_tool(tools1_mcp)
+    add_fetch_tool(tools2_mcp)
+    tool_metrics.instrument(tools1_mcp, "tools1")
+    tool_metrics.instrument(tools2_mcp, "tools2")
 
-    return tools1_app, tools2_app, combined_app
+    # tools1/mcp and tools2/mcp serve the backends, /mcp both of them without copying their tools
+    return CompositeGateway(
+        {"tools1": tools1_mcp, "tools2": tools2_mcp}, combined_path="/", stateless_http=True, json_response=True
+    )
 
 
-def make_parent_app(tools1_app, tools2_app, combined_app):
+def make_parent_app(gateway):
     @asynccontextmanager
     async def lifespan(app: FastAPI):
-        async with tools1_app.lifespan(app):
-            async with tools2_app.lifespan(app):
-                async with combined_app.lifespan(app):
-                    yield
+        async with upstream_pools.lifespan(), gateway.lifespan(app):
+            yield
 
     app = FastAPI(lifespan=lifespan)
 
@@ -87,6 +91,16 @@ def make_parent_app(tools1_app, tools2_app, combined_app):
     async def healthz(_: Request):
         return PlainTextResponse("OK")
 
+    @app.get("/pools")
+    async def pool_stats(_: Request):
+        return JSONResponse(upstream_pools.stats())
+
+    @app.get("/response_cache")
+    async def response_cache_stats(_: Request):
+        return JSONResponse(response_cache.stats())
+
+    app.add_route("/metrics", tool_metrics.endpoint, methods=["GET"])
+
     @app.get("/")
     async def root(_: Request):
         return JSONResponse({
@@ -98,16 +112,13 @@ def make_parent_app(tools1_app, tools2_app, combined_app):
             }
         })
 
-    app.mount("/tools1", tools1_app)   
-    app.mount("/tools2", tools2_app)   
-    app.mount("/", combined_app)       
+    gateway.mount(app)
 
     return app
 
 
 if __name__ == "__main__":
-    tools1_app, tools2_app, combined_app = asyncio.run(build_apps())
-    app = make_parent_app(tools1_app, tools2_app, combined_app)
+    app = make_parent_app(build_gateway())
 
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
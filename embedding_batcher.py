@@ -0,0 +1,124 @@
+"""Micro-batching of concurrent embedding requests.
+
+When many tool calls need an embedding at the same moment each used to send its
+own single-input embeddings.create request. EmbeddingBatcher collects the texts
+that arrive within a short window (EMBEDDING_BATCH["window_ms"]), up to
+EMBEDDING_BATCH["max_batch"] texts, sends them as one list-input request and
+hands every caller its own vector. Identical texts inside a batch are sent once.
+
+A failed or cancelled request, or one that does not return one vector per
+text, fails every caller of its batch. aclose() sends what is pending and
+waits for the batches in flight; call it before closing the embedding client.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class EmbeddingBatcher:
+    def __init__(self, embed_many, window_ms=10.0, max_batch=16, history=100):
+        """
+        Args:
+            embed_many: async callable taking a list of texts and returning
+                (vectors in the same order, total prompt tokens).
+            window_ms: How long the first text of a batch waits for company.
+            max_batch: Flush as soon as this many distinct texts are pending.
+            history: Number of recent batches kept for stats().
+        """
+        self.embed_many = embed_many
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = {}  # text -> list of futures
+        self._flush_handle = None
+        self._inflight = set()
+        self.recent_batches = deque(maxlen=history)
+        self.counters = {"requests": 0, "batches": 0, "texts_sent": 0, "deduplicated": 0, "errors": 0}
+        self.batch_sizes = [0] * (max_batch + 1)
+
+    async def embed(self, text):
+        """Return (embedding, tokens attributed to this text)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.counters["requests"] += 1
+        waiters = self._pending.setdefault(text, [])
+        if waiters:
+            self.counters["deduplicated"] += 1
+        waiters.append(future)
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def aclose(self):
+        """Send the pending texts and wait for every batch in flight, e.g. before the client closes."""
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def _send(self, batch):
+        texts = list(batch)
+        started = time.perf_counter()
+        try:
+            try:
+                vectors, tokens = await self.embed_many(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Embedding request returned {len(vectors)} vectors for {len(texts)} texts")
+            except BaseException as e:
+                self.counters["errors"] += 1
+                self._fail(batch, e)
+                if isinstance(e, Exception):
+                    return
+                raise
+
+            self.counters["batches"] += 1
+            self.counters["texts_sent"] += len(texts)
+            self.batch_sizes[len(texts)] += 1
+            self.recent_batches.append({
+                "size": len(texts),
+                "callers": sum(len(waiters) for waiters in batch.values()),
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                "tokens": tokens,
+            })
+            per_text_tokens = tokens // len(texts) if texts else 0
+            for text, vector in zip(texts, vectors):
+                for future in batch[text]:
+                    if not future.done():
+                        future.set_result((vector, per_text_tokens))
+        finally:
+            # no caller waits forever, whatever went wrong above
+            self._fail(batch, RuntimeError("Embedding batch ended without a result"))
+
+    @staticmethod
+    def _fail(batch, error):
+        for waiters in batch.values():
+            for future in waiters:
+                if future.done():
+                    continue
+                if isinstance(error, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+
+    def stats(self):
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "mean_batch_size": round(self.counters["texts_sent"] / batches, 2) if batches else None,
+            "batch_size_histogram": {str(size): n for size, n in enumerate(self.batch_sizes) if n},
+            "recent_batches": list(self.recent_batches),
+        }
@@ -0,0 +1,236 @@
+"""Two-tier cache in front of the embeddings deployment.
+
+Operators ask the same handful of questions over and over, so query embeddings
+are cached by normalized query text:
+
+* an in-process LRU of float32 vectors bounded by EMBEDDING_CACHE["max_bytes"];
+* an optional on-disk store under EMBEDDING_CACHE["dir"] that survives restarts:
+  a memory-mapped file of float32 rows plus an append-only index log.
+
+Entries expire after EMBEDDING_CACHE["ttl"] seconds and are scoped to the
+ADA_CONFIG model and deployment, so switching either starts a fresh namespace.
+stats() reports hits, misses and the embedding tokens the cache saved.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import re
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+FLOAT32_BYTES = 4
+
+
+def normalize_query(text):
+    """Cache key text: NFKC, case-folded, whitespace collapsed."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class _DiskStore:
+    """Append-only float32 rows in vectors.f32, addressed through index.log.
+
+    Several worker processes may share one directory. Every writer holds the
+    flock on the directory's lock file, which is never replaced. Compaction
+    replaces both data files, so a writer that finds vectors.f32 replaced
+    reopens it and reloads the index before appending; otherwise it would
+    write to the unlinked file and log offsets into the new one.
+    """
+
+    def __init__(self, directory, ttl):
+        os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "index.log")
+        self.index = {}  # key -> (offset, dimensions, created_at, tokens)
+        self._lock_fd = os.open(os.path.join(directory, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._fd = None
+        self._mm = None
+        with self._locked():
+            self._open()
+            live_bytes = sum(dimensions * FLOAT32_BYTES for _, dimensions, _, _ in self.index.values())
+            if os.fstat(self._fd).st_size > 2 * live_bytes + 1024 * 1024:
+                self._compact()
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open(self):
+        """(Re)open vectors.f32 and load index.log; called with the lock held."""
+        self._close_files()
+        self._fd = os.open(self.vectors_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.index = {}
+        self._load_index(self.ttl)
+
+    def _reopen_if_replaced(self):
+        try:
+            replaced = os.stat(self.vectors_path).st_ino != os.fstat(self._fd).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self._open()
+
+    def _load_index(self, ttl):
+        if not os.path.exists(self.index_path):
+            return
+        size = os.fstat(self._fd).st_size
+        oldest = time.time() - ttl
+        with open(self.index_path, "r", encoding="ascii") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) != 5:
+                    continue  # torn write from a crashed process
+                key, offset, dimensions, created_at, tokens = parts
+                offset, dimensions, created_at = int(offset), int(dimensions), float(created_at)
+                if created_at < oldest:
+                    self.index.pop(key, None)
+                elif offset + dimensions * FLOAT32_BYTES <= size:
+                    self.index[key] = (offset, dimensions, created_at, int(tokens))
+
+    def _compact(self):
+        """Rewrite both files with only the live entries; called with the lock held."""
+        entries = [(key, self.get(key)) for key in self.index]
+        fd = os.open(self.vectors_path + ".tmp", os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        index = {}
+        with open(self.index_path + ".tmp", "w", encoding="ascii") as f:
+            for key, (vector, created_at, tokens) in entries:
+                offset = os.lseek(fd, 0, os.SEEK_END)
+                os.write(fd, vector.tobytes())
+                f.write(f"{key} {offset} {len(vector)} {created_at:.0f} {tokens}\n")
+                index[key] = (offset, len(vector), created_at, tokens)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        self._close_files()
+        self._fd = fd
+        self.index = index
+
+    def _view(self, end):
+        if self._mm is None or len(self._mm) < end:
+            if self._mm is not None:
+                self._mm.close()
+            self._mm = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def get(self, key):
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, dimensions, created_at, tokens = entry
+        end = offset + dimensions * FLOAT32_BYTES
+        vector = array("f")
+        vector.frombytes(self._view(end)[offset:end])
+        return vector, created_at, tokens
+
+    def put(self, key, vector, created_at, tokens):
+        data = vector.tobytes()
+        with self._locked():
+            self._reopen_if_replaced()
+            offset = os.lseek(self._fd, 0, os.SEEK_END)
+            os.write(self._fd, data)
+            with open(self.index_path, "a", encoding="ascii") as f:
+                f.write(f"{key} {offset} {len(vector)} {created_at:.0f} {tokens}\n")
+        self.index[key] = (offset, len(vector), created_at, tokens)
+
+    def _close_files(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def close(self):
+        self._close_files()
+        os.close(self._lock_fd)
+
+
+class EmbeddingCache:
+    def __init__(self, model, deployment, max_bytes=16 * 1024 * 1024, ttl=7 * 24 * 3600, directory=None):
+        self.namespace = hashlib.sha256(f"{model}|{deployment}".encode()).hexdigest()[:12]
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (vector, created_at, tokens)
+        self._memory_bytes = 0
+        self._disk = _DiskStore(os.path.join(directory, self.namespace), ttl) if directory else None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "tokens_saved": 0}
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.namespace}|{normalize_query(text)}".encode()).hexdigest()[:32]
+
+    def get(self, text):
+        """Return the cached embedding as a list of floats, or None."""
+        key = self.key(text)
+        now = time.time()
+        entry = self._memory.get(key)
+        tier = "memory_hits"
+        if entry is None and self._disk is not None:
+            entry = self._disk.get(key)
+            tier = "disk_hits"
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        vector, created_at, tokens = entry
+        if now - created_at > self.ttl:
+            self._evict(key)
+            if self._disk is not None:
+                self._disk.index.pop(key, None)
+            self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            return None
+        if tier == "memory_hits":
+            self._memory.move_to_end(key)
+        else:
+            self._remember(key, entry)
+        self.counters[tier] += 1
+        self.counters["tokens_saved"] += tokens
+        return vector.tolist()
+
+    def put(self, text, embedding, tokens=0):
+        key = self.key(text)
+        entry = (array("f", embedding), time.time(), tokens)
+        self._remember(key, entry)
+        if self._disk is not None:
+            self._disk.put(key, *entry)
+
+    def _remember(self, key, entry):
+        self._evict(key)
+        size = len(entry[0]) * FLOAT32_BYTES
+        if size > self.max_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, (vector, _, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(vector) * FLOAT32_BYTES
+
+    def _evict(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[0]) * FLOAT32_BYTES
+
+    def stats(self):
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "requests_saved": hits,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk.index) if self._disk is not None else None,
+        }
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
@@ -0,0 +1,65 @@
+"""Concurrent fan-out over independent data sources with per-source deadlines.
+
+A Source wraps one backend lookup. fan_out starts every requested source at the
+same time and cuts each one off at its own deadline (or the caller's total
+latency budget, whichever is shorter), so the answer takes as long as the
+slowest source that still makes it and a stalled source only costs its deadline.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+
+@dataclass
+class Source:
+    name: str
+    fetch: Callable[..., Awaitable[Any]]
+    timeout: float
+    count: Callable[[Any], int] = field(default=lambda value: 0)
+
+
+@dataclass
+class Outcome:
+    status: str  # "ok", "timeout" or "error"
+    value: Any = None
+    error: str | None = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    def summary(self) -> dict[str, Any]:
+        summary = {"status": self.status, "elapsed_ms": round(self.elapsed_ms, 1)}
+        if self.error:
+            summary["error"] = self.error
+        return summary
+
+
+async def _run(source: Source, kwargs: dict[str, Any], budget: float | None) -> Outcome:
+    timeout = source.timeout if budget is None else min(source.timeout, budget)
+    started = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(source.fetch(**kwargs), timeout)
+        status, error = "ok", None
+    except asyncio.TimeoutError:
+        value, status, error = None, "timeout", f"no answer within {timeout * 1000:.0f} ms"
+    except Exception as e:
+        value, status, error = None, "error", str(e)
+    return Outcome(status, value, error, (time.perf_counter() - started) * 1000)
+
+
+async def fan_out(
+    calls: dict[str, tuple[Source, dict[str, Any]]],
+    budget: float | None = None,
+) -> dict[str, Outcome]:
+    """Run every (source, kwargs) concurrently and return their outcomes by name.
+
+    Args:
+        calls: name -> (source, keyword arguments for source.fetch).
+        budget: Optional total latency budget in seconds for the whole fan-out.
+    """
+    outcomes = await asyncio.gather(*(_run(source, kwargs, budget) for source, kwargs in calls.values()))
+    return dict(zip(calls, outcomes))
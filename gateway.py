@@ -0,0 +1,271 @@
+"""All SAP backends in one process, described by gateway.json.
+
+Every backend used to be its own near-identical script (SalesOrderMCP.py,
+PlannedOrderMCP.py, ...) deployed as its own app with its own interpreter,
+fastmcp import and connection pool. The gateway builds every backend listed in
+GATEWAY_CONFIG in one process, with the shared upstream_pools and
+response_cache, and serves each at <path>/mcp plus all of them at
+<combined_path>/mcp (see composite.CompositeGateway). Adding a backend is an
+entry in the config:
+
+    "sales": {
+      "server_name": "Sales_Order_MCP",
+      "spec": "specs/API_SALES_ORDER_SRV_reduced.json",
+      "base_url_env": "sales_order_base_url",     (or "base_url": "https://...")
+      "auth": {"scheme": "basic", "user_env": "...", "password_env": "..."},
+                                                  (or {"scheme": "header", "header": "APIKey", "value_env": "..."})
+      "headers": {"Accept": "application/json"},
+      "timeout": 30.0,
+      "path": "/sales",                           (default "/<name>")
+      "batch": true,                              (add the $batch read tool)
+      "lazy": false,                              (build tools on demand, for full specs)
+      "operation_ids": false,                     (synthesize missing operationIds)
+      "transform": false,                         (strip links, route tags; see catalog.py)
+      "hedge": false,                             (hedge slow GETs, see hedging.py)
+      "collection_format": "rows",                (or "columns", "csv", "markdown", or
+                                                   {"<tool>": ..., "*": ...}; see columnar.py)
+      "output": "compact"                         (or "raw", "passthrough", or
+                                                   {"<tool>": ..., "*": ...}; see odata.py)
+    }
+
+GATEWAY_BACKENDS="sales,planned_orders" limits a deployment to some backends.
+The old scripts remain as thin wrappers that serve a single backend. Both
+modes serve through serve.serve, so SERVE_WORKERS pre-forks worker processes
+and SIGHUP reloads the config and specs.
+
+    python gateway.py
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from fastmcp import FastMCP
+from fastmcp.utilities.logging import get_logger
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+
+from cassette import cassette
+from catalog import build_openapi_mcp
+from composite import CompositeGateway
+from hedging import hedging
+from lazy_openapi import build_lazy_openapi_mcp
+from metrics import tool_metrics
+from odata import ODataTool
+from odata_batch import add_batch_tool
+from pools import upstream_pools
+from response_cache import response_cache
+from result_store import add_fetch_tool, result_store
+from serve import serve
+from tool_list import ToolList
+from utils import ensure_operation_ids, perform_tool_transformation, transform_catalog_entry
+
+logger = get_logger(__name__)
+
+GATEWAY_CONFIG = os.getenv("GATEWAY_CONFIG", "gateway.json")
+GATEWAY_BACKENDS = os.getenv("GATEWAY_BACKENDS", "")
+
+AUTH_SCHEMES = ("none", "basic", "header")
+
+
+def load_config(path: str = GATEWAY_CONFIG) -> dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    for name, backend in config.get("backends", {}).items():
+        scheme = backend.get("auth", {}).get("scheme", "none")
+        if scheme not in AUTH_SCHEMES:
+            raise ValueError(f"Backend {name}: unknown auth scheme {scheme!r}")
+        if "spec" not in backend or not ("base_url" in backend or "base_url_env" in backend):
+            raise ValueError(f"Backend {name}: 'spec' and 'base_url' or 'base_url_env' are required")
+    return config
+
+
+def selected_backends(config: dict[str, Any], only: str = GATEWAY_BACKENDS) -> dict[str, dict[str, Any]]:
+    backends = config.get("backends", {})
+    if not only.strip():
+        return backends
+    names = [name.strip() for name in only.split(",") if name.strip()]
+    unknown = [name for name in names if name not in backends]
+    if unknown:
+        raise ValueError(f"GATEWAY_BACKENDS names unknown backends: {', '.join(unknown)}")
+    return {name: backends[name] for name in names}
+
+
+def _env(name: str, variable: str) -> str:
+    value = os.getenv(variable)
+    if not value:
+        raise RuntimeError(f"Backend {name}: missing environment variable {variable}")
+    return value
+
+
+def base_url(name: str, backend: dict[str, Any]) -> str:
+    return backend["base_url"] if "base_url" in backend else _env(name, backend["base_url_env"])
+
+
+def backend_client(name: str, backend: dict[str, Any]) -> httpx.AsyncClient:
+    auth_config = backend.get("auth", {})
+    headers = dict(backend.get("headers", {}))
+    auth = None
+    if auth_config.get("scheme") == "basic":
+        auth = (_env(name, auth_config["user_env"]), _env(name, auth_config["password_env"]))
+    elif auth_config.get("scheme") == "header":
+        headers[auth_config["header"]] = _env(name, auth_config["value_env"])
+        cassette.redact_header(auth_config["header"])
+
+    options: dict[str, Any] = {}
+    if "timeout" in backend:
+        options["timeout"] = backend["timeout"]
+    upstream_pools.add_layer(cassette.layer, innermost=True)
+    return upstream_pools.client(
+        base_url=base_url(name, backend),
+        headers=headers,
+        auth=auth,
+        verify=backend.get("verify", True),
+        layers=[partial(hedging.layer, enabled=backend.get("hedge")), tool_metrics.layer, response_cache.layer],
+        **options,
+    )
+
+
+async def build_backend(name: str, backend: dict[str, Any], **settings: Any) -> FastMCP:
+    """The FastMCP server of one backend; settings go to FastMCP (e.g. lifespan)."""
+    client = backend_client(name, backend)
+    lazy = backend.get("lazy")
+    options = {"transform": transform_catalog_entry} if backend.get("transform") and not lazy else {}
+    build = build_lazy_openapi_mcp if lazy else build_openapi_mcp
+    mcp = build(
+        backend["spec"],
+        client=client,
+        tool_factory=partial(ODataTool, output=backend.get("output"),
+                             collection_format=backend.get("collection_format")),
+        prepare=ensure_operation_ids if backend.get("operation_ids") else None,
+        name=backend.get("server_name", name),
+        stateless_http=True,
+        json_response=True,
+        **options,
+        **settings,
+    )
+    if backend.get("batch"):
+        add_batch_tool(mcp, client)
+    add_fetch_tool(mcp)
+    if backend.get("transform") and lazy:
+        # lazy tools are not built from a catalog; transform them as they are built
+        await perform_tool_transformation(mcp)
+    tool_metrics.instrument(mcp, name)
+    return mcp
+
+
+async def build_gateway(config: dict[str, Any], backends: dict[str, dict[str, Any]]) -> CompositeGateway:
+    servers = {name: await build_backend(name, backend) for name, backend in backends.items()}
+    return CompositeGateway(
+        servers,
+        combined_path=config.get("combined_path"),
+        name=config.get("name", "combined"),
+        paths={name: backend["path"] for name, backend in backends.items() if "path" in backend},
+        # stateless like the backends, so with SERVE_WORKERS > 1 any worker can answer
+        stateless_http=True,
+        json_response=True,
+    )
+
+
+def status_routes(
+    backends: dict[str, dict[str, Any]], endpoints: dict[str, str]
+) -> dict[str, Callable[[Request], Awaitable[Response]]]:
+    """The health and stats routes every entry point serves, by path."""
+
+    async def healthz(_: Request) -> PlainTextResponse:
+        return PlainTextResponse("OK")
+
+    async def root(_: Request) -> JSONResponse:
+        return JSONResponse({"status": "ok", "endpoints": endpoints})
+
+    async def pool_stats(_: Request) -> JSONResponse:
+        return JSONResponse(upstream_pools.stats())
+
+    async def response_cache_stats(_: Request) -> JSONResponse:
+        return JSONResponse(response_cache.stats())
+
+    async def result_store_stats(_: Request) -> JSONResponse:
+        return JSONResponse(result_store.stats())
+
+    async def cassette_stats(_: Request) -> JSONResponse:
+        return JSONResponse(cassette.stats())
+
+    async def backend_info(_: Request) -> JSONResponse:
+        info = {}
+        for name, backend in backends.items():
+            auth = backend.get("auth", {})
+            secrets = [auth[key] for key in ("user_env", "password_env", "value_env") if key in auth]
+            info[name] = {
+                "spec": backend["spec"],
+                "base_url": backend.get("base_url") or os.getenv(backend["base_url_env"]),
+                "auth": auth.get("scheme", "none"),
+                "credentials_set": all(os.getenv(variable) for variable in secrets),
+            }
+        return JSONResponse(info)
+
+    return {
+        "/healthz": healthz,
+        "/": root,
+        "/pools": pool_stats,
+        "/response_cache": response_cache_stats,
+        "/result_store": result_store_stats,
+        "/cassette": cassette_stats,
+        "/backends": backend_info,
+        "/metrics": tool_metrics.endpoint,
+    }
+
+
+def make_app(gateway: CompositeGateway, backends: dict[str, dict[str, Any]]) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with upstream_pools.lifespan(), gateway.lifespan(app):
+            yield
+
+    app = FastAPI(lifespan=lifespan)
+    endpoints = {name: f"{path.rstrip('/')}/mcp" for name, path in gateway.paths.items()}
+    if gateway.combined_path is not None:
+        endpoints["combined"] = f"{gateway.combined_path.rstrip('/')}/mcp"
+    for path, endpoint in status_routes(backends, endpoints).items():
+        app.add_route(path, endpoint, methods=["GET"])
+    gateway.mount(app)
+    return app
+
+
+def serve_backend(name: str, **overrides: Any) -> None:
+    """Serve one backend of the config on its own at /mcp, as its old script did."""
+    load_dotenv()
+
+    def app() -> Starlette:
+        backend = {**load_config()["backends"][name], **overrides}
+        mcp = asyncio.run(build_backend(name, backend, lifespan=upstream_pools.lifespan))
+        for path, endpoint in status_routes({name: backend}, {name: "/mcp"}).items():
+            mcp.custom_route(path, methods=["GET"])(endpoint)
+        return mcp.http_app(path="/mcp", transport="streamable-http", middleware=ToolList(mcp).middleware())
+
+    port = int(os.environ.get("PORT", "8000"))
+    host = os.environ.get("HOST", "0.0.0.0")
+    serve(app, host=host, port=port)
+
+
+def main() -> None:
+    load_dotenv()
+
+    def app() -> FastAPI:
+        config = load_config()
+        backends = selected_backends(config)
+        return make_app(asyncio.run(build_gateway(config, backends)), backends)
+
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    serve(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Hedged upstream GETs, to cut the tail latency of OData reads.
+
+Most of the p99 of read tools (getWorkerGenericSet, sales order and planned
+order reads) comes from the occasional SAP Gateway request that takes many
+times longer than usual, not from the typical one. Hedging is a transport
+layer that sends a second, identical GET when the first has not answered
+within the HEDGE_PERCENTILE latency recently seen for the same resource; the
+first complete response wins and the other request is cancelled.
+
+* Only GETs without a body are hedged, and not streamed ones
+  (pools.STREAM_EXTENSION), whose body the caller reads itself. Latencies are kept per origin and
+  path with key predicates removed (A_SalesOrder('1') and A_SalesOrder('2')
+  share a history), the last HEDGE_WINDOW of them; a resource is hedged once
+  it has HEDGE_MIN_SAMPLES, never sooner than HEDGE_MIN_DELAY.
+* A budget caps the extra load: every GET earns HEDGE_BUDGET of a hedge (up
+  to HEDGE_BURST saved up) and every hedge spends one, so at most about
+  HEDGE_BUDGET of the requests are sent twice.
+* The hedge bypasses single-flight (it would otherwise join the very flight
+  it is meant to race) but not admission control, so an overloaded upstream
+  rejects hedges before primaries; a failed hedge just leaves the primary to
+  finish.
+
+Counters (requests, hedges fired, won by the hedge, skipped for lack of
+budget) are in stats() and on /metrics.
+
+It is opt-in: UPSTREAM_HEDGING=true installs it for every client with
+hedging.layer in its layers, and a gateway.json backend can set "hedge": true
+or false for its own client.
+
+Tuning via environment:
+    UPSTREAM_HEDGING      "true" to hedge GETs of every client (default false)
+    HEDGE_PERCENTILE      latency percentile after which a hedge goes out (default 95)
+    HEDGE_MIN_DELAY       lowest hedge delay in seconds (default 0.05)
+    HEDGE_BUDGET          share of requests that may be hedged (default 0.05)
+    HEDGE_BURST           hedges that can be saved up (default 10)
+    HEDGE_WINDOW          latencies kept per resource (default 200)
+    HEDGE_MIN_SAMPLES     latencies needed before a resource is hedged (default 20)
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from typing import Any
+
+import httpx
+
+from pools import STREAM_EXTENSION
+
+UPSTREAM_HEDGING = os.getenv("UPSTREAM_HEDGING", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))
+HEDGE_BURST = float(os.getenv("HEDGE_BURST", "10"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Bounds the histories clients can create by requesting made-up paths
+MAX_RESOURCES = 1000
+# Request extension that marks the second attempt (see pools.coalescing_key)
+HEDGE_EXTENSION = "hedge"
+
+# Headers that describe the wire body, not the decoded content handed out
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+_KEY_PREDICATE = re.compile(r"\([^)]*\)")
+
+
+def resource_of(request: httpx.Request) -> str:
+    url = request.url
+    return f"{url.scheme}://{url.netloc.decode()}{_KEY_PREDICATE.sub('()', url.path)}"
+
+
+class _Latencies:
+    """Recent latencies of one resource and the hedge delay derived from them."""
+
+    def __init__(self, window: int):
+        self.samples: deque[float] = deque(maxlen=window)
+        self._delay: float | None = None
+        self._stale = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._stale += 1
+
+    def delay(self, percentile: float, min_samples: int, min_delay: float) -> float | None:
+        if len(self.samples) < min_samples:
+            return None
+        if self._delay is None or self._stale >= 16:  # re-sorting a few hundred floats on every GET adds up
+            ordered = sorted(self.samples)
+            self._delay = max(min_delay, ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))])
+            self._stale = 0
+        return self._delay
+
+
+class Hedging:
+    """Latency histories, hedge budget and counters shared by the hedged clients."""
+
+    def __init__(
+        self,
+        enabled: bool = UPSTREAM_HEDGING,
+        percentile: float = HEDGE_PERCENTILE,
+        min_delay: float = HEDGE_MIN_DELAY,
+        budget: float = HEDGE_BUDGET,
+        burst: float = HEDGE_BURST,
+        window: int = HEDGE_WINDOW,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.burst = burst
+        self.window = window
+        self.min_samples = min_samples
+        self._tokens = 0.0
+        self._latencies: dict[str, _Latencies] = {}
+        self.counters = {"requests": 0, "hedged": 0, "hedge_won": 0, "over_budget": 0}
+
+    def layer(self, transport: httpx.AsyncBaseTransport, enabled: bool | None = None) -> httpx.AsyncBaseTransport:
+        """pools.TransportLayer; enabled overrides UPSTREAM_HEDGING for one client.
+
+        Put it first, so metrics and the response cache see one request however
+        many attempts it took.
+        """
+        if not (self.enabled if enabled is None else enabled):
+            return transport
+        return _HedgedTransport(self, transport)
+
+    def latencies(self, resource: str) -> _Latencies | None:
+        latencies = self._latencies.get(resource)
+        if latencies is None and len(self._latencies) < MAX_RESOURCES:
+            latencies = self._latencies[resource] = _Latencies(self.window)
+        return latencies
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.counters, "tokens": round(self._tokens, 2), "resources": len(self._latencies)}
+
+    async def _attempt(self, transport: httpx.AsyncBaseTransport, request: httpx.Request):
+        response = await transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _DROPPED_HEADERS]
+        return response.status_code, headers, content
+
+    async def request(self, transport: httpx.AsyncBaseTransport, request: httpx.Request) -> httpx.Response:
+        if (request.method != "GET" or request.headers.get("content-length", "0") != "0"
+                or request.extensions.get(STREAM_EXTENSION)):
+            return await transport.handle_async_request(request)
+        latencies = self.latencies(resource_of(request))
+        if latencies is None:
+            return await transport.handle_async_request(request)
+
+        self.counters["requests"] += 1
+        self._tokens = min(self.burst, self._tokens + self.budget)
+        started = time.perf_counter()
+        delay = latencies.delay(self.percentile, self.min_samples, self.min_delay)
+        primary = asyncio.ensure_future(self._attempt(transport, request))
+        attempts = {primary}
+        try:
+            if delay is not None:
+                await asyncio.wait(attempts, timeout=delay)
+                if not primary.done():
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.counters["hedged"] += 1
+                        hedge_request = httpx.Request(
+                            request.method, request.url, headers=request.headers,
+                            extensions={**request.extensions, HEDGE_EXTENSION: True},
+                        )
+                        attempts.add(asyncio.ensure_future(self._attempt(transport, hedge_request)))
+                    else:
+                        self.counters["over_budget"] += 1
+            winner = None
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+            winner = winner or primary  # every attempt failed: raise the primary's error
+            if winner is not primary:
+                self.counters["hedge_won"] += 1
+            status_code, headers, content = winner.result()
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # consumed, so a failed loser is not reported as unhandled
+        # the caller's latency; an abandoned slow primary is counted as no slower than that
+        latencies.add(time.perf_counter() - started)
+        return httpx.Response(status_code, headers=headers, content=content, request=request)
+
+
+class _HedgedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, hedging: Hedging, transport: httpx.AsyncBaseTransport):
+        self.hedging = hedging
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.hedging.request(self.transport, request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+hedging = Hedging()
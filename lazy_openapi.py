@@ -0,0 +1,323 @@
+"""Lazy tool materialization for the full SAP OpenAPI specs.
+
+FastMCP.from_openapi (and the compiled catalog) turn every operation of a spec
+into a parsed route, resolved schemas and a tool object at boot. For the full
+API_SALES_ORDER_SRV.json that is 158 tools, most of which a process never
+calls. build_lazy_openapi_mcp only indexes the operations at boot (method,
+path and the tool name FastMCP would give each one) and builds a tool when it
+is first needed:
+
+* a call builds just that tool, from a slice of the spec holding the operation
+  and the components it references (spec_compiler.reachable_components);
+* the first tools/list parses the whole spec once to learn every tool's
+  schema and keeps only a schema-only copy of each for later listings;
+* built tools live in an LRU of LAZY_TOOL_CACHE_SIZE entries; an evicted tool
+  is rebuilt on its next call.
+
+Boot cost is one json.loads of the spec and a pass over its paths, so startup
+no longer grows with the number of schemas. Compare with eager loading:
+
+    python lazy_openapi.py specs/API_SALES_ORDER_SRV.json specs/CE_PURCHASEREQUISITION_0001.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import httpx
+from fastmcp import FastMCP
+from fastmcp.exceptions import NotFoundError
+from fastmcp.server.openapi import OpenAPITool, _slugify
+from fastmcp.tools import Tool
+from fastmcp.tools.tool_manager import ToolManager
+from fastmcp.tools.tool_transform import apply_transformations_to_tools
+from fastmcp.utilities.logging import get_logger
+from fastmcp.utilities.openapi import (
+    HTTPRoute,
+    _combine_schemas,
+    extract_output_schema_from_responses,
+    format_description_with_responses,
+    parse_openapi_to_http_routes,
+)
+
+from catalog import SpecPrepare, load_catalog, materialize
+from spec_compiler import HTTP_METHODS, reachable_components
+
+logger = get_logger(__name__)
+
+LAZY_TOOL_CACHE_SIZE = int(os.getenv("LAZY_TOOL_CACHE_SIZE", "32"))
+
+# Fields a tools/list response needs; everything else stays with the built tool
+_LISTED_FIELDS = ("name", "title", "description", "icons", "tags", "meta", "enabled",
+                  "parameters", "output_schema", "annotations")
+
+
+@dataclass(frozen=True)
+class Operation:
+    method: str
+    path: str
+
+
+def _tool_name(path: str, method: str, operation: dict[str, Any]) -> str:
+    # Same rule as FastMCPOpenAPI._generate_default_name
+    if operation.get("operationId"):
+        name = operation["operationId"].split("__")[0]
+    else:
+        name = operation.get("summary") or f"{method.upper()}_{path}"
+    return _slugify(name)[:56]
+
+
+def index_operations(spec: dict[str, Any]) -> dict[str, Operation]:
+    """tool name -> operation, named and de-duplicated in the order FastMCP uses."""
+    index: dict[str, Operation] = {}
+    used: dict[str, int] = {}
+    for path, item in spec.get("paths", {}).items():
+        if not isinstance(item, dict):
+            continue
+        for method in HTTP_METHODS:
+            operation = item.get(method)
+            if not isinstance(operation, dict):
+                continue
+            name = _tool_name(path, method, operation)
+            used[name] = used.get(name, 0) + 1
+            if used[name] > 1:
+                name = f"{name}_{used[name]}"
+            index[name] = Operation(method, path)
+    return index
+
+
+def slice_operation(spec: dict[str, Any], operation: Operation) -> dict[str, Any]:
+    """A spec holding only operation and the components it references."""
+    item = spec["paths"][operation.path]
+    path_item = {key: value for key, value in item.items() if key == "parameters" or key == operation.method}
+    components = spec.get("components", {})
+    kept: dict[str, dict[str, Any]] = {}
+    for kind, name in sorted(reachable_components(components, path_item)):
+        kept.setdefault(kind, {})[name] = components[kind][name]
+    sliced = {key: value for key, value in spec.items() if key not in ("paths", "components", "tags")}
+    sliced["paths"] = {operation.path: path_item}
+    sliced["components"] = kept
+    return sliced
+
+
+def tool_entry(route: HTTPRoute, name: str) -> dict[str, Any]:
+    """OpenAPITool arguments for route, as FastMCPOpenAPI._create_openapi_tool computes them."""
+    return {
+        "route": route,
+        "name": name,
+        "description": format_description_with_responses(
+            base_description=route.description or route.summary or f"Executes {route.method} {route.path}",
+            responses=route.responses,
+            parameters=route.parameters,
+            request_body=route.request_body,
+        ),
+        "parameters": _combine_schemas(route),
+        "output_schema": extract_output_schema_from_responses(
+            route.responses, route.schema_definitions, route.openapi_version
+        ),
+        "tags": set(route.tags or []),
+    }
+
+
+def _listing(tool: Tool) -> Tool:
+    """Schema-only copy of tool for tools/list (no route, client or spec slice)."""
+    return Tool(**{field: getattr(tool, field) for field in _LISTED_FIELDS})
+
+
+class LazyToolManager(ToolManager):
+    """ToolManager that builds the tools of one OpenAPI spec on demand.
+
+    Tools added the regular way (add_tool, e.g. the $batch tool) are kept as
+    usual and take precedence over spec operations of the same name.
+    """
+
+    def __init__(
+        self,
+        spec: dict[str, Any],
+        build: Callable[..., Tool],
+        cache_size: int = LAZY_TOOL_CACHE_SIZE,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.spec = spec
+        self.operations = index_operations(spec)
+        self.cache_size = cache_size
+        self._build = build
+        self._built: OrderedDict[str, Tool] = OrderedDict()
+        self._listed: dict[str, Tool] = {}
+        self.counters = {"builds": 0, "hits": 0, "evictions": 0}
+
+    def materialize(self, name: str) -> Tool:
+        """The full tool for operation name, built on first use and then cached."""
+        tool = self._built.get(name)
+        if tool is not None:
+            self._built.move_to_end(name)
+            self.counters["hits"] += 1
+            return tool
+
+        operation = self.operations[name]
+        started = time.perf_counter()
+        [route] = parse_openapi_to_http_routes(slice_operation(self.spec, operation))
+        tool = self._build(**tool_entry(route, name))
+        self.counters["builds"] += 1
+        logger.debug(f"Built tool {name} ({operation.method.upper()} {operation.path}) "
+                     f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        self._listed.setdefault(name, _listing(tool))
+        self._built[name] = tool
+        while len(self._built) > self.cache_size:
+            self._built.popitem(last=False)
+            self.counters["evictions"] += 1
+        return tool
+
+    def view(self, method: str | None = None) -> "LazyTools":
+        """Read-only name -> tool mapping over the operations, building tools on access."""
+        return LazyTools(self, method)
+
+    def _list_all(self) -> None:
+        started = time.perf_counter()
+        routes = {(route.method.lower(), route.path): route for route in parse_openapi_to_http_routes(self.spec)}
+        for name, operation in list(self.operations.items()):
+            route = routes.get((operation.method, operation.path))
+            if route is None:
+                # the parser logged why; the tool stays out of listings like it would eagerly
+                self.operations.pop(name)
+            elif name not in self._listed:
+                self._listed[name] = _listing(self._build(**tool_entry(route, name)))
+        logger.info(f"Listed {len(self._listed)} lazy tools in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    async def _load_tools(self) -> dict[str, Tool]:
+        if len(self._listed) < len(self.operations):
+            self._list_all()
+        tools = {**{name: self._listed[name] for name in self.operations}, **self._tools}
+        return apply_transformations_to_tools(tools=tools, transformations=self.transformations)
+
+    async def get_tool(self, key: str) -> Tool:
+        # Look up one tool without listing (and so building) all of them
+        name = next((n for n, config in self.transformations.items() if config.name == key), key)
+        if name in self._tools:
+            tool = self._tools[name]
+        elif name in self.operations:
+            tool = self.materialize(name)
+        else:
+            raise NotFoundError(f"Tool {key!r} not found")
+        transformed = apply_transformations_to_tools(tools={name: tool}, transformations=self.transformations)
+        if key not in transformed:
+            raise NotFoundError(f"Tool {key!r} not found")
+        return transformed[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.counters,
+            "operations": len(self.operations),
+            "built": len(self._built),
+            "listed": len(self._listed),
+            "cache_size": self.cache_size,
+        }
+
+
+class LazyTools(Mapping):
+    def __init__(self, manager: LazyToolManager, method: str | None = None):
+        self.manager = manager
+        self.names = [
+            name for name, operation in manager.operations.items()
+            if method is None or operation.method == method.lower()
+        ]
+
+    def __getitem__(self, name: str) -> Tool:
+        if name not in self.names:
+            raise KeyError(name)
+        return self.manager.materialize(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def build_lazy_openapi_mcp(
+    spec_path: str | Path,
+    client: httpx.AsyncClient,
+    name: str,
+    prepare: SpecPrepare | None = None,
+    tool_factory: Callable[..., Tool] = OpenAPITool,
+    timeout: float | None = None,
+    cache_size: int = LAZY_TOOL_CACHE_SIZE,
+    **settings: Any,
+) -> FastMCP:
+    """Same arguments as catalog.build_openapi_mcp, but tools are built on demand."""
+    started = time.perf_counter()
+    spec = json.loads(Path(spec_path).read_bytes())
+    if prepare is not None:
+        spec = prepare(spec)
+
+    mcp = FastMCP(name=name, **settings)
+    regular = mcp._tool_manager
+    mcp._tool_manager = LazyToolManager(
+        spec,
+        lambda **entry: tool_factory(client=client, timeout=timeout, **entry),
+        cache_size=cache_size,
+        duplicate_behavior=regular.duplicate_behavior,
+        mask_error_details=regular.mask_error_details,
+        transformations=regular.transformations,
+    )
+    logger.info(
+        f"Lazy tool index {spec_path} ({len(mcp._tool_manager.operations)} operations): "
+        f"{(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+    return mcp
+
+
+def _measure(build: Callable[[], FastMCP], first_call: bool) -> tuple[FastMCP, float, int]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    mcp = build()
+    if first_call:
+        tool = next(iter(mcp._tool_manager.operations))
+        asyncio.run(mcp._tool_manager.get_tool(tool))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return mcp, elapsed, peak
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Boot time and peak memory of eager vs lazy OpenAPI servers")
+    parser.add_argument("specs", nargs="+")
+    args = parser.parse_args(argv)
+    client = httpx.AsyncClient()
+
+    print(f"{'spec':<45} {'tools':>5} {'eager ms':>9} {'eager MB':>9} {'lazy ms':>8} {'lazy MB':>8} "
+          f"{'+1 call ms':>10} {'list ms':>8}")
+    for spec_path in args.specs:
+        # uncached eager build, as on a boot without a prebuilt catalog
+        def eager() -> FastMCP:
+            catalog, _ = load_catalog(spec_path, use_cache=False)
+            return materialize(catalog, client, "eager")
+
+        _, eager_s, eager_peak = _measure(eager, False)
+        mcp, lazy_s, lazy_peak = _measure(lambda: build_lazy_openapi_mcp(spec_path, client, "lazy"), False)
+        _, call_s, _ = _measure(lambda: build_lazy_openapi_mcp(spec_path, client, "lazy"), True)
+        started = time.perf_counter()
+        tools = asyncio.run(mcp._tool_manager.get_tools())
+        list_s = time.perf_counter() - started
+        print(
+            f"{spec_path:<45} {len(tools):>5} {eager_s * 1000:>9.1f} {eager_peak / 2**20:>9.1f} "
+            f"{lazy_s * 1000:>8.1f} {lazy_peak / 2**20:>8.1f} {call_s * 1000:>10.1f} {list_s * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
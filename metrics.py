@@ -0,0 +1,380 @@
+"""Per-tool latency and payload metrics, served as Prometheus text at /metrics.
+
+Every server registers its FastMCP instance and upstream clients:
+
+    client = upstream_pools.client(base_url, ..., layers=[tool_metrics.layer, response_cache.layer])
+    mcp = build_openapi_mcp(...)
+    tool_metrics.instrument(mcp, "sales")
+    mcp.custom_route("/metrics", methods=["GET"])(tool_metrics.endpoint)
+
+(gateway.py does this for every backend and serves /metrics with its other
+status routes). Per server and tool that records:
+
+* calls, errors and calls in flight;
+* mcp_tool_duration_seconds by phase: "total" for the whole call,
+  "upstream" for the time at least one upstream request of the call was in
+  flight (headers and body; overlapping page prefetches count once),
+  "serialization" for building the ToolResult (JSON encoding of the result,
+  measured by ODataTool) and "processing" for everything else: argument
+  validation, request building, parsing and compaction;
+* bytes sent to and received from upstream per call, and the size of the
+  text content returned to the client (its length in characters, which is
+  the byte count for the ASCII that SAP payloads are made of).
+
+Upstream requests are attributed to the tool call they are made from through
+a context variable; requests outside a tool call are not counted per tool.
+Pool utilization (connections, active, idle and requests per upstream pool),
+admission state per upstream origin (concurrency limit, requests in flight
+and queued, circuit state as 0 closed / 1 open / 2 half-open, and admission
+counters), hedging, single-flight, response cache and result store counters
+are read at scrape time.
+
+Histograms have fixed buckets allocated once per tool; an observation is a
+bisect and three integer/float updates. Series are per process and carry a
+worker label (the pid): with serve.py's pre-forked workers each scrape is
+answered by one of them, so aggregate across workers with
+sum by (server, tool) (rate(...[5m])) rather than reading a single series.
+
+Tuning via environment:
+    METRICS_MAX_TOOLS   distinct (server, tool) series before further tool
+                        names are counted as tool="_other" (default 1000)
+"""
+
+import bisect
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator
+
+import httpx
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from admission import BREAKER_STATES
+from hedging import hedging
+from pools import upstream_pools
+from response_cache import response_cache
+from result_store import result_store
+
+METRICS_MAX_TOOLS = int(os.getenv("METRICS_MAX_TOOLS", "1000"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+PHASES = ("total", "upstream", "processing", "serialization")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+
+class Histogram:
+    """Prometheus histogram with fixed bucket bounds; observe() allocates nothing."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_les")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._les = [f"{bound:g}" for bound in bounds] + ["+Inf"]
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> Iterator[str]:
+        cumulative = 0
+        for le, count in zip(self._les, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{le}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class ToolMetrics:
+    __slots__ = ("labels", "phase_labels", "calls", "errors", "in_flight", "durations",
+                 "upstream_request_bytes", "upstream_response_bytes", "result_bytes")
+
+    def __init__(self, server: str, tool: str):
+        self.labels = _labels(server=server, tool=tool)
+        self.phase_labels = [f'{self.labels},phase="{phase}"' for phase in PHASES]
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.durations = [Histogram(LATENCY_BUCKETS) for _ in PHASES]
+        self.upstream_request_bytes = Histogram(SIZE_BUCKETS)
+        self.upstream_response_bytes = Histogram(SIZE_BUCKETS)
+        self.result_bytes = Histogram(SIZE_BUCKETS)
+
+
+class _Call:
+    """Timings of one tool call in progress, filled in by the layer and ODataTool."""
+
+    __slots__ = ("started", "upstream", "serialization", "active", "busy_since", "sent", "received")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.upstream = 0.0
+        self.serialization = 0.0
+        self.active = 0
+        self.busy_since = 0.0
+        self.sent = 0
+        self.received = 0
+
+    def upstream_started(self) -> None:
+        if not self.active:
+            self.busy_since = time.perf_counter()
+        self.active += 1
+
+    def upstream_finished(self) -> None:
+        self.active -= 1
+        if not self.active:
+            self.upstream += time.perf_counter() - self.busy_since
+
+
+_current_call: ContextVar[_Call | None] = ContextVar("tool_metrics_call", default=None)
+
+
+class _MeteredStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, call: _Call):
+        self._stream = stream
+        self._call = call
+        self._open = True
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._call.received += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        if self._open:
+            self._open = False
+            self._call.upstream_finished()
+        await self._stream.aclose()
+
+
+class _MeteredTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        call = _current_call.get()
+        if call is None:
+            return await self.transport.handle_async_request(request)
+        call.sent += len(request.url.raw_path) + int(request.headers.get("content-length", 0))
+        call.upstream_started()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            call.upstream_finished()
+            raise
+        if response.is_stream_consumed:
+            # already buffered further down (single-flight reads every body)
+            call.received += len(response.content)
+            call.upstream_finished()
+        else:
+            response.stream = _MeteredStream(response.stream, call)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class _ToolMetricsMiddleware(Middleware):
+    def __init__(self, registry: "MetricsRegistry", server: str):
+        self.registry = registry
+        self.server = server
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = self.registry.tool(self.server, context.message.name)
+        call = _Call()
+        token = _current_call.set(call)
+        tool.calls += 1
+        tool.in_flight += 1
+        result = None
+        try:
+            result = await call_next(context)
+            return result
+        except Exception:
+            tool.errors += 1
+            raise
+        finally:
+            tool.in_flight -= 1
+            _current_call.reset(token)
+            self.registry.record(tool, call, result)
+
+
+class MetricsRegistry:
+    """Per-tool counters and histograms of the servers registered with instrument()."""
+
+    def __init__(self, max_tools: int = METRICS_MAX_TOOLS):
+        self.max_tools = max_tools
+        self._tools: dict[tuple[str, str], ToolMetrics] = {}
+
+    def instrument(self, mcp: FastMCP, server: str | None = None) -> None:
+        """Record the tool calls of mcp under server (default: its name)."""
+        mcp.add_middleware(_ToolMetricsMiddleware(self, server or mcp.name))
+
+    def layer(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """pools.TransportLayer attributing upstream time and bytes to the current tool call.
+
+        Put it before response_cache.layer, so cache hits do not count as upstream time.
+        """
+        return _MeteredTransport(transport)
+
+    def serialized(self, seconds: float) -> None:
+        """Add seconds spent encoding the result of the current tool call."""
+        call = _current_call.get()
+        if call is not None:
+            call.serialization += seconds
+
+    def tool(self, server: str, name: str) -> ToolMetrics:
+        tool = self._tools.get((server, name))
+        if tool is None:
+            if len(self._tools) >= self.max_tools:
+                # bounds the series clients can create by calling made-up tool names
+                name = "_other"
+                tool = self._tools.get((server, name))
+            if tool is None:
+                tool = self._tools[(server, name)] = ToolMetrics(server, name)
+        return tool
+
+    def record(self, tool: ToolMetrics, call: _Call, result: ToolResult | None) -> None:
+        now = time.perf_counter()
+        if call.active:  # a response that was never closed
+            call.upstream += now - call.busy_since
+        total = now - call.started
+        upstream = min(call.upstream, total)
+        durations = tool.durations
+        durations[0].observe(total)
+        durations[1].observe(upstream)
+        durations[2].observe(max(0.0, total - upstream - call.serialization))
+        durations[3].observe(call.serialization)
+        tool.upstream_request_bytes.observe(call.sent)
+        tool.upstream_response_bytes.observe(call.received)
+        if result is not None:
+            size = 0
+            for block in result.content:
+                text = getattr(block, "text", None)
+                if text is not None:
+                    size += len(text)
+            tool.result_bytes.observe(size)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        tools = list(self._tools.values())
+        worker = _labels(worker=os.getpid())
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("mcp_tool_calls_total", "counter", "Tool calls.")
+        lines.extend(f"mcp_tool_calls_total{{{worker},{tool.labels}}} {tool.calls}" for tool in tools)
+        family("mcp_tool_errors_total", "counter", "Tool calls that raised an error.")
+        lines.extend(f"mcp_tool_errors_total{{{worker},{tool.labels}}} {tool.errors}" for tool in tools)
+        family("mcp_tool_in_flight", "gauge", "Tool calls in progress.")
+        lines.extend(f"mcp_tool_in_flight{{{worker},{tool.labels}}} {tool.in_flight}" for tool in tools)
+
+        family("mcp_tool_duration_seconds", "histogram",
+               "Tool call time: total, and split into upstream, processing and serialization.")
+        for tool in tools:
+            for labels, histogram in zip(tool.phase_labels, tool.durations):
+                lines.extend(histogram.render("mcp_tool_duration_seconds", f"{worker},{labels}"))
+        for attribute, help_text in (
+            ("upstream_request_bytes", "Bytes sent upstream per tool call (request target and body)."),
+            ("upstream_response_bytes", "Response body bytes received from upstream per tool call."),
+            ("result_bytes", "Size of the text content returned per tool call."),
+        ):
+            name = f"mcp_tool_{attribute}"
+            family(name, "histogram", help_text)
+            for tool in tools:
+                lines.extend(getattr(tool, attribute).render(name, f"{worker},{tool.labels}"))
+
+        pools = upstream_pools.stats()
+        for key, kind, help_text in (
+            ("connections", "gauge", "Open connections of the upstream pool."),
+            ("active", "gauge", "Connections of the upstream pool serving a request."),
+            ("idle", "gauge", "Idle keep-alive connections of the upstream pool."),
+            ("max_connections", "gauge", "Connection limit of the upstream pool."),
+            ("clients", "gauge", "Clients sharing the upstream pool."),
+            ("requests", "counter", "Requests sent through the upstream pool."),
+        ):
+            name = f"mcp_upstream_pool_{key}" + ("_total" if kind == "counter" else "")
+            family(name, kind, help_text)
+            for pool in pools["pools"]:
+                labels = _labels(worker=os.getpid(), origin=pool["origin"], auth=pool["auth"])
+                lines.append(f"{name}{{{labels}}} {pool[key]}")
+
+        if pools["admission"] is not None:
+            controllers = pools["admission"]
+            for key, kind, help_text in (
+                ("limit", "gauge", "Adaptive concurrency limit of the upstream."),
+                ("in_flight", "gauge", "Requests to the upstream holding an admission slot."),
+                ("queued", "gauge", "Requests waiting for an admission slot."),
+                ("state", "gauge", "Circuit state of the upstream: 0 closed, 1 open, 2 half-open."),
+                ("admitted", "counter", "Requests admitted to the upstream."),
+                ("waited", "counter", "Requests that had to wait for an admission slot."),
+                ("rejected", "counter", "Requests rejected as overloaded without being sent."),
+                ("queue_timeouts", "counter", "Requests rejected after waiting the queue timeout."),
+                ("failures", "counter", "Requests that failed with a timeout, connection error or 502-504."),
+                ("breaker_opened", "counter", "Times the circuit to the upstream opened."),
+            ):
+                name = f"mcp_upstream_admission_{key}" + ("_total" if kind == "counter" else "")
+                family(name, kind, help_text)
+                for controller in controllers:
+                    value = controller[key]
+                    if key == "state":
+                        value = BREAKER_STATES.index(value)
+                    lines.append(f"{name}{{{_labels(worker=os.getpid(), origin=controller['origin'])}}} {value}")
+
+        if pools["single_flight"] is not None:
+            for key, value in pools["single_flight"].items():
+                kind = "gauge" if key == "in_flight" else "counter"
+                name = f"mcp_single_flight_{key}" + ("_total" if kind == "counter" else "")
+                family(name, kind, f"Single-flight {key.replace('_', ' ')}.")
+                lines.append(f"{name}{{{worker}}} {value}")
+        for key, help_text in (
+            ("requests", "GETs sent through a hedged client."),
+            ("hedged", "Hedge requests sent because the first attempt was slow."),
+            ("hedge_won", "Hedge requests that answered before the first attempt."),
+            ("over_budget", "Slow requests not hedged because the hedge budget was spent."),
+        ):
+            family(f"mcp_hedging_{key}_total", "counter", help_text)
+            lines.append(f"mcp_hedging_{key}_total{{{worker}}} {hedging.counters[key]}")
+        for key, value in response_cache.counters.items():
+            family(f"mcp_response_cache_{key}_total", "counter", f"Response cache {key.replace('_', ' ')}.")
+            lines.append(f"mcp_response_cache_{key}_total{{{worker}}} {value}")
+        family("mcp_response_cache_bytes", "gauge", "Body bytes held by the response cache.")
+        lines.append(f"mcp_response_cache_bytes{{{worker}}} {response_cache.bytes}")
+        for key, help_text in (
+            ("stored", "Collection results split into chunks and stored for fetch_results."),
+            ("fetched", "Chunks returned by fetch_results."),
+            ("expired", "Stored results dropped after their TTL."),
+            ("evicted", "Stored results evicted to stay within the store bounds."),
+            ("unknown", "fetch_results calls with an unknown or expired cursor."),
+        ):
+            family(f"mcp_result_store_{key}_total", "counter", help_text)
+            lines.append(f"mcp_result_store_{key}_total{{{worker}}} {result_store.counters[key]}")
+        family("mcp_result_store_bytes", "gauge", "Estimated bytes of paged results held for fetch_results.")
+        lines.append(f"mcp_result_store_bytes{{{worker}}} {result_store.bytes}")
+
+        lines.append("")
+        return "\n".join(lines)
+
+    async def endpoint(self, _: Request) -> PlainTextResponse:
+        return PlainTextResponse(self.render(), media_type=CONTENT_TYPE)
+
+
+tool_metrics = MetricsRegistry()
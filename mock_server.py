@@ -3,6 +3,9 @@ import httpx
 from fastmcp import FastMCP
 from starlette.requests import Request
 from starlette.responses import JSONResponse, PlainTextResponse
+from pools import upstream_pools
+from metrics import tool_metrics
+from cassette import cassette
 
 
 #mock server with jsomplaceholder api for quick test and debugging
@@ -15,10 +18,12 @@ async def _log_request(request: httpx.Request):
 async def _log_response(response: httpx.Response):
     print("←", response.status_code, response.headers.get("content-type"))
 
-client = httpx.AsyncClient(
+upstream_pools.add_layer(cassette.layer, innermost=True)
+client = upstream_pools.client(
     base_url="https://jsonplaceholder.typicode.com",
     headers={"Accept": "application/json"},
     follow_redirects=True,
+    layers=[tool_metrics.layer],
     event_hooks={"request": [_log_request], "response": [_log_response]},
 )
 
@@ -94,8 +99,10 @@ mcp = FastMCP.from_openapi(
     client=client,
     name="JSONPlaceholder MCP Server",
     stateless_http=True,          # << disable MCP sessions
-    json_response=True            # << simpler responses for some clients
+    json_response=True,            # << simpler responses for some clients
+    lifespan=upstream_pools.lifespan,
 )
+tool_metrics.instrument(mcp)
 
 @mcp.custom_route("/healthz", methods=["GET"])
 async def healthz(_: Request) -> PlainTextResponse:
@@ -105,6 +112,12 @@ async def healthz(_: Request) -> PlainTextResponse:
 async def root(_: Request) -> JSONResponse:
     return JSONResponse({"status": "ok", "mcp_endpoint": "/mcp"})
 
+@mcp.custom_route("/pools", methods=["GET"])
+async def pool_stats(_: Request) -> JSONResponse:
+    return JSONResponse(upstream_pools.stats())
+
+mcp.custom_route("/metrics", methods=["GET"])(tool_metrics.endpoint)
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "8000"))
     host = os.environ.get("HOST", "0.0.0.0")
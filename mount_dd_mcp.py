@@ -1,34 +1,43 @@
 import os
 import json
 import asyncio
-import httpx
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
-from fastmcp import FastMCP
 import uvicorn
+from catalog import build_openapi_mcp
+from composite import CompositeGateway
+from odata import ODataTool
+from pools import upstream_pools
+from response_cache import response_cache
+from metrics import tool_metrics
+from cassette import cassette
+from hedging import hedging
+from result_store import add_fetch_tool
 
 
 async def build_single_mcp(name, base_url, spec_file, headers, auth):
-    client = httpx.AsyncClient(
+    upstream_pools.add_layer(cassette.layer, innermost=True)
+    client = upstream_pools.client(
         base_url=base_url,
         headers=headers,
         auth=auth,
         timeout=30.0,
         verify=True,
+        layers=[hedging.layer, tool_metrics.layer, response_cache.layer],
     )
 
-    with open(spec_file, "r") as f:
-        spec = json.load(f)
-
-    mcp = FastMCP.from_openapi(
-        openapi_spec=spec,
+    mcp = build_openapi_mcp(
+        spec_file,
         client=client,
+        tool_factory=ODataTool,
         name=name,
         stateless_http=True,
         json_response=True,
     )
+    add_fetch_tool(mcp)
+    tool_metrics.instrument(mcp)
 
     return mcp
 
@@ -52,7 +61,6 @@ async def build_all_mcp():
         headers=headers,
         auth=auth,
     )
-    purchase_app = purchase_mcp.http_app(path="/mcp")
 
     sales_mcp = await build_single_mcp(
         name="sales_order_MCP",
@@ -61,23 +69,20 @@ async def build_all_mcp():
         headers=headers,
         auth=auth,
     )
-    sales_app = sales_mcp.http_app(path="/mcp")
-
-    combined = FastMCP(name="combined")
-    await combined.import_server(purchase_mcp, prefix="purchase")
-    await combined.import_server(sales_mcp, prefix="sales")
-    combined_app = combined.http_app(path="/mcp")
 
-    return purchase_app, sales_app, combined_app
+    return CompositeGateway(
+        {"purchase": purchase_mcp, "sales": sales_mcp},
+        combined_path="/combined",
+        stateless_http=True,
+        json_response=True,
+    )
 
 
-def make_parent_app(purchase_app, sales_app, combined_app):
+def make_parent_app(gateway):
     @asynccontextmanager
     async def lifespan(app):
-        async with purchase_app.lifespan(app):
-            async with sales_app.lifespan(app):
-                async with combined_app.lifespan(app):
-                    yield
+        async with upstream_pools.lifespan(), gateway.lifespan(app):
+            yield
 
     app = FastAPI(lifespan=lifespan)
 
@@ -85,6 +90,16 @@ def make_parent_app(purchase_app, sales_app, combined_app):
     async def health(_: Request):
         return PlainTextResponse("OK")
 
+    @app.get("/pools")
+    async def pool_stats(_: Request):
+        return JSONResponse(upstream_pools.stats())
+
+    @app.get("/response_cache")
+    async def response_cache_stats(_: Request):
+        return JSONResponse(response_cache.stats())
+
+    app.add_route("/metrics", tool_metrics.endpoint, methods=["GET"])
+
     @app.get("/")
     async def root(_: Request):
         return JSONResponse({
@@ -96,16 +111,13 @@ def make_parent_app(purchase_app, sales_app, combined_app):
             }
         })
 
-    app.mount("/purchase", purchase_app)
-    app.mount("/sales", sales_app)
-    app.mount("/combined", combined_app)
+    gateway.mount(app)
 
     return app
 
 
 if __name__ == "__main__":
-    purchase_app, sales_app, combined_app = asyncio.run(build_all_mcp())
-    app = make_parent_app(purchase_app, sales_app, combined_app)
+    app = make_parent_app(asyncio.run(build_all_mcp()))
 
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
@@ -0,0 +1,429 @@
+"""OData v2 behaviour for the tools generated from the SAP OpenAPI specs.
+
+SAP Gateway and SuccessFactors answer large collection reads with one page of
+results plus a ``d.__next`` link (carrying a $skiptoken) to the rest. The plain
+OpenAPITool returns that first page and leaves the link for the caller to
+notice, so callers ask for a huge $top instead and the backend materializes the
+whole set in one response that easily runs into the 30 s client timeout.
+
+ODataTool follows the ``__next`` links itself. Pages come from iter_pages, an
+async generator that holds at most the page being merged and the one being
+prefetched, and fetches the next page while the current one is processed.
+Reading stops after ODATA_MAX_PAGES pages, ODATA_MAX_ROWS rows (checked at page
+boundaries) or ODATA_PAGING_DEADLINE seconds, whichever comes first; the merged
+result then still carries ``__next`` so the caller can continue from there.
+Collections larger than a chunk go to the client a chunk at a time, with a
+cursor for the fetch_results tool (see result_store.py).
+
+Responses are also compacted before they reach the MCP client: compact_loads
+parses the body and, in the same pass (a json object_hook), drops
+``__metadata`` blocks and ``__deferred`` navigation stubs, removes null and
+empty values and flattens the ``d`` and ``{"results": [...]}`` wrappers, which
+roughly halves what the LLM has to read. A collection comes back as
+``{"results": [...], "__count": ..., "__next": ...}``, an entity as its
+properties. SAP ``/Date(ms)/`` values can optionally be turned into ISO 8601.
+Servers that need the untouched OData payload pass output="raw", e.g.
+``tool_factory=functools.partial(ODataTool, output="raw")``. Compact
+collections can also go out as columns with dictionary-encoded strings, CSV or
+a Markdown table instead of a list of objects (collection_format=, see
+columnar.py), for the whole server or per tool name.
+
+Tools whose answer needs no transformation can use output="passthrough": the
+upstream body is streamed (aiter_bytes) into one buffer of at most
+ODATA_PASSTHROUGH_MAX_BYTES and handed to the client as text, without being
+parsed into Python objects and serialized again, and without paging, result
+chunking or compaction. The request carries pools.STREAM_EXTENSION, so the
+transport layers that read GET bodies whole (single-flight, response cache,
+hedging) pass it through, and the cap bounds the memory it takes. Raw output can be parsed with
+orjson instead of the json module (ODATA_JSON=orjson); compact output keeps
+json.loads, whose object_hook compacts while parsing, which measured faster
+than orjson followed by a compaction pass in Python.
+
+Tuning via environment:
+    ODATA_MAX_PAGES        pages read per tool call, 1 disables paging (default 10)
+    ODATA_MAX_ROWS         stop once this many rows were collected (default 2000)
+    ODATA_PAGING_DEADLINE  seconds before no further page is awaited (default 20)
+    ODATA_PREFETCH         "false" to fetch pages strictly one after another
+    ODATA_OUTPUT           "compact" (default), "raw" or "passthrough"
+    ODATA_PASSTHROUGH_MAX_BYTES  largest body passed through (default 32 MiB)
+    ODATA_JSON             parser of raw output: "json" (default) or "orjson"
+    ODATA_CONVERT_DATES    "true" to render /Date(...)/ values as ISO 8601
+    ODATA_COLLECTION_FORMAT  "rows" (default), "columns", "csv" or "markdown"
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable
+from urllib.parse import urlsplit
+
+import httpx
+from fastmcp.server.openapi import OpenAPITool
+from fastmcp.tools.tool import ToolResult
+from fastmcp.utilities.logging import get_logger
+
+import columnar
+from metrics import tool_metrics
+from pools import STREAM_EXTENSION
+from result_store import result_store
+
+logger = get_logger(__name__)
+
+ODATA_MAX_PAGES = int(os.getenv("ODATA_MAX_PAGES", "10"))
+ODATA_MAX_ROWS = int(os.getenv("ODATA_MAX_ROWS", "2000"))
+ODATA_PAGING_DEADLINE = float(os.getenv("ODATA_PAGING_DEADLINE", "20"))
+ODATA_PREFETCH = os.getenv("ODATA_PREFETCH", "true").lower() in ("1", "true", "yes")
+ODATA_OUTPUT = os.getenv("ODATA_OUTPUT", "compact").lower()
+ODATA_CONVERT_DATES = os.getenv("ODATA_CONVERT_DATES", "false").lower() in ("1", "true", "yes")
+ODATA_COLLECTION_FORMAT = os.getenv("ODATA_COLLECTION_FORMAT", "rows").lower()
+ODATA_PASSTHROUGH_MAX_BYTES = int(os.getenv("ODATA_PASSTHROUGH_MAX_BYTES", str(32 * 1024 * 1024)))
+ODATA_JSON = os.getenv("ODATA_JSON", "json").lower()
+
+OUTPUT_MODES = ("compact", "raw", "passthrough")
+
+if ODATA_JSON == "orjson" and importlib.util.find_spec("orjson") is None:
+    logger.warning("ODATA_JSON=orjson but the orjson package is not installed; using json")
+    ODATA_JSON = "json"
+if ODATA_JSON == "orjson":
+    import orjson
+
+    _loads = orjson.loads  # its JSONDecodeError subclasses json's
+else:
+    _loads = json.loads
+
+_SAP_DATE = re.compile(r"/Date\((-?\d+)([+-]\d{4})?\)/")
+_MS_PER_DAY = 86_400_000
+
+
+@dataclass(frozen=True)
+class PagingOptions:
+    max_pages: int = field(default_factory=lambda: ODATA_MAX_PAGES)
+    max_rows: int = field(default_factory=lambda: ODATA_MAX_ROWS)
+    deadline: float = field(default_factory=lambda: ODATA_PAGING_DEADLINE)
+    prefetch: bool = field(default_factory=lambda: ODATA_PREFETCH)
+
+
+def sap_date(value: str) -> str:
+    """'/Date(1492041600000)/' -> '2017-04-13'; with a time of day -> '...T10:31:04Z'."""
+    match = _SAP_DATE.fullmatch(value)
+    if match is None:
+        return value
+    ms = int(match.group(1))
+    stamp = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    if ms % _MS_PER_DAY == 0:
+        return stamp.date().isoformat()
+    return stamp.isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def _compactor(convert_dates: bool) -> Callable[[dict[str, Any]], Any]:
+    def compact(obj: dict[str, Any]) -> Any:
+        # Called innermost object first, so nested values are already compact
+        if "__deferred" in obj:
+            return None
+        out = {}
+        for key, value in obj.items():
+            if key == "__metadata":
+                continue
+            if value is None or value == "" or value == [] or value == {}:
+                if key not in ("d", "results"):
+                    continue
+            elif convert_dates and type(value) is str and value.startswith("/Date("):
+                value = sap_date(value)
+            out[key] = value
+        if len(out) == 1 and type(out.get("results")) is list:
+            return out["results"]
+        return out
+
+    return compact
+
+
+_COMPACT = {flag: _compactor(flag) for flag in (False, True)}
+
+
+def compact_loads(data: str | bytes, convert_dates: bool = False) -> Any:
+    """Parse an OData v2 JSON body straight into its compact form."""
+    payload = json.loads(data, object_hook=_COMPACT[convert_dates])
+    if isinstance(payload, dict) and len(payload) == 1 and "d" in payload:
+        payload = payload["d"]
+    if isinstance(payload, list):
+        payload = {"results": payload}
+    return payload
+
+
+def collection_of(payload: Any) -> dict[str, Any] | None:
+    """The object holding results/__next of a collection response, or None.
+
+    That is ``d`` for raw payloads and the payload itself for compact ones.
+    """
+    if not isinstance(payload, dict):
+        return None
+    body = payload.get("d", payload)
+    if isinstance(body, dict) and isinstance(body.get("results"), list):
+        return body
+    return None
+
+
+def next_link(payload: Any) -> str | None:
+    body = collection_of(payload)
+    return body.get("__next") if body is not None else None
+
+
+async def iter_pages(
+    first: dict[str, Any],
+    fetch: Callable[[str], Awaitable[dict[str, Any]]],
+    max_pages: int,
+    prefetch: bool = True,
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield the collection pages starting at first, following ``__next``.
+
+    fetch(link) returns the parsed response for a next link. With prefetch the
+    request for page n+1 is already in flight while page n is being consumed.
+    Closing the generator early cancels a prefetch that is still running.
+    """
+    page, pages, pending = first, 1, None
+    try:
+        while True:
+            link = next_link(page)
+            if link and pages < max_pages and prefetch:
+                pending = asyncio.ensure_future(fetch(link))
+            yield page
+            if not link or pages >= max_pages:
+                return
+            page = await (pending if pending is not None else fetch(link))
+            pending = None
+            pages += 1
+    finally:
+        if pending is not None:
+            if not pending.done():
+                pending.cancel()
+            elif not pending.cancelled():
+                pending.exception()  # consumed, so a failed prefetch is not reported as unhandled
+
+
+class _RequestCaptured(Exception):
+    def __init__(self, request: dict[str, Any]):
+        super().__init__("request captured")
+        self.request = request
+
+
+class _CaptureClient:
+    """Stands in for the httpx client inside OpenAPITool.run.
+
+    OpenAPITool.run turns tool arguments into path, query, headers and body;
+    ODataTool reuses that by letting run() hand the finished request to this
+    stub and executing it against the real upstream client itself.
+    """
+
+    async def request(self, **request: Any) -> httpx.Response:
+        raise _RequestCaptured(request)
+
+
+_CAPTURE = _CaptureClient()
+
+
+class ODataTool(OpenAPITool):
+    """OpenAPITool that pages through OData v2 collections and compacts the results.
+
+    Accepts the OpenAPITool arguments plus ``paging`` (PagingOptions), ``output``
+    (one of OUTPUT_MODES), ``convert_dates`` and ``collection_format`` (one of
+    columnar.FORMATS); output and collection_format also take a mapping of
+    tool names to values with "*" as the default. So it can be passed as
+    tool_factory to catalog.build_openapi_mcp directly or through
+    functools.partial for per-server and per-tool settings.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        *args: Any,
+        paging: PagingOptions | None = None,
+        output: str | dict[str, str] | None = None,
+        convert_dates: bool | None = None,
+        collection_format: str | dict[str, str] | None = None,
+        **kwargs: Any,
+    ):
+        super().__init__(client, *args, **kwargs)
+        self._upstream = client
+        self._client = _CAPTURE
+        self._paging = paging or PagingOptions()
+        if isinstance(output, dict):
+            output = output.get(self.name, output.get("*"))
+        self._output = output or ODATA_OUTPUT
+        if self._output not in OUTPUT_MODES:
+            raise ValueError(f"Unknown OData output mode {self._output!r}, expected one of {OUTPUT_MODES}")
+        self._convert_dates = ODATA_CONVERT_DATES if convert_dates is None else convert_dates
+        if isinstance(collection_format, dict):
+            collection_format = collection_format.get(self.name, collection_format.get("*"))
+        self._collection_format = collection_format or ODATA_COLLECTION_FORMAT
+        if self._collection_format not in columnar.FORMATS:
+            raise ValueError(f"Unknown collection format {self._collection_format!r}, "
+                             f"expected one of {columnar.FORMATS}")
+        if self._output != "compact":
+            self._collection_format = "rows"  # the formats work on compact collections
+        if self._output != "raw":
+            # The spec's output schemas describe the raw d/results envelope
+            self.output_schema = None
+        match = re.match(r"/?([^/(?]+)", self._route.path)
+        self._entity_set = match.group(1) if match else None
+
+    async def build_request(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Keyword arguments for httpx.AsyncClient.request for these tool arguments."""
+        try:
+            await super().run(arguments)
+        except _RequestCaptured as captured:
+            return captured.request
+        raise RuntimeError(f"{self.name}: OpenAPITool.run did not issue a request")
+
+    async def run(self, arguments: dict[str, Any]) -> ToolResult:
+        request = await self.build_request(arguments)
+        try:
+            if self._output == "passthrough":
+                return await self._pass_through(request)
+            response = await self._send(request)
+            try:
+                result = self.parse(response.content)
+            except json.JSONDecodeError:
+                return ToolResult(content=response.text)
+            if request["method"] == "GET":
+                if next_link(result):
+                    result = await self._read_pages(result, request)
+                result = result_store.first_chunk(result, collection_of(result), self._collection_format)
+            started = time.perf_counter()
+            if self._collection_format != "rows" and collection_of(result) is not None:
+                result = columnar.render(result, self._collection_format)
+            tool_result = self._tool_result(result)
+            tool_metrics.serialized(time.perf_counter() - started)
+            return tool_result
+        except httpx.HTTPStatusError as e:
+            error_message = f"HTTP error {e.response.status_code}: {e.response.reason_phrase}"
+            try:
+                error_message += f" - {e.response.json()}"
+            except (json.JSONDecodeError, ValueError):
+                if e.response.text:
+                    error_message += f" - {e.response.text}"
+            raise ValueError(error_message) from e
+        except httpx.RequestError as e:
+            raise ValueError(f"Request error: {e!s}") from e
+
+    def parse(self, content: str | bytes) -> Any:
+        """Decode a successful response body in this tool's output mode (passthrough: as raw)."""
+        if self._output == "compact":
+            return compact_loads(content, self._convert_dates)
+        return _loads(content)
+
+    async def _send(self, request: dict[str, Any]) -> httpx.Response:
+        response = await self._upstream.request(**request)
+        response.raise_for_status()
+        return response
+
+    async def _pass_through(self, request: dict[str, Any]) -> ToolResult:
+        upstream = self._upstream
+        # marked, so that no transport layer reads the whole body before the cap applies
+        built = upstream.build_request(**request, extensions={STREAM_EXTENSION: True})
+        response = await upstream.send(built, stream=True)
+        try:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            limit = ODATA_PASSTHROUGH_MAX_BYTES
+            length = response.headers.get("content-length", "")
+            too_large = length.isdigit() and int(length) > limit
+            body = bytearray()
+            if not too_large:
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > limit:
+                        too_large = True
+                        break
+            if too_large:
+                raise ValueError(f"{self.name}: response larger than {limit} bytes; narrow it down "
+                                 f"with $top, $select or $filter")
+        finally:
+            await response.aclose()
+        started = time.perf_counter()
+        tool_result = ToolResult(content=body.decode("utf-8", errors="replace"))
+        tool_metrics.serialized(time.perf_counter() - started)
+        return tool_result
+
+    def _tool_result(self, result: Any) -> ToolResult:
+        if isinstance(result, str):
+            return ToolResult(content=result)
+        if self.output_schema is not None:
+            if self.output_schema.get("x-fastmcp-wrap-result"):
+                return ToolResult(structured_content={"result": result})
+            return ToolResult(structured_content=result)
+        if not isinstance(result, dict):
+            return ToolResult(structured_content={"result": result})
+        return ToolResult(structured_content=result)
+
+    def _rebase(self, link: str) -> str:
+        """Make a ``__next`` link relative to the client's service root.
+
+        Behind CPI or a reverse proxy the backend reports its own host in the
+        link, which the MCP server usually cannot reach; the part from the
+        entity set onwards is the same either way.
+        """
+        parts = urlsplit(link)
+        if self._entity_set:
+            start = parts.path.find(f"/{self._entity_set}")
+            if start >= 0:
+                path = parts.path[start:]
+                return f"{path}?{parts.query}" if parts.query else path
+        return link
+
+    async def _read_pages(self, first: dict[str, Any], request: dict[str, Any]) -> dict[str, Any]:
+        options = self._paging
+        deadline = time.monotonic() + options.deadline
+        page_request = {
+            "method": "GET",
+            "headers": request.get("headers"),
+            "timeout": request.get("timeout"),
+        }
+
+        async def fetch(link: str) -> dict[str, Any]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            response = await asyncio.wait_for(
+                self._send({**page_request, "url": self._rebase(link)}), remaining
+            )
+            return self.parse(response.content)
+
+        merged = dict(collection_of(first))
+        rows: list[Any] = []
+        pages = 0
+        stream = iter_pages(first, fetch, options.max_pages, options.prefetch)
+        try:
+            while True:
+                try:
+                    page = await stream.__anext__()
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    logger.info(f"{self.name}: paging deadline of {options.deadline:g}s reached after {pages} pages")
+                    break
+                except (httpx.HTTPStatusError, httpx.RequestError) as e:
+                    # Keep the pages already read; __next still points at the failed one
+                    logger.warning(f"{self.name}: stopped paging after {pages} pages: {e}")
+                    break
+                body = collection_of(page)
+                if body is None:
+                    break
+                pages += 1
+                rows.extend(body["results"])
+                merged["__next"] = body.get("__next")
+                if len(rows) >= options.max_rows:
+                    break
+        finally:
+            await stream.aclose()
+
+        merged["results"] = rows
+        if not merged["__next"]:
+            del merged["__next"]
+        logger.debug(f"{self.name}: merged {pages} pages, {len(rows)} rows")
+        return {**first, "d": merged} if "d" in first else merged
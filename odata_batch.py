@@ -0,0 +1,211 @@
+"""OData v2 $batch tool for the SAP backends.
+
+Looking up ten planned or sales orders used to take ten tool calls and ten HTTP
+round trips to S/4HANA. add_batch_tool registers one extra tool on a server
+built from a spec: it takes a list of read operations, each naming one of the
+server's generated GET tools plus its arguments, turns them into the same
+requests those tools would send and ships them as multipart/mixed $batch
+requests. The multipart response is split back into one result per operation,
+in input order, with per-item errors instead of failing the whole call.
+
+Lists longer than ODATA_BATCH_SIZE operations are split into several $batch
+requests, at most ODATA_BATCH_CONCURRENCY of them in flight at once.
+"""
+
+import asyncio
+import json
+import os
+import re
+import uuid
+from collections.abc import Mapping
+from typing import Annotated, Any
+from urllib.parse import quote, urlencode
+
+import httpx
+from fastmcp import FastMCP
+from fastmcp.tools import Tool
+from fastmcp.utilities.logging import get_logger
+from pydantic import BaseModel, Field
+
+from lazy_openapi import LazyToolManager
+from odata import ODataTool
+
+logger = get_logger(__name__)
+
+ODATA_BATCH_SIZE = int(os.getenv("ODATA_BATCH_SIZE", "20"))
+ODATA_BATCH_CONCURRENCY = int(os.getenv("ODATA_BATCH_CONCURRENCY", "4"))
+
+_BLANK_LINE = re.compile(r"\r?\n\r?\n")
+
+
+class ReadOperation(BaseModel):
+    tool: str = Field(description="Name of one of this server's read tools")
+    arguments: dict[str, Any] = Field(default_factory=dict, description="Arguments for that tool")
+
+
+def encode_batch(urls: list[str], boundary: str) -> bytes:
+    """multipart/mixed body with one GET part per (service-relative) URL."""
+    parts = []
+    for url in urls:
+        parts.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            "Content-Transfer-Encoding: binary\r\n"
+            "\r\n"
+            f"GET {url} HTTP/1.1\r\n"
+            "Accept: application/json\r\n"
+            "\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n")
+    return "\r\n".join(parts).encode()
+
+
+def decode_batch(response: httpx.Response) -> list[tuple[int, str]]:
+    """(status, body text) per part of a multipart/mixed $batch response."""
+    match = re.search(r'boundary="?([^";]+)"?', response.headers.get("content-type", ""))
+    if not match:
+        raise ValueError("$batch response is not multipart/mixed")
+    delimiter = f"--{match.group(1)}"
+    results = []
+    for part in response.text.split(delimiter)[1:]:
+        if part.startswith("--"):
+            break
+        # part headers, blank line, HTTP status line + headers, blank line, body
+        sections = _BLANK_LINE.split(part.strip("\r\n"), maxsplit=2)
+        if len(sections) < 2:
+            continue
+        status_line = sections[1].splitlines()[0]
+        status = int(status_line.split()[1])
+        results.append((status, sections[2].strip() if len(sections) > 2 else ""))
+    return results
+
+
+def _error_message(text: str) -> str:
+    # SAP Gateway: {"error": {"code": ..., "message": {"lang": ..., "value": ...}}}
+    try:
+        body = json.loads(text)
+    except json.JSONDecodeError:
+        return text
+    if isinstance(body, dict) and isinstance(body.get("error"), dict):
+        message = body["error"].get("message")
+        if isinstance(message, dict):
+            return message.get("value", "")
+        return str(message)
+    return str(body)
+
+
+class ODataBatch:
+    """Sends read operations for the tools of one server as $batch requests."""
+
+    def __init__(self, client: httpx.AsyncClient, tools: Mapping[str, ODataTool],
+                 batch_size: int = ODATA_BATCH_SIZE, concurrency: int = ODATA_BATCH_CONCURRENCY):
+        self.client = client
+        self.tools = tools
+        self.batch_size = batch_size
+        self._slots = asyncio.Semaphore(concurrency)
+        self._csrf_token: str | None = None
+
+    async def _fetch_csrf_token(self) -> str:
+        response = await self.client.get("", headers={"X-CSRF-Token": "Fetch"})
+        self._csrf_token = response.headers.get("x-csrf-token", "")
+        return self._csrf_token
+
+    async def _post(self, urls: list[str]) -> list[tuple[int, str]]:
+        boundary = f"batch_{uuid.uuid4().hex}"
+        body = encode_batch(urls, boundary)
+        for attempt in range(2):
+            token = self._csrf_token if self._csrf_token is not None else await self._fetch_csrf_token()
+            response = await self.client.post(
+                "$batch",
+                content=body,
+                headers={
+                    "Content-Type": f"multipart/mixed; boundary={boundary}",
+                    "Accept": "multipart/mixed",
+                    "X-CSRF-Token": token,
+                },
+            )
+            if response.status_code == 403 and response.headers.get("x-csrf-token", "").lower() == "required" and not attempt:
+                self._csrf_token = None  # expired with the backend session
+                continue
+            response.raise_for_status()
+            results = decode_batch(response)
+            if len(results) != len(urls):
+                raise ValueError(f"$batch returned {len(results)} parts for {len(urls)} operations")
+            return results
+
+    async def _send_chunk(self, urls: list[str]) -> list[tuple[int, str]]:
+        async with self._slots:
+            try:
+                return await self._post(urls)
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning(f"$batch of {len(urls)} operations failed: {e}")
+                return [(0, f"$batch request failed: {e}")] * len(urls)
+
+    async def _url_for(self, operation: ReadOperation) -> str:
+        tool = self.tools.get(operation.tool)
+        if tool is None:
+            raise ValueError(f"Unknown read tool '{operation.tool}'")
+        request = await tool.build_request(operation.arguments)
+        # OpenAPITool puts path parameters in as they are; encode them as httpx
+        # would for the tool's own request, since they end up in a request line
+        path = quote(request["url"].lstrip("/"), safe="/()',=")
+        # Gateway expects the system query options as literal $select, $filter, ...
+        params = httpx.QueryParams(request.get("params") or {}).multi_items()
+        query = urlencode(params, quote_via=quote, safe="$'(),")
+        return f"{path}?{query}" if query else path
+
+    async def read(self, operations: list[ReadOperation]) -> list[dict[str, Any]]:
+        results: list[dict[str, Any] | None] = [None] * len(operations)
+        queued: list[tuple[int, str]] = []
+        for index, operation in enumerate(operations):
+            try:
+                queued.append((index, await self._url_for(operation)))
+            except Exception as e:
+                results[index] = {"index": index, "tool": operation.tool, "status": None, "error": str(e)}
+
+        chunks = [queued[i:i + self.batch_size] for i in range(0, len(queued), self.batch_size)]
+        answers = await asyncio.gather(*(self._send_chunk([url for _, url in chunk]) for chunk in chunks))
+        for chunk, answer in zip(chunks, answers):
+            for (index, _), (status, body) in zip(chunk, answer):
+                tool = self.tools[operations[index].tool]
+                item = {"index": index, "tool": tool.name, "status": status or None}
+                if 200 <= status < 300:
+                    try:
+                        item["result"] = tool.parse(body) if body else None
+                    except json.JSONDecodeError:
+                        item["result"] = body
+                else:
+                    item["error"] = _error_message(body)
+                results[index] = item
+        return results
+
+
+def add_batch_tool(mcp: FastMCP, client: httpx.AsyncClient, name: str = "batch_read", **options: Any) -> ODataBatch:
+    """Register a $batch read tool covering every GET tool currently on mcp."""
+    if isinstance(mcp._tool_manager, LazyToolManager):
+        tools = mcp._tool_manager.view("GET")
+    else:
+        tools = {
+            tool.name: tool
+            for tool in mcp._tool_manager._tools.values()
+            if isinstance(tool, ODataTool) and tool._route.method == "GET"
+        }
+    batch = ODataBatch(client, tools, **options)
+
+    async def batch_read(
+        operations: Annotated[list[ReadOperation], Field(description="Read operations, answered in this order")],
+    ) -> dict[str, Any]:
+        return {"results": await batch.read(operations)}
+
+    mcp.add_tool(Tool.from_function(
+        batch_read,
+        name=name,
+        description=(
+            "Run several read operations in one OData $batch round trip. Each operation names "
+            "one of these tools with its usual arguments: " + ", ".join(sorted(tools)) + ". "
+            "Results come back in the same order; a failed operation carries 'error' instead "
+            "of 'result' and does not affect the others."
+        ),
+        tags={"batch"},
+    ))
+    return batch
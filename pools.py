@@ -0,0 +1,291 @@
+"""Shared, tuned upstream connection pools.
+
+Every backend used to get its own httpx.AsyncClient with default limits, even
+when several of them talk to the same S/4HANA host with the same credentials.
+PoolRegistry keeps one pooled transport per (origin, auth identity, TLS
+verification) and hands out thin clients on top of it, so purchase_req and
+sales_order traffic to the same host reuses the same warm TLS connections.
+
+Clients handed out by the registry never close the shared pool themselves; the
+registry does that in its lifespan (pass ``lifespan=upstream_pools.lifespan`` to
+FastMCP, or enter it from the parent app lifespan). A closed pool reopens on the
+next request, so in-memory test clients that run the lifespan repeatedly keep
+working.
+
+Identical GETs that are already in flight (same URL, query, Accept header and
+credentials) share one upstream call through a singleflight.SingleFlight layer
+under every client; its counters are part of stats(). Below it, an
+admission.AdmissionControl layer limits the requests in flight per upstream
+origin and breaks the circuit to an upstream that keeps failing; its
+per-origin state is part of stats() as well.
+
+Connections never cross a fork: a process forked from one that built the
+clients (serve.py's pre-fork workers) starts with empty pools of its own and
+opens its own connections, while the clients and tools built before the fork
+keep working.
+
+Tuning via environment:
+    UPSTREAM_MAX_CONNECTIONS   max connections per pool (default 50)
+    UPSTREAM_MAX_KEEPALIVE     max idle keep-alive connections per pool (default 20)
+    UPSTREAM_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 60)
+    UPSTREAM_HTTP2             "true" to negotiate HTTP/2 (needs the h2 package)
+    UPSTREAM_SINGLE_FLIGHT     "false" to send every request upstream on its own
+    UPSTREAM_ADMISSION         "false" to turn off admission control (see admission.py)
+"""
+
+import hmac
+import importlib.util
+import os
+import secrets
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterable
+
+import httpx
+from fastmcp.utilities.logging import get_logger
+
+from admission import AdmissionControl
+from singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "50"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "false").lower() in ("1", "true", "yes")
+UPSTREAM_SINGLE_FLIGHT = os.getenv("UPSTREAM_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+UPSTREAM_ADMISSION = os.getenv("UPSTREAM_ADMISSION", "true").lower() in ("1", "true", "yes")
+
+# Request extension of responses the caller streams (odata passthrough): the
+# layers that read whole bodies (single-flight, response cache, hedging) let
+# such requests through untouched
+STREAM_EXTENSION = "stream"
+
+# Headers that carry credentials and therefore separate pools
+AUTH_HEADERS = ("authorization", "apikey")
+
+TransportLayer = Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]
+
+# Keys the credential identities; per process (shared by pre-forked workers), so
+# an identity shown on /pools or /metrics cannot be checked against guessed passwords
+_IDENTITY_KEY = secrets.token_bytes(16)
+
+
+def _identity(credentials: str) -> str:
+    return hmac.new(_IDENTITY_KEY, credentials.encode(), "sha256").hexdigest()[:12]
+
+
+def auth_identity(auth: Any, headers: dict[str, str] | None) -> str:
+    """Short identity of the credentials used by a client, keyed per process (see _IDENTITY_KEY)."""
+    parts = []
+    if isinstance(auth, tuple):
+        parts.append("basic:" + ":".join(str(p) for p in auth))
+    elif auth is not None:
+        parts.append(f"{type(auth).__name__}:{id(auth)}")
+    for name, value in (headers or {}).items():
+        if name.lower() in AUTH_HEADERS and value is not None:
+            parts.append(f"{name.lower()}:{value}")
+    if not parts:
+        return "anonymous"
+    return _identity("\n".join(parts))
+
+
+def request_identity(request: httpx.Request) -> str:
+    """Credential identity of a request as it goes out (after httpx applied auth)."""
+    credentials = "\n".join(f"{name}:{request.headers.get(name, '')}" for name in AUTH_HEADERS)
+    return _identity(credentials)
+
+
+def coalescing_key(request: httpx.Request) -> str | None:
+    """Requests with equal keys may share one upstream call; None for non-idempotent ones."""
+    if request.method != "GET" or request.extensions.get("hedge"):
+        return None  # a hedge (see hedging.py) must not join the flight it races
+    if request.extensions.get(STREAM_EXTENSION):
+        return None  # a flight reads the whole body before anyone gets it
+    headers = request.headers
+    return "|".join((
+        request_identity(request),
+        headers.get("accept", ""),
+        headers.get("if-none-match", ""),  # a revalidation must not get a plain GET's answer, or vice versa
+        str(request.url),
+    ))
+
+
+class _Pool:
+    """One httpcore connection pool, (re)opened on demand."""
+
+    def __init__(self, registry: "PoolRegistry", origin: str, identity: str, verify: Any):
+        self.registry = registry
+        self.origin = origin
+        self.identity = identity
+        self.verify = verify
+        self.clients = 0
+        self.requests = 0
+        self._transport: httpx.AsyncHTTPTransport | None = None
+
+    @property
+    def transport(self) -> httpx.AsyncHTTPTransport:
+        if self._transport is None:
+            self._transport = httpx.AsyncHTTPTransport(
+                verify=self.verify,
+                http2=self.registry.http2,
+                limits=httpx.Limits(
+                    max_connections=self.registry.max_connections,
+                    max_keepalive_connections=self.registry.max_keepalive,
+                    keepalive_expiry=self.registry.keepalive_expiry,
+                ),
+            )
+        return self._transport
+
+    def stats(self) -> dict[str, Any]:
+        connections = self._transport._pool.connections if self._transport else []
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "origin": self.origin,
+            "auth": self.identity,
+            "clients": self.clients,
+            "requests": self.requests,
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "max_connections": self.registry.max_connections,
+        }
+
+    async def aclose(self) -> None:
+        transport, self._transport = self._transport, None
+        if transport is not None:
+            await transport.aclose()
+
+    def forget(self) -> None:
+        """Drop the pool without closing it; its connections belong to another process."""
+        self._transport = None
+        self.requests = 0
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """A client's view onto a shared pool; closing the client leaves the pool open."""
+
+    def __init__(self, pool: _Pool):
+        self._pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._pool.requests += 1
+        return await self._pool.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class PoolRegistry:
+    """Hands out httpx clients that share one pool per (host, auth) pair."""
+
+    def __init__(
+        self,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive: int = UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry: float = UPSTREAM_KEEPALIVE_EXPIRY,
+        http2: bool = UPSTREAM_HTTP2,
+        single_flight: bool = UPSTREAM_SINGLE_FLIGHT,
+        admission: bool = UPSTREAM_ADMISSION,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("UPSTREAM_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.layers: list[TransportLayer] = []
+        self.admission = AdmissionControl() if admission else None
+        if self.admission is not None:
+            self.layers.append(self.admission.layer)
+        self.single_flight = SingleFlight(coalescing_key) if single_flight else None
+        if self.single_flight is not None:
+            self.layers.append(self.single_flight.layer)
+        self._pools: dict[tuple[str, str, Any], _Pool] = {}
+
+    def add_layer(self, layer: TransportLayer, innermost: bool = False) -> None:
+        """Wrap the transport of every client handed out from now on.
+
+        The layer goes outside the registry layers already installed, or under
+        all of them, right above the connection pool, with innermost. A layer
+        that is already installed is not added again.
+        """
+        if layer in self.layers:
+            return
+        if innermost:
+            self.layers.insert(0, layer)
+        else:
+            self.layers.append(layer)
+
+    def client(
+        self,
+        base_url: str | None = "",
+        *,
+        auth: Any = None,
+        headers: dict[str, str] | None = None,
+        verify: Any = True,
+        layers: Iterable[TransportLayer] = (),
+        **kwargs: Any,
+    ) -> httpx.AsyncClient:
+        """Create an AsyncClient whose connections come from the shared pool.
+
+        Args:
+            base_url: Base URL of the backend; its origin selects the pool.
+            auth: httpx auth (e.g. a (user, password) tuple); part of the pool key.
+            headers: Default headers; credential headers are part of the pool key.
+            verify: TLS verification setting of the pool.
+            layers: Per-client transport wrappers, applied outside the registry layers.
+            **kwargs: Passed through to httpx.AsyncClient (timeout, event_hooks, ...).
+        """
+        url = httpx.URL(base_url or "")
+        origin = f"{url.scheme}://{url.netloc.decode()}" if url.host else ""
+        identity = auth_identity(auth, headers)
+        key = (origin, identity, verify if isinstance(verify, bool) else id(verify))
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _Pool(self, origin, identity, verify)
+        pool.clients += 1
+
+        transport: httpx.AsyncBaseTransport = _SharedTransport(pool)
+        for layer in [*self.layers, *layers]:
+            transport = layer(transport)
+        return httpx.AsyncClient(
+            base_url=base_url or "",
+            auth=auth,
+            headers=headers,
+            transport=transport,
+            **kwargs,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "keepalive_expiry": self.keepalive_expiry,
+            "pools": [pool.stats() for pool in self._pools.values()],
+            "single_flight": self.single_flight.stats() if self.single_flight else None,
+            "admission": self.admission.stats() if self.admission else None,
+        }
+
+    async def aclose(self) -> None:
+        for pool in self._pools.values():
+            await pool.aclose()
+
+    def after_fork(self) -> None:
+        """Start the child of a fork with empty pools of its own."""
+        for pool in self._pools.values():
+            pool.forget()
+        if self.admission is not None:
+            self.admission.reset()
+
+    @asynccontextmanager
+    async def lifespan(self, *_: Any) -> AsyncIterator[None]:
+        """Lifespan usable as FastMCP(lifespan=...) or from a parent app lifespan."""
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+
+upstream_pools = PoolRegistry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=upstream_pools.after_fork)
@@ -1,14 +1,22 @@
-import httpx
-from fastmcp import FastMCP
 import json
 import os
 from fastapi import Request
 from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
-import asyncio
 from dotenv import load_dotenv
 from typing import List, Dict, Any
-from search import search_in_index  
+from contextlib import asynccontextmanager
+from search import search_backend
+from fanout import Source, fan_out
+from catalog import build_openapi_mcp
+from odata import ODataTool
+from pools import upstream_pools
+from response_cache import response_cache
+from metrics import tool_metrics
+from cassette import cassette
+from hedging import hedging
+from result_store import add_fetch_tool
+from tool_list import ToolList
 
 load_dotenv()
 
@@ -20,24 +28,47 @@ if not odata_username or not odata_password:
     raise RuntimeError("Missing OData credentials: ODATA_USERNAME and/or ODATA_PASSWORD")
 
 
-odata_client = httpx.AsyncClient(
+upstream_pools.add_layer(cassette.layer, innermost=True)
+odata_client = upstream_pools.client(
     base_url=odata_base_url,
     auth=(odata_username, odata_password),
     headers={"Accept": "application/json"},
     verify=True,
+    layers=[hedging.layer, tool_metrics.layer, response_cache.layer],
 )
 
-with open("specs/odata_h2b.json", "r") as f:
-    openapi_spec = f.read()
-spec = json.loads(openapi_spec)
+@asynccontextmanager
+async def lifespan(_):
+    # One set of upstream clients for the whole process lifetime
+    async with upstream_pools.lifespan(), search_backend.lifespan():
+        yield
 
-mcp = FastMCP.from_openapi(
-    openapi_spec=spec,
-    client=odata_client,  
+
+mcp = build_openapi_mcp(
+    "specs/odata_h2b.json",
+    client=odata_client,
+    tool_factory=ODataTool,
     name="Worker Assistant MCP",
     stateless_http=True,          
-    json_response=True            
+    json_response=True,
+    lifespan=lifespan,
 )
+add_fetch_tool(mcp)
+tool_metrics.instrument(mcp)
+
+
+async def knowledge_base_search(query: str, top_k_contexts: int = 5) -> Dict[str, Any]:
+    contexts = await search_backend.search_in_index(query, top_k_contexts)
+    return {
+        "query": query,
+        "results_count": len(contexts),
+        "documents": contexts,
+        "metadata": {
+            "search_type": "hybrid_semantic",
+            "top_k": top_k_contexts,
+            "has_images": sum(1 for ctx in contexts if ctx.get("has_image", False))
+        }
+    }
 
 
 @mcp.tool()
@@ -51,20 +82,7 @@ async def search_knowledge_base(
     Use for historical knowledge, best practices, safety procedures, and documented processes.
     """
     try:
-        loop = asyncio.get_event_loop()
-        contexts = await loop.run_in_executor(None, search_in_index, query, top_k_contexts)
-        
-        return {
-            "query": query,
-            "results_count": len(contexts),
-            "documents": contexts,
-            "metadata": {
-                "search_type": "hybrid_semantic",
-                "top_k": top_k_contexts,
-                "has_images": sum(1 for ctx in contexts if ctx.get("has_image", False))
-            }
-        }
-        
+        return await knowledge_base_search(query, top_k_contexts)
     except Exception as e:
         return {
             "error": f"Azure Cognitive Search failed: {str(e)}",
@@ -73,63 +91,85 @@ async def search_knowledge_base(
             "documents": []
         }
 
+
+async def worker_generic_search(odata_filter: str = "", **_) -> Dict[str, Any]:
+    # Build OData query - simplified example
+    params = {
+        "$format": "json",
+        "$top": "5",
+        "$expand": "WorkerGenericFieldlist"
+    }
+    if odata_filter:
+        params["$filter"] = odata_filter
+
+    odata_response = await odata_client.get("WorkerGenericSet", params=params)
+    odata_response.raise_for_status()
+    return odata_response.json()
+
+
+# Sources search_all_sources fans out to. Adding a backend (sales orders,
+# material stock, ...) means adding a Source here and a result key below.
+SEARCH_SOURCES = {
+    "odata": Source(
+        name="odata",
+        fetch=worker_generic_search,
+        timeout=float(os.getenv("ODATA_SOURCE_TIMEOUT", "8")),
+        count=lambda value: len(value.get("d", {}).get("results", [])),
+    ),
+    "knowledge_base": Source(
+        name="knowledge_base",
+        fetch=lambda query, top_k_contexts, **_: knowledge_base_search(query, top_k_contexts),
+        timeout=float(os.getenv("KNOWLEDGE_SOURCE_TIMEOUT", "8")),
+        count=lambda value: value.get("results_count", 0),
+    ),
+}
+RESULT_KEYS = {"odata": "odata_results", "knowledge_base": "knowledge_results"}
+
+
 @mcp.tool()
 async def search_all_sources(
     query: str,
     include_odata: bool = True,
     include_knowledge: bool = True,
     odata_filter: str = "",
-    top_k_contexts: int = 3
+    top_k_contexts: int = 3,
+    latency_budget_ms: int = 0
 ) -> Dict[str, Any]:
     """
     Search across multiple data sources simultaneously.
     Use when you need comprehensive information from both live operational data and documentation.
+    Sources are queried in parallel; a source that misses its deadline or latency_budget_ms
+    (0 = per-source deadlines only) is reported in source_status and the other results are still returned.
     """
+    requested = {"odata": include_odata, "knowledge_base": include_knowledge}
+    fetch_args = {"query": query, "odata_filter": odata_filter, "top_k_contexts": top_k_contexts}
+    outcomes = await fan_out(
+        {name: (SEARCH_SOURCES[name], fetch_args) for name, wanted in requested.items() if wanted},
+        budget=latency_budget_ms / 1000 if latency_budget_ms > 0 else None,
+    )
+
     results = {
         "query": query,
         "sources_searched": [],
         "odata_results": None,
         "knowledge_results": None,
-        "combined_summary": ""
+        "combined_summary": "",
+        "source_status": {name: outcome.summary() for name, outcome in outcomes.items()},
+        "partial": any(not outcome.ok for outcome in outcomes.values())
     }
-    
-    # Search OData if requested
-    if include_odata:
-        try:
-            # Build OData query - simplified example
-            odata_endpoint = "WorkerGenericSet"
-            params = {
-                "$format": "json",
-                "$top": "5",
-                "$expand": "WorkerGenericFieldlist"
-            }
-            if odata_filter:
-                params["$filter"] = odata_filter
-            
-            odata_response = await odata_client.get(odata_endpoint, params=params)
-            if odata_response.status_code == 200:
-                results["odata_results"] = odata_response.json()
-                results["sources_searched"].append("odata")
-        except Exception as e:
-            results["odata_results"] = {"error": str(e)}
-    
-    # Search Knowledge Base if requested  
-    if include_knowledge:
-        knowledge_result = await search_knowledge_base(query, top_k_contexts)
-        results["knowledge_results"] = knowledge_result
-        if not knowledge_result.get("error"):
-            results["sources_searched"].append("knowledge_base")
-    
-    # Add summary
-    sources_found = len(results["sources_searched"])
+
     total_docs = 0
-    if results.get("knowledge_results"):
-        total_docs += results["knowledge_results"].get("results_count", 0)
-    if results.get("odata_results") and not results["odata_results"].get("error"):
-        total_docs += len(results["odata_results"].get("d", {}).get("results", []))
-    
+    for name, outcome in outcomes.items():
+        if outcome.ok:
+            results[RESULT_KEYS[name]] = outcome.value
+            results["sources_searched"].append(name)
+            total_docs += SEARCH_SOURCES[name].count(outcome.value)
+        else:
+            results[RESULT_KEYS[name]] = {"error": outcome.error}
+
+    sources_found = len(results["sources_searched"])
     results["combined_summary"] = f"Searched {sources_found} sources, found {total_docs} relevant items for: {query}"
-    
+
     return results
 
 # Health check and root endpoints
@@ -146,13 +186,25 @@ async def root(_: Request) -> JSONResponse:
         "tools": ["query_worker_generic_set", "get_worker_generic_item", "search_knowledge_base", "search_all_sources"]
     })
 
-async def cleanup():
-    await odata_client.aclose()
+@mcp.custom_route("/pools", methods=["GET"])
+async def pool_stats(_: Request) -> JSONResponse:
+    return JSONResponse(upstream_pools.stats())
+
+@mcp.custom_route("/response_cache", methods=["GET"])
+async def response_cache_stats(_: Request) -> JSONResponse:
+    return JSONResponse(response_cache.stats())
+
+@mcp.custom_route("/embedding_cache", methods=["GET"])
+async def embedding_cache_stats(_: Request) -> JSONResponse:
+    return JSONResponse(search_backend.embedding_cache.stats())
+
+@mcp.custom_route("/embedding_batches", methods=["GET"])
+async def embedding_batch_stats(_: Request) -> JSONResponse:
+    return JSONResponse(search_backend.embedding_batcher.stats())
+
+mcp.custom_route("/metrics", methods=["GET"])(tool_metrics.endpoint)
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "8000"))
     host = os.environ.get("HOST", "0.0.0.0")
-    try:
-        mcp.run(transport="streamable-http", host=host, port=port, path="/mcp")
-    finally:
-        asyncio.run(cleanup())
\ No newline at end of file
+    mcp.run(transport="streamable-http", host=host, port=port, path="/mcp", middleware=ToolList(mcp).middleware())
\ No newline at end of file
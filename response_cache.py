@@ -0,0 +1,256 @@
+"""Opt-in response cache for read-only OData calls.
+
+Master-data reads (material stock by plant, sales order headers, workers of a
+workplace) are repeated all day and change slowly. ResponseCache sits on the
+upstream client as a transport layer::
+
+    client = upstream_pools.client(base_url, ..., layers=[response_cache.layer])
+
+and answers repeated GETs from memory:
+
+* streamed requests (pools.STREAM_EXTENSION) are never cached;
+* the key is the auth identity plus the normalized URL: query options sorted,
+  percent-encoding undone and $select/$expand lists put in a stable order;
+* entries are kept in an LRU bounded by RESPONSE_CACHE_MAX_BYTES of bodies;
+* each entity set has its own TTL from RESPONSE_CACHE_TTLS. Entity sets
+  without one (and without a "*" default) are never cached, so nothing changes
+  until the TTLs are configured;
+* an expired entry whose response carried an ETag is revalidated with
+  If-None-Match, and a 304 renews it without transferring the body again;
+* any successful write (POST/PUT/PATCH/MERGE/DELETE) drops every entry of the
+  entity set it touched. Reads of navigation paths such as
+  A_SalesOrder('1')/to_Item and reads with $expand count towards the entity
+  set they start from, but return entities of other sets that the cache
+  cannot name without the service metadata, so a write to any entity set of
+  the same service drops them as well.
+
+The backend's own Cache-Control headers are ignored: SAP Gateway marks every
+response no-store, and the TTLs are an explicit decision per entity set.
+
+Tuning via environment:
+    RESPONSE_CACHE_TTLS       "A_MaterialStock=300,WorkerGenericSet=600,*=60"
+    RESPONSE_CACHE_MAX_BYTES  body bytes kept in memory (default 32 MiB)
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import parse_qsl, unquote
+
+import httpx
+from fastmcp.utilities.logging import get_logger
+
+from pools import STREAM_EXTENSION, request_identity
+
+logger = get_logger(__name__)
+
+READ_METHODS = ("GET", "HEAD")
+LIST_OPTIONS = ("$select", "$expand")
+# Headers that describe the stored (already decoded) body differently
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def parse_ttls(spec: str) -> dict[str, float]:
+    """'A_MaterialStock=300, *=60' -> {'A_MaterialStock': 300.0, '*': 60.0}"""
+    ttls = {}
+    for item in spec.split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+RESPONSE_CACHE_TTLS = parse_ttls(os.getenv("RESPONSE_CACHE_TTLS", ""))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+def entity_set_path(path: str) -> str:
+    """'/sap/.../API_SALES_ORDER_SRV/A_SalesOrder('1')/to_Item' -> '/sap/.../A_SalesOrder'"""
+    path = unquote(path)
+    key_start = path.find("(")
+    return path[:key_start] if key_start >= 0 else path.rstrip("/")
+
+
+def navigation_scope(path: str, query: bytes | str) -> str | None:
+    """'<service>/*' for reads that return entities of other sets (navigation, $expand), else None."""
+    entity_set = entity_set_path(path)
+    path = unquote(path)
+    key_end = path.find(")", len(entity_set))
+    navigates = key_end >= 0 and path[key_end + 1:].strip("/") != ""
+    if isinstance(query, bytes):
+        query = query.decode("ascii", "replace")
+    expands = any(name == "$expand" for name, _ in parse_qsl(query, keep_blank_values=True))
+    return f"{entity_set.rsplit('/', 1)[0]}/*" if navigates or expands else None
+
+
+def normalized_query(query: bytes | str) -> str:
+    if isinstance(query, bytes):
+        query = query.decode("ascii", "replace")
+    params = []
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        if name in LIST_OPTIONS:
+            value = ",".join(sorted(part.strip() for part in value.split(",")))
+        params.append((name, value.strip()))
+    return "&".join(f"{name}={value}" for name, value in sorted(params))
+
+
+@dataclass
+class _Entry:
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    etag: str | None
+    scopes: tuple[str, ...]  # entity set, plus navigation_scope for reads that reach other sets
+    expires_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    def response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(self.status_code, headers=self.headers, content=self.content, request=request)
+
+
+class ResponseCache:
+    """Bytes-bounded LRU of GET responses with per-entity-set TTLs."""
+
+    def __init__(self, ttls: dict[str, float] | None = None, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.ttls = RESPONSE_CACHE_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._by_entity_set: dict[str, set[str]] = {}
+        self.bytes = 0
+        self.counters = {
+            "hits": 0, "misses": 0, "revalidated": 0, "stores": 0,
+            "evictions": 0, "invalidations": 0, "uncacheable": 0,
+        }
+
+    def ttl_for(self, entity_set: str) -> float:
+        name = entity_set.rsplit("/", 1)[-1]
+        return self.ttls.get(name, self.ttls.get("*", 0.0))
+
+    def key(self, request: httpx.Request) -> str:
+        url = request.url
+        return "|".join((
+            request_identity(request),
+            request.headers.get("accept", ""),
+            f"{url.scheme}://{url.netloc.decode()}{unquote(url.path)}?{normalized_query(url.query)}",
+        ))
+
+    def get(self, key: str) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: _Entry) -> None:
+        self.discard(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        for scope in entry.scopes:
+            self._by_entity_set.setdefault(scope, set()).add(key)
+        self.bytes += entry.size
+        self.counters["stores"] += 1
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self.discard(oldest)
+            self.counters["evictions"] += 1
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+            for scope in entry.scopes:
+                keys = self._by_entity_set.get(scope)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._by_entity_set[scope]
+
+    def invalidate(self, entity_set: str) -> int:
+        """Drop every entry read from entity_set or navigating within its service; returns how many."""
+        service_scope = f"{entity_set.rsplit('/', 1)[0]}/*"
+        keys = list(self._by_entity_set.get(entity_set, set()) | self._by_entity_set.get(service_scope, set()))
+        for key in keys:
+            self.discard(key)
+        if keys:
+            self.counters["invalidations"] += 1
+            logger.debug(f"Response cache: dropped {len(keys)} entries of {entity_set}")
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_entity_set.clear()
+        self.bytes = 0
+
+    def layer(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """pools.TransportLayer that puts this cache in front of transport."""
+        return _CachingTransport(self, transport)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": round(self.counters["hits"] / lookups, 4) if lookups else None,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttls": self.ttls,
+            "entity_sets": {name.rsplit("/", 1)[-1]: len(keys) for name, keys in self._by_entity_set.items()},
+        }
+
+
+class _CachingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cache: ResponseCache, transport: httpx.AsyncBaseTransport):
+        self.cache = cache
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        cache = self.cache
+        entity_set = entity_set_path(request.url.path)
+        if request.method not in READ_METHODS:
+            response = await self.transport.handle_async_request(request)
+            if response.status_code < 400 and not entity_set.endswith("$batch"):
+                cache.invalidate(entity_set)
+            return response
+
+        ttl = cache.ttl_for(entity_set)
+        if request.method != "GET" or ttl <= 0 or request.extensions.get(STREAM_EXTENSION):
+            return await self.transport.handle_async_request(request)
+
+        key = cache.key(request)
+        entry = cache.get(key)
+        now = time.monotonic()
+        if entry is not None and now < entry.expires_at:
+            cache.counters["hits"] += 1
+            return entry.response(request)
+
+        if entry is not None and entry.etag and "if-none-match" not in request.headers:
+            request.headers["If-None-Match"] = entry.etag
+        response = await self.transport.handle_async_request(request)
+        if response.status_code == 304 and entry is not None:
+            await response.aclose()
+            entry.expires_at = time.monotonic() + ttl
+            cache.counters["revalidated"] += 1
+            return entry.response(request)
+
+        cache.counters["misses"] += 1
+        if response.status_code != 200:
+            cache.counters["uncacheable"] += 1
+            return response
+        content = await response.aread()
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _DROPPED_HEADERS]
+        scope = navigation_scope(request.url.path, request.url.query)
+        fresh = _Entry(response.status_code, headers, content, response.headers.get("etag"),
+                       (entity_set, scope) if scope else (entity_set,), time.monotonic() + ttl)
+        cache.put(key, fresh)
+        return fresh.response(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+response_cache = ResponseCache()
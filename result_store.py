@@ -0,0 +1,208 @@
+"""Cursor paging of large tool results from the MCP server to its client.
+
+A collection read such as the planned orders list or WorkerGenericSet with
+$expand=WorkerGenericItems/WorkerGenericItemsFieldlist can merge thousands of
+rows, and all of them used to go to the LLM client in one response. ODataTool
+now hands every collection result to result_store.first_chunk: if it is
+larger than one chunk (RESULT_CHUNK_ROWS rows or RESULT_CHUNK_BYTES of JSON,
+whichever is reached first) the client gets the first chunk plus an opaque
+``__cursor`` and the number of rows left in ``__remaining``; the rest stays in
+this process. The fetch_results tool (add_fetch_tool, registered next to the
+generated tools) returns the following chunks from there, so the upstream is
+not asked again. The last chunk carries the collection's ``__count`` and its
+``__next`` link to more upstream rows, if there were any.
+
+The store keeps whole results in an LRU bounded by RESULT_STORE_MAX_BYTES
+(estimated from the JSON size of the first chunk) and RESULT_STORE_MAX_ENTRIES,
+and drops a result RESULT_STORE_TTL seconds after its last chunk was fetched.
+An expired or evicted cursor is a tool error that asks for the original call
+again.
+
+Results live in the memory of the worker that produced them, so with several
+pre-forked workers (SERVE_WORKERS) a fetch only finds its result if it
+reaches the same worker, and the workers accept on one shared socket, so
+nothing can send it there. serve.serve therefore turns paging off whenever it
+forks more than one worker, whatever RESULT_PAGING says.
+
+Tuning via environment:
+    RESULT_PAGING              "false" to return whole results (default true; always false with several workers)
+    RESULT_CHUNK_ROWS          rows per chunk (default 200)
+    RESULT_CHUNK_BYTES         JSON bytes per chunk (default 64 KiB)
+    RESULT_STORE_TTL           seconds a result is kept after its last fetch (default 600)
+    RESULT_STORE_MAX_BYTES     estimated bytes of results kept (default 64 MiB)
+    RESULT_STORE_MAX_ENTRIES   results kept (default 256)
+"""
+
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Annotated, Any
+
+from fastmcp import FastMCP
+from fastmcp.tools import Tool
+from fastmcp.tools.tool import ToolResult
+from pydantic import Field
+
+import columnar
+
+
+RESULT_PAGING = os.getenv("RESULT_PAGING", "true").lower() in ("1", "true", "yes")
+RESULT_CHUNK_ROWS = int(os.getenv("RESULT_CHUNK_ROWS", "200"))
+RESULT_CHUNK_BYTES = int(os.getenv("RESULT_CHUNK_BYTES", str(64 * 1024)))
+RESULT_STORE_TTL = float(os.getenv("RESULT_STORE_TTL", "600"))
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_STORE_MAX_ENTRIES = int(os.getenv("RESULT_STORE_MAX_ENTRIES", "256"))
+
+
+@dataclass
+class _Result:
+    rows: list[Any]
+    tail: dict[str, Any]  # what the last chunk carries besides its rows (__count, __next)
+    raw: bool  # the payload had the OData "d" envelope
+    format: str  # columnar format the chunks are rendered in
+    size: int
+    expires: float
+
+
+class ResultStore:
+    """Chunks large collection results and keeps the rest for fetch_results."""
+
+    def __init__(
+        self,
+        enabled: bool = RESULT_PAGING,
+        chunk_rows: int = RESULT_CHUNK_ROWS,
+        chunk_bytes: int = RESULT_CHUNK_BYTES,
+        ttl: float = RESULT_STORE_TTL,
+        max_bytes: int = RESULT_STORE_MAX_BYTES,
+        max_entries: int = RESULT_STORE_MAX_ENTRIES,
+    ):
+        self.enabled = enabled
+        self.chunk_rows = max(1, chunk_rows)
+        self.chunk_bytes = chunk_bytes
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._results: OrderedDict[str, _Result] = OrderedDict()
+        self.bytes = 0
+        self.counters = {"stored": 0, "fetched": 0, "expired": 0, "evicted": 0, "unknown": 0}
+
+    def _chunk_end(self, rows: list[Any], start: int) -> tuple[int, int]:
+        """End index and JSON size of the chunk starting at start (at least one row)."""
+        end, size = start, 0
+        limit = min(len(rows), start + self.chunk_rows)
+        while end < limit:
+            row_size = len(json.dumps(rows[end], separators=(",", ":"), ensure_ascii=False)) + 1
+            if end > start and size + row_size > self.chunk_bytes:
+                break
+            size += row_size
+            end += 1
+        return end, size
+
+    def first_chunk(self, payload: Any, body: dict[str, Any] | None, format: str = "rows") -> Any:
+        """payload as it is if it fits one chunk, else its first chunk with a cursor to the rest.
+
+        body is the collection inside payload (odata.collection_of), None for entities;
+        format is the columnar format fetch() renders the later chunks in.
+        """
+        if body is None or not self.enabled:
+            return payload
+        rows = body["results"]
+        if len(rows) <= 1:
+            return payload
+        end, size = self._chunk_end(rows, 0)
+        if end >= len(rows):
+            return payload
+        tail = {key: body[key] for key in ("__count", "__next") if key in body}
+        result = _Result(rows, tail, raw="d" in payload, format=format, size=size * len(rows) // end,
+                         expires=time.monotonic() + self.ttl)
+        token = secrets.token_urlsafe(12)
+        self._put(token, result)
+        chunk = {key: value for key, value in body.items() if key not in tail}
+        chunk.update({"results": rows[:end], "__cursor": f"{token}.{end}", "__remaining": len(rows) - end})
+        return {**payload, "d": chunk} if result.raw else chunk
+
+    def fetch(self, cursor: str) -> Any:
+        """The chunk a cursor points at, with the cursor to the next one unless it is the last.
+
+        A dict, or text for the csv and markdown collection formats.
+        """
+        token, _, offset = cursor.partition(".")
+        self._expire()
+        result = self._results.get(token)
+        if result is None or not offset.isdigit():
+            self.counters["unknown"] += 1
+            raise ValueError(f"Cursor {cursor!r} is unknown or has expired; call the original tool again")
+        self._results.move_to_end(token)
+        result.expires = time.monotonic() + self.ttl
+        self.counters["fetched"] += 1
+        start = int(offset)
+        end, _ = self._chunk_end(result.rows, start)
+        chunk: dict[str, Any] = {"results": result.rows[start:end]}
+        if end < len(result.rows):
+            chunk.update({"__cursor": f"{token}.{end}", "__remaining": len(result.rows) - end})
+        else:
+            chunk.update(result.tail)
+        if result.raw:
+            return {"d": chunk}
+        return columnar.render(chunk, result.format)
+
+    def _put(self, token: str, result: _Result) -> None:
+        self._results[token] = result
+        self.bytes += result.size
+        self.counters["stored"] += 1
+        self._expire()
+        while self._results and (self.bytes > self.max_bytes or len(self._results) > self.max_entries):
+            _, evicted = self._results.popitem(last=False)
+            self.bytes -= evicted.size
+            self.counters["evicted"] += 1
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for token in [token for token, result in self._results.items() if result.expires <= now]:
+            self.bytes -= self._results.pop(token).size
+            self.counters["expired"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        self._expire()
+        return {
+            "enabled": self.enabled,
+            "results": len(self._results),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "chunk_rows": self.chunk_rows,
+            "chunk_bytes": self.chunk_bytes,
+            **self.counters,
+        }
+
+
+result_store = ResultStore()
+
+
+def add_fetch_tool(mcp: FastMCP, name: str = "fetch_results", store: ResultStore | None = None) -> None:
+    """Register the tool that returns further chunks of a paged result."""
+    store = store or result_store
+    if not store.enabled:
+        return
+
+    async def fetch_results(
+        cursor: Annotated[str, Field(description="The __cursor value of the previous chunk")],
+    ) -> ToolResult:
+        chunk = store.fetch(cursor)
+        if isinstance(chunk, str):
+            return ToolResult(content=chunk)
+        return ToolResult(structured_content=chunk)
+
+    mcp.add_tool(Tool.from_function(
+        fetch_results,
+        name=name,
+        description=(
+            "Return the next chunk of a large result. Collection results that do not fit one response "
+            "come back with their first rows plus '__cursor' and '__remaining'; pass that cursor here "
+            "to get the following rows, and the new '__cursor' for the chunk after that. The last "
+            "chunk has no cursor."
+        ),
+        tags={"paging"},
+    ))
@@ -1,84 +1,174 @@
-
+import asyncio
+from contextlib import asynccontextmanager
 
 from azure.search.documents.models import VectorizedQuery
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient, SearchIndexingBufferedSender
-from config import  COGNITIVE_SEARCH_CONFIG, ADA_CONFIG
-from openai import AzureOpenAI
-
-def get_embedding(input_string):
-   
-    openai_client = AzureOpenAI(
-        api_key=ADA_CONFIG["api_key"],
-        api_version=ADA_CONFIG["api_version"],
-        azure_endpoint=ADA_CONFIG["api_base"],
-        azure_deployment=ADA_CONFIG["deployment_name"],
-    )
-    response = openai_client.embeddings.create(
-        input=input_string,
-        model=ADA_CONFIG["model"],
-    )
-    results = response.data[0].embedding
-    openai_client.close()
-    return results
-
-def search_in_index(query, top_k_contexts=5):
-    """
-    Performs hybrid retrieval in Azure Cognitive Search.
+from azure.search.documents.aio import SearchClient
+from config import COGNITIVE_SEARCH_CONFIG, ADA_CONFIG, SEARCH_LIMITS, EMBEDDING_CACHE, EMBEDDING_BATCH
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache
+from openai import AsyncAzureOpenAI
 
-    Args:
-        query (str): The search query string.
-        top_k_contexts (int): The number of top results to retrieve (default is 5).
 
-    Returns:
-        List[dict]: A list of search results with content, title, and reranker scores.
+class SearchBackend:
+    """
+    Long-lived async clients for embeddings and hybrid retrieval.
+
+    The AsyncAzureOpenAI and aio SearchClient instances are opened once (in the
+    server lifespan, or lazily on first use) and reused, so a knowledge-base query
+    no longer pays two fresh TLS handshakes and a thread hop. Concurrent calls are
+    bounded by SEARCH_LIMITS["max_concurrency"] per upstream, and every upstream
+    call is cut off after SEARCH_LIMITS["timeout"] seconds. Query embeddings go
+    through an EmbeddingCache first; misses are micro-batched by an EmbeddingBatcher.
     """
-    search_client = SearchClient(
-        endpoint=COGNITIVE_SEARCH_CONFIG["endpoint"],
-        index_name=COGNITIVE_SEARCH_CONFIG["index_name"],
-        credential=AzureKeyCredential(COGNITIVE_SEARCH_CONFIG["api_key"])
-    )
-
-    # Generate embedding for the query
-    vector = VectorizedQuery(
-        vector=get_embedding(query),  # Get embedding for query
-        k_nearest_neighbors=top_k_contexts,
-        fields="contentVector",
-        exhaustive=True
-    )
-
-    # Perform hybrid search 
-    results = search_client.search(
-        search_text=query,  # BM25 keyword search
-        search_fields= ["content","metadata/filetype","metadata/filename"],
-        vector_queries=[vector],  # Vector search
-        query_type="semantic",  # Enable semantic reranking
-        semantic_configuration_name="default",  # Use default semantic config
-        #select=["chunk_id", "content","metadata/filename" ,"metadata/has_image"],  # Only retrieve fields explicitly allowed #metadata
-        top=top_k_contexts
-    )
-
-    # Extract relevant data from results
-    contexts = []
-    for result in results:
-        contexts.append({
-            "chunk_id": result["chunk_id"],
-            "content": result['content'],
-            "filename": result['metadata']['filename'], 
-            "search_score": result["@search.score"],
-            "has_image": result['metadata']['has_image'],
-        })
-
-    search_client.close()
-
-    return contexts
 
+    def __init__(self, max_concurrency=None, timeout=None, embedding_cache=None):
+        self.max_concurrency = max_concurrency or SEARCH_LIMITS["max_concurrency"]
+        self.timeout = timeout or SEARCH_LIMITS["timeout"]
+        self.embedding_cache = embedding_cache or EmbeddingCache(
+            model=ADA_CONFIG["model"],
+            deployment=ADA_CONFIG["deployment_name"],
+            max_bytes=EMBEDDING_CACHE["max_bytes"],
+            ttl=EMBEDDING_CACHE["ttl"],
+            directory=EMBEDDING_CACHE["dir"],
+        )
+        self.embedding_batcher = EmbeddingBatcher(
+            self._embed_many,
+            window_ms=EMBEDDING_BATCH["window_ms"],
+            max_batch=EMBEDDING_BATCH["max_batch"],
+        )
+        self._embedding_slots = asyncio.Semaphore(self.max_concurrency)
+        self._search_slots = asyncio.Semaphore(self.max_concurrency)
+        self._openai_client = None
+        self._search_client = None
+
+    async def open(self):
+        if self._openai_client is None:
+            self._openai_client = AsyncAzureOpenAI(
+                api_key=ADA_CONFIG["api_key"],
+                api_version=ADA_CONFIG["api_version"],
+                azure_endpoint=ADA_CONFIG["api_base"],
+                azure_deployment=ADA_CONFIG["deployment_name"],
+                timeout=self.timeout,
+            )
+        if self._search_client is None:
+            self._search_client = SearchClient(
+                endpoint=COGNITIVE_SEARCH_CONFIG["endpoint"],
+                index_name=COGNITIVE_SEARCH_CONFIG["index_name"],
+                credential=AzureKeyCredential(COGNITIVE_SEARCH_CONFIG["api_key"]),
+                connection_timeout=self.timeout,
+                read_timeout=self.timeout,
+            )
+
+    async def aclose(self):
+        await self.embedding_batcher.aclose()
+        openai_client, self._openai_client = self._openai_client, None
+        search_client, self._search_client = self._search_client, None
+        if openai_client is not None:
+            await openai_client.close()
+        if search_client is not None:
+            await search_client.close()
+
+    @asynccontextmanager
+    async def lifespan(self, *_):
+        await self.open()
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+    async def _bounded(self, slots, what, coro):
+        async with slots:
+            try:
+                return await asyncio.wait_for(coro, self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{what} timed out after {self.timeout:g}s") from None
+
+    async def get_embedding(self, input_string):
+        cached = self.embedding_cache.get(input_string)
+        if cached is not None:
+            return cached
+
+        embedding, tokens = await self.embedding_batcher.embed(input_string)
+        self.embedding_cache.put(input_string, embedding, tokens)
+        return embedding
+
+    async def _embed_many(self, texts):
+        await self.open()
+        response = await self._bounded(
+            self._embedding_slots,
+            "Embedding request",
+            self._openai_client.embeddings.create(
+                input=texts,
+                model=ADA_CONFIG["model"],
+            ),
+        )
+        embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        tokens = response.usage.prompt_tokens if response.usage else 0
+        return embeddings, tokens
+
+    async def search_in_index(self, query, top_k_contexts=5):
+        """
+        Performs hybrid retrieval in Azure Cognitive Search.
+
+        Args:
+            query (str): The search query string.
+            top_k_contexts (int): The number of top results to retrieve (default is 5).
+
+        Returns:
+            List[dict]: A list of search results with content, title, and reranker scores.
+        """
+        await self.open()
+
+        # Generate embedding for the query
+        vector = VectorizedQuery(
+            vector=await self.get_embedding(query),  # Get embedding for query
+            k_nearest_neighbors=top_k_contexts,
+            fields="contentVector",
+            exhaustive=True
+        )
+
+        async def run_search():
+            # Perform hybrid search
+            results = await self._search_client.search(
+                search_text=query,  # BM25 keyword search
+                search_fields=["content", "metadata/filetype", "metadata/filename"],
+                vector_queries=[vector],  # Vector search
+                query_type="semantic",  # Enable semantic reranking
+                semantic_configuration_name="default",  # Use default semantic config
+                top=top_k_contexts
+            )
+
+            # Extract relevant data from results
+            contexts = []
+            async for result in results:
+                contexts.append({
+                    "chunk_id": result["chunk_id"],
+                    "content": result['content'],
+                    "filename": result['metadata']['filename'],
+                    "search_score": result["@search.score"],
+                    "has_image": result['metadata']['has_image'],
+                })
+            return contexts
+
+        return await self._bounded(self._search_slots, "Search request", run_search())
+
+
+search_backend = SearchBackend()
+
+
+async def get_embedding(input_string):
+    return await search_backend.get_embedding(input_string)
+
+
+async def search_in_index(query, top_k_contexts=5):
+    return await search_backend.search_in_index(query, top_k_contexts)
+
+
+async def _main():
+    async with search_backend.lifespan():
+        print(await search_in_index("What is on step 5", top_k_contexts=1))
 
 
 if __name__ == "__main__":
-    print(search_in_index("What is on step 5" , top_k_contexts=1))
-
-
-
-
-
+    asyncio.run(_main())
@@ -0,0 +1,222 @@
+"""Pre-fork multi-worker serving for the gateway and the single-backend scripts.
+
+uvicorn.run(app) and mcp.run() serve from one process, so all JSON parsing,
+schema validation and response serialization share one core. The apps are
+stateless (stateless_http=True, no sessions; the combined endpoints of
+CompositeGateway included), so any worker can answer any request. serve() builds the app once in the parent (specs parsed, tools
+built), freezes it out of the garbage collector's reach and forks the workers
+from it: they share those pages copy-on-write instead of each parsing the
+specs again, as uvicorn's own --workers (which re-imports the app per worker)
+would. The workers accept from one listening socket the parent bound.
+
+Per worker, after the fork:
+* upstream_pools starts empty (see pools.PoolRegistry.after_fork), so every
+  worker opens and keeps its own upstream connections;
+* the app lifespan runs (session managers, pool shutdown), as with one process;
+* response_cache and the lazy tool caches are the worker's own.
+
+Paged results (result_store.py) would also be the worker's own, and all
+workers accept on the one shared socket, so nothing can route a fetch back to
+the worker holding its result: result paging is always off with more than
+one worker, and an explicit RESULT_PAGING=true is ignored with an error.
+
+Signals to the parent:
+    SIGHUP           graceful reload: build the app again (re-reading config
+                     and specs), start a new set of workers, then let the old
+                     ones finish their in-flight requests and exit
+    SIGTERM, SIGINT  graceful shutdown
+A worker that dies is replaced. If the rebuild fails on reload, the old
+workers keep serving.
+
+Tuning via environment:
+    SERVE_WORKERS            worker processes (default 1, serves in-process;
+                             "auto" for one per CPU)
+    SERVE_GRACEFUL_TIMEOUT   seconds a worker gets to finish in-flight requests
+                             on reload or shutdown (default 30)
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Any, Callable
+
+import uvicorn
+from fastmcp.utilities.logging import get_logger
+
+from result_store import result_store
+
+logger = get_logger(__name__)
+
+SERVE_WORKERS = os.getenv("SERVE_WORKERS", "1")
+SERVE_GRACEFUL_TIMEOUT = float(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+
+AppFactory = Callable[[], Any]
+
+
+def worker_count(setting: str | int = SERVE_WORKERS) -> int:
+    if str(setting).strip().lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(setting))
+
+
+def bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Forks workers from a prebuilt app and keeps their number up."""
+
+    def __init__(
+        self,
+        factory: AppFactory,
+        sock: socket.socket,
+        workers: int,
+        graceful_timeout: float = SERVE_GRACEFUL_TIMEOUT,
+        **uvicorn_settings: Any,
+    ):
+        self.factory = factory
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.uvicorn_settings = uvicorn_settings
+        self.app: Any = None
+        self.pids: set[int] = set()
+        self._signals: list[int] = []
+
+    def build(self) -> None:
+        """Build the app the next workers are forked from."""
+        started = time.perf_counter()
+        gc.unfreeze()
+        app = self.factory()
+        self.app = app
+        gc.collect()
+        # moved to the permanent generation, the collector in the workers never
+        # writes to these objects, so their pages stay shared
+        gc.freeze()
+        logger.info(f"Built app for workers in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid:
+            self.pids.add(pid)
+            return pid
+        status = 0
+        try:
+            for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            config = uvicorn.Config(
+                self.app, timeout_graceful_shutdown=self.graceful_timeout, **self.uvicorn_settings
+            )
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} failed")
+            status = 1
+        finally:
+            os._exit(status)
+
+    def stop(self, pids: set[int]) -> None:
+        """Ask pids to shut down gracefully; kill what is still running after the timeout."""
+        for pid in pids:
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while pids and time.monotonic() < deadline:
+            pids -= self._reap()
+            time.sleep(0.05)
+        for pid in pids:
+            logger.warning(f"Worker {pid} did not stop in time; killing it")
+            self._kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self.pids.discard(pid)
+
+    def reload(self) -> None:
+        old = set(self.pids)
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Reload failed; the current workers keep serving")
+            return
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info(f"Reloaded; stopping {len(old)} old workers")
+        self.stop(old)
+
+    def run(self) -> None:
+        self.build()
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, _: self._signals.append(signum))
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info(f"Serving with {self.workers} workers: {sorted(self.pids)}")
+
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.reload()
+                else:
+                    logger.info("Shutting down workers")
+                    self.stop(set(self.pids))
+                    return
+            for pid in self._reap():
+                logger.warning(f"Worker {pid} exited; starting a new one")
+                self.spawn()
+            time.sleep(0.2)
+
+    def _reap(self) -> set[int]:
+        exited = set()
+        for pid in list(self.pids):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                exited.add(pid)
+                self.pids.discard(pid)
+        return exited
+
+    @staticmethod
+    def _kill(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def serve(
+    factory: AppFactory,
+    host: str,
+    port: int,
+    workers: int | None = None,
+    graceful_timeout: float = SERVE_GRACEFUL_TIMEOUT,
+    **uvicorn_settings: Any,
+) -> None:
+    """Serve the ASGI app built by factory with SERVE_WORKERS pre-forked workers.
+
+    factory is called in the parent once at startup and again on every reload;
+    uvicorn_settings go to uvicorn.Config (log_level, ...).
+    """
+    workers = worker_count() if workers is None else workers
+    if workers > 1 and not hasattr(os, "fork"):
+        logger.warning("Multiple workers need os.fork; serving from one process")
+        workers = 1
+    if workers > 1 and result_store.enabled:
+        # before the factory runs, so that no fetch_results tool is registered
+        if "RESULT_PAGING" in os.environ:
+            logger.error("RESULT_PAGING is ignored with several workers: they share one socket, so a cursor "
+                         "would mostly reach a worker that does not hold its result; serving whole results")
+        else:
+            logger.info("Result paging is off with several workers")
+        result_store.enabled = False
+    if workers == 1:
+        uvicorn.run(factory(), host=host, port=port, **uvicorn_settings)
+        return
+    with bind(host, port) as sock:
+        Supervisor(factory, sock, workers, graceful_timeout, **uvicorn_settings).run()
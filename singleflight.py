@@ -0,0 +1,98 @@
+"""Single-flight coalescing of identical in-flight upstream requests.
+
+At shift start dozens of assistant sessions send the same WorkerGenericSet or
+material stock query within a few hundred milliseconds. SingleFlight is a
+transport layer that lets the first of those requests go upstream and makes
+every identical request arriving while it is in flight wait for that same
+response instead of sending its own. Which requests count as identical is up
+to the key function (pools.coalescing_key: idempotent GETs with the same URL,
+query, Accept header and auth identity); a key of None bypasses coalescing.
+
+The upstream call runs in its own task and the body is read completely before
+it is handed out, so each waiter gets an independent httpx.Response. A waiter
+that is cancelled only stops waiting; the upstream call is cancelled when the
+last waiter is gone.
+"""
+
+import asyncio
+from typing import Any, Callable
+
+import httpx
+
+# Headers that describe the wire body, not the decoded content shared with waiters
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+RequestKey = Callable[[httpx.Request], str | None]
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, key: RequestKey):
+        self.key = key
+        self._flights: dict[str, _Flight] = {}
+        self.counters = {"requests": 0, "upstream_calls": 0, "coalesced": 0, "abandoned": 0, "errors": 0}
+
+    def layer(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """pools.TransportLayer that coalesces requests sent through transport."""
+        return _SingleFlightTransport(self, transport)
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.counters, "in_flight": len(self._flights)}
+
+    async def _call(self, transport: httpx.AsyncBaseTransport, request: httpx.Request):
+        response = await transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _DROPPED_HEADERS]
+        return response.status_code, headers, content
+
+    async def request(self, transport: httpx.AsyncBaseTransport, request: httpx.Request) -> httpx.Response:
+        key = self.key(request)
+        if key is None:
+            return await transport.handle_async_request(request)
+
+        self.counters["requests"] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(self._call(transport, request)))
+            flight.task.add_done_callback(lambda _: self._finished(key, flight))
+            self.counters["upstream_calls"] += 1
+        else:
+            self.counters["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            status_code, headers, content = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                self.counters["abandoned"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+        return httpx.Response(status_code, headers=headers, content=content, request=request)
+
+    def _finished(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            self.counters["errors"] += 1
+
+
+class _SingleFlightTransport(httpx.AsyncBaseTransport):
+    def __init__(self, flight: SingleFlight, transport: httpx.AsyncBaseTransport):
+        self.flight = flight
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.flight.request(self.transport, request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,406 @@
+"""Compile a full SAP OpenAPI spec down to the operations a server actually exposes.
+
+The reduced specs in specs/ used to be cut down by hand from their 1 MB / 280 KB
+/ 150 KB originals. An allowlist (specs/allowlists/*.json) now describes each
+one instead, and compile_spec produces it from the original:
+
+* only the allowlisted operations are kept, in allowlist order;
+* entity types can be narrowed to a list of fields, and the $select and
+  $orderby enums of every operation are pruned to what is left. $expand
+  names navigation properties, not fields, so it keeps its values (as the
+  hand-made reduced specs did) even though the navigation properties leave
+  the narrowed entity type;
+* operations without an operationId get one (utils.ensure_operation_ids), so
+  servers no longer patch them in at runtime; the allowlist can pin names;
+* vendor extensions (x-...) are dropped, identical schemas are merged and
+  parameters/responses/request bodies referenced only once are inlined;
+* components that are no longer reachable from the kept operations are removed;
+* the output is written deterministically (sorted components, fixed layout),
+  so recompiling an unchanged allowlist never produces a diff.
+
+Allowlist format::
+
+    {
+      "source": "specs/API_SALES_ORDER_SRV.json",
+      "output": "specs/API_SALES_ORDER_SRV_reduced.json",
+      "operations": [
+        "GET /A_SalesOrder",
+        {"operation": "GET /A_SalesOrder('{SalesOrder}')", "operationId": "read_sales_order"}
+      ],
+      "fields": {"API_SALES_ORDER_SRV.A_SalesOrderType": ["SalesOrder", "SoldToParty"]}
+    }
+
+"operations" may also be "*" to keep every operation of the source.
+
+    python spec_compiler.py specs/allowlists/*.json
+    python spec_compiler.py --check specs/allowlists/*.json
+    python spec_compiler.py --measure specs/allowlists/sales_order.json
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from utils import ensure_operation_ids
+
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+REF_KINDS = ("schemas", "parameters", "responses", "requestBodies", "headers", "examples")
+INLINED_KINDS = ("parameters", "responses", "requestBodies")
+# Query options whose enums list fields; $expand lists navigation properties
+ENUM_OPTIONS = ("$select", "$orderby")
+
+
+def iter_refs(node: Any) -> Iterator[str]:
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            yield ref
+        for value in node.values():
+            yield from iter_refs(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from iter_refs(value)
+
+
+def _split_ref(ref: str) -> tuple[str, str] | None:
+    parts = ref.split("/")
+    if len(parts) == 4 and parts[:2] == ["#", "components"]:
+        return parts[2], parts[3]
+    return None
+
+
+def _strip_extensions(node: Any) -> Any:
+    if isinstance(node, dict):
+        return {k: _strip_extensions(v) for k, v in node.items() if not k.startswith("x-")}
+    if isinstance(node, list):
+        return [_strip_extensions(v) for v in node]
+    return node
+
+
+def _rewrite_refs(node: Any, renames: dict[str, str]) -> Any:
+    if isinstance(node, dict):
+        if isinstance(node.get("$ref"), str) and node["$ref"] in renames:
+            return {**node, "$ref": renames[node["$ref"]]}
+        return {k: _rewrite_refs(v, renames) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_rewrite_refs(v, renames) for v in node]
+    return node
+
+
+def _operations(paths: dict[str, Any]) -> Iterator[tuple[str, str, dict[str, Any]]]:
+    for path, item in paths.items():
+        for method, operation in item.items():
+            if method in HTTP_METHODS and isinstance(operation, dict):
+                yield path, method, operation
+
+
+def _resolve(spec: dict[str, Any], node: Any) -> Any:
+    while isinstance(node, dict) and "$ref" in node:
+        target = _split_ref(node["$ref"])
+        if target is None:
+            return node
+        node = spec.get("components", {}).get(target[0], {}).get(target[1])
+    return node
+
+
+def _entity_type(spec: dict[str, Any], operation: dict[str, Any]) -> str | None:
+    """Schema name of the entity type a GET operation returns, if it can be told."""
+    response = _resolve(spec, operation.get("responses", {}).get("200"))
+    try:
+        schema = response["content"]["application/json"]["schema"]
+    except (KeyError, TypeError):
+        return None
+    for _ in range(4):
+        if "$ref" in schema:
+            target = _split_ref(schema["$ref"])
+            return target[1] if target and target[0] == "schemas" else None
+        if schema.get("allOf"):
+            schema = schema["allOf"][0]
+            continue
+        properties = schema.get("properties", {})
+        inner = properties.get("d") or properties.get("results") or properties.get("value")
+        if inner is None:
+            return None
+        schema = inner.get("items", inner)
+    return None
+
+
+def reachable_components(components: dict[str, Any], root: Any) -> set[tuple[str, str]]:
+    """(kind, name) of every component root references, directly or through other components."""
+    seen: set[tuple[str, str]] = set()
+    pending = list(iter_refs(root))
+    while pending:
+        target = _split_ref(pending.pop())
+        if target is None or target in seen:
+            continue
+        seen.add(target)
+        pending.extend(iter_refs(components.get(target[0], {}).get(target[1])))
+    return seen
+
+
+class SpecCompiler:
+    def __init__(self, spec: dict[str, Any], allowlist: dict[str, Any]):
+        self.source = spec
+        self.allowlist = allowlist
+        self.spec: dict[str, Any] = {}
+        self.counts = {"enum_values_pruned": 0, "fields_pruned": 0, "schemas_deduplicated": 0, "refs_inlined": 0}
+
+    def compile(self) -> dict[str, Any]:
+        self._select_operations()
+        self._prune_fields()
+        if self.allowlist.get("strip_extensions", True):
+            self.spec = _strip_extensions(self.spec)
+        self._prune_enums()
+        self._dedupe_schemas()
+        self._inline_single_use()
+        self._drop_unreachable()
+        return self._ordered()
+
+    def _select_operations(self) -> None:
+        source = copy.deepcopy(self.source)
+        wanted = self.allowlist.get("operations", "*")
+        if wanted == "*":
+            wanted = [f"{method.upper()} {path}" for path, method, _ in _operations(source.get("paths", {}))]
+        paths: dict[str, Any] = {}
+        for entry in wanted:
+            entry = {"operation": entry} if isinstance(entry, str) else entry
+            method, _, path = entry["operation"].partition(" ")
+            method = method.lower()
+            item = source.get("paths", {}).get(path)
+            if item is None or method not in item:
+                raise ValueError(f"{entry['operation']} is not in the source spec")
+            target = paths.setdefault(path, {})
+            if "parameters" in item:
+                target["parameters"] = item["parameters"]
+            operation = item[method]
+            if "operationId" in entry:
+                operation["operationId"] = entry["operationId"]
+            target[method] = operation
+        self.spec = {key: value for key, value in source.items() if key != "paths"}
+        self.spec["paths"] = paths
+        ensure_operation_ids(self.spec)
+
+        seen: set[str] = set()
+        for path, method, operation in _operations(paths):
+            if operation["operationId"] in seen:
+                raise ValueError(f"Duplicate operationId {operation['operationId']} ({method.upper()} {path})")
+            seen.add(operation["operationId"])
+
+    def _prune_fields(self) -> None:
+        schemas = self.spec.get("components", {}).get("schemas", {})
+        for name, fields in self.allowlist.get("fields", {}).items():
+            schema = schemas.get(name)
+            if schema is None:
+                raise ValueError(f"fields: schema {name} is not in the source spec")
+            keep = set(fields)
+            missing = keep - set(schema.get("properties", {}))
+            if missing:
+                raise ValueError(f"fields: {name} has no properties {sorted(missing)}")
+            properties = schema.get("properties", {})
+            self.counts["fields_pruned"] += len(properties) - len(keep)
+            schema["properties"] = {k: v for k, v in properties.items() if k in keep}
+            required = [k for k in schema.pop("required", []) if k in keep]
+            if required:
+                schema["required"] = required
+
+    def _prune_enums(self) -> None:
+        schemas = self.spec.get("components", {}).get("schemas", {})
+        for path, method, operation in _operations(self.spec["paths"]):
+            entity = _entity_type(self.spec, operation)
+            if entity not in schemas:
+                continue
+            allowed = set(schemas[entity].get("properties", {}))
+            parameters = []
+            for parameter in operation.get("parameters", []):
+                resolved = _resolve(self.spec, parameter) or {}
+                items = resolved.get("schema", {}).get("items", {})
+                if resolved.get("name") in ENUM_OPTIONS and "enum" in items:
+                    # "Plant desc" and "to_Item/Material" count as Plant and to_Item
+                    kept = [v for v in items["enum"] if v.split(" ")[0].split("/")[0] in allowed]
+                    self.counts["enum_values_pruned"] += len(items["enum"]) - len(kept)
+                    if not kept:
+                        continue
+                    parameter = copy.deepcopy(resolved)
+                    parameter["schema"]["items"]["enum"] = kept
+                parameters.append(parameter)
+            if "parameters" in operation:
+                operation["parameters"] = parameters
+
+    def _dedupe_schemas(self) -> None:
+        schemas = self.spec.get("components", {}).get("schemas", {})
+        while True:
+            # Only schemas reachable from the kept operations count; unused ones go anyway
+            reachable = self._reachable()
+            canonical: dict[str, str] = {}
+            renames: dict[str, str] = {}
+            for name in sorted(schemas):
+                if ("schemas", name) not in reachable:
+                    continue
+                body = json.dumps(schemas[name], sort_keys=True)
+                if body in canonical:
+                    renames[f"#/components/schemas/{name}"] = f"#/components/schemas/{canonical[body]}"
+                else:
+                    canonical[body] = name
+            if not renames:
+                return
+            self.counts["schemas_deduplicated"] += len(renames)
+            for ref in renames:
+                del schemas[ref.rsplit("/", 1)[1]]
+            self.spec = _rewrite_refs(self.spec, renames)
+            schemas = self.spec.get("components", {}).get("schemas", {})
+
+    def _inline_single_use(self) -> None:
+        components = self.spec.get("components", {})
+        uses: dict[str, int] = {}
+        for ref in iter_refs(self.spec["paths"]):
+            uses[ref] = uses.get(ref, 0) + 1
+
+        def inline(node: Any) -> Any:
+            if isinstance(node, dict):
+                target = _split_ref(node["$ref"]) if isinstance(node.get("$ref"), str) else None
+                if target and target[0] in INLINED_KINDS and uses.get(node["$ref"]) == 1:
+                    self.counts["refs_inlined"] += 1
+                    return inline(copy.deepcopy(components[target[0]][target[1]]))
+                return {k: inline(v) for k, v in node.items()}
+            if isinstance(node, list):
+                return [inline(v) for v in node]
+            return node
+
+        self.spec["paths"] = inline(self.spec["paths"])
+
+    def _reachable(self) -> set[tuple[str, str]]:
+        return reachable_components(self.spec.get("components", {}), self.spec["paths"])
+
+    def _drop_unreachable(self) -> None:
+        components = self.spec.get("components", {})
+        reachable = self._reachable()
+        for kind in REF_KINDS:
+            if kind in components:
+                components[kind] = {k: v for k, v in components[kind].items() if (kind, k) in reachable}
+                if not components[kind]:
+                    del components[kind]
+        if "tags" in self.spec:
+            used = {tag for _, _, operation in _operations(self.spec["paths"]) for tag in operation.get("tags", [])}
+            self.spec["tags"] = [tag for tag in self.spec["tags"] if tag.get("name") in used]
+
+    def _ordered(self) -> dict[str, Any]:
+        spec = dict(self.spec)
+        if "components" in spec:
+            spec["components"] = {
+                kind: dict(sorted(entries.items())) if isinstance(entries, dict) else entries
+                for kind, entries in sorted(spec["components"].items())
+            }
+        spec["x-generated"] = {
+            "by": "spec_compiler.py",
+            "source": self.allowlist.get("source"),
+            "note": "Do not edit; change the allowlist and recompile.",
+        }
+        return spec
+
+
+def compile_spec(spec: dict[str, Any], allowlist: dict[str, Any]) -> tuple[dict[str, Any], dict[str, int]]:
+    """Return the slimmed spec and counters of what was removed."""
+    compiler = SpecCompiler(spec, allowlist)
+    return compiler.compile(), compiler.counts
+
+
+def dumps(spec: dict[str, Any]) -> str:
+    return json.dumps(spec, indent=2, ensure_ascii=False) + "\n"
+
+
+def _component_count(spec: dict[str, Any]) -> int:
+    return sum(len(v) for k, v in spec.get("components", {}).items() if k in REF_KINDS)
+
+
+def _measure(spec: dict[str, Any]) -> dict[str, Any]:
+    """Catalog compile time and list_tools payload size (needs fastmcp)."""
+    from catalog import compile_catalog
+
+    started = time.perf_counter()
+    catalog = compile_catalog(spec)
+    compile_s = time.perf_counter() - started
+    listing = [
+        {"name": t["name"], "description": t["description"], "inputSchema": t["parameters"],
+         "outputSchema": t["output_schema"]}
+        for t in catalog["tools"]
+    ]
+    return {
+        "tools": len(catalog["tools"]),
+        "compile_ms": round(compile_s * 1000, 1),
+        "list_tools_bytes": len(json.dumps({"tools": listing}, separators=(",", ":"))),
+    }
+
+
+def build(allowlist_path: Path, check: bool = False, measure: bool = False) -> tuple[dict[str, Any], bool]:
+    allowlist = json.loads(allowlist_path.read_text(encoding="utf-8"))
+    source_path, output_path = Path(allowlist["source"]), Path(allowlist["output"])
+    source_text = source_path.read_text(encoding="utf-8")
+    source = json.loads(source_text)
+    slim, counts = compile_spec(source, allowlist)
+    text = dumps(slim)
+
+    current = output_path.read_text(encoding="utf-8") if output_path.exists() else None
+    up_to_date = current == text
+    if not check and not up_to_date:
+        output_path.write_text(text, encoding="utf-8")
+
+    report: dict[str, Any] = {
+        "allowlist": str(allowlist_path),
+        "output": str(output_path),
+        "bytes": [len(source_text.encode()), len(text.encode())],
+        "operations": [sum(1 for _ in _operations(source.get("paths", {}))),
+                       sum(1 for _ in _operations(slim["paths"]))],
+        "components": [_component_count(source), _component_count(slim)],
+        **counts,
+    }
+    if measure:
+        report["catalog"] = [_measure(source), _measure(slim)]
+    return report, up_to_date
+
+
+def format_report(report: dict[str, Any]) -> str:
+    before, after = report["bytes"]
+    lines = [
+        f"{report['output']} (from {report['allowlist']})",
+        f"  size        {before:>9,} -> {after:>9,} bytes ({1 - after / before:.0%} smaller)",
+        f"  operations  {report['operations'][0]:>9} -> {report['operations'][1]:>9}",
+        f"  components  {report['components'][0]:>9} -> {report['components'][1]:>9}",
+        f"  pruned      {report['fields_pruned']} fields, {report['enum_values_pruned']} enum values; "
+        f"{report['schemas_deduplicated']} schemas merged, {report['refs_inlined']} refs inlined",
+    ]
+    if "catalog" in report:
+        full, slim = report["catalog"]
+        lines.append(
+            f"  catalog     {full['tools']} -> {slim['tools']} tools, "
+            f"list_tools {full['list_tools_bytes']:,} -> {slim['list_tools_bytes']:,} bytes, "
+            f"compile {full['compile_ms']} -> {slim['compile_ms']} ms"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("allowlists", nargs="+", type=Path)
+    parser.add_argument("--check", action="store_true", help="fail if an output is not up to date")
+    parser.add_argument("--measure", action="store_true", help="also compare tool catalogs (slow)")
+    args = parser.parse_args(argv)
+
+    stale = []
+    for path in args.allowlists:
+        report, up_to_date = build(path, check=args.check, measure=args.measure)
+        print(format_report(report))
+        if not up_to_date:
+            stale.append(report["output"])
+    if args.check and stale:
+        print(f"Out of date: {', '.join(stale)}; run python spec_compiler.py {' '.join(map(str, args.allowlists))}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Circuit breaker transitions and wait-queue cancellation of admission.AdmissionControl."""
+
+import asyncio
+import unittest
+
+import httpx
+
+from admission import AdmissionControl, UpstreamOverloaded
+
+URL = "http://upstream.test/A_SalesOrder"
+
+
+class Upstream:
+    """Mock upstream answering with status; with a gate, requests wait until it is set."""
+
+    def __init__(self, status: int = 200):
+        self.status = status
+        self.calls = 0
+        self.gate: asyncio.Event | None = None
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return httpx.Response(self.status, content=b"{}")
+
+
+class AdmissionTest(unittest.IsolatedAsyncioTestCase):
+    def client(self, upstream: Upstream, **settings) -> httpx.AsyncClient:
+        settings = {"breaker_window": 4, "breaker_ratio": 0.5, "breaker_cooldown": 0.05, **settings}
+        self.control = AdmissionControl(**settings)
+        transport = self.control.layer(httpx.MockTransport(upstream.handle))
+        return httpx.AsyncClient(transport=transport)
+
+    @property
+    def controller(self):
+        return self.control.controller("http://upstream.test")
+
+    async def open_circuit(self, client: httpx.AsyncClient, upstream: Upstream) -> None:
+        upstream.status = 503
+        for _ in range(self.control.breaker_window):
+            await client.get(URL)
+        self.assertEqual(self.controller.state, "open")
+
+    async def test_circuit_opens_after_failures_and_rejects_at_once(self):
+        upstream = Upstream()
+        async with self.client(upstream) as client:
+            await self.open_circuit(client, upstream)
+            calls = upstream.calls
+            with self.assertRaises(UpstreamOverloaded):
+                await client.get(URL)
+        self.assertEqual(upstream.calls, calls)
+        self.assertEqual(self.controller.counters["breaker_opened"], 1)
+        self.assertEqual(self.controller.in_flight, 0)
+
+    async def test_half_open_probe_success_closes_circuit(self):
+        upstream = Upstream()
+        async with self.client(upstream) as client:
+            await self.open_circuit(client, upstream)
+            await asyncio.sleep(self.control.breaker_cooldown)
+            upstream.status = 200
+            upstream.gate = asyncio.Event()
+            probe = asyncio.create_task(client.get(URL))
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.controller.state, "half_open")
+            with self.assertRaises(UpstreamOverloaded):
+                await client.get(URL)  # only one probe at a time
+            upstream.gate.set()
+            self.assertEqual((await probe).status_code, 200)
+            self.assertEqual(self.controller.state, "closed")
+            self.assertEqual((await client.get(URL)).status_code, 200)
+        self.assertEqual(self.controller.in_flight, 0)
+
+    async def test_half_open_probe_failure_opens_circuit_again(self):
+        upstream = Upstream()
+        async with self.client(upstream) as client:
+            await self.open_circuit(client, upstream)
+            await asyncio.sleep(self.control.breaker_cooldown)
+            self.assertEqual((await client.get(URL)).status_code, 503)
+            self.assertEqual(self.controller.state, "open")
+            with self.assertRaises(UpstreamOverloaded):
+                await client.get(URL)
+        self.assertEqual(self.controller.counters["breaker_opened"], 2)
+
+    async def test_cancelled_probe_opens_circuit_again(self):
+        upstream = Upstream()
+        async with self.client(upstream) as client:
+            await self.open_circuit(client, upstream)
+            await asyncio.sleep(self.control.breaker_cooldown)
+            upstream.gate = asyncio.Event()
+            probe = asyncio.create_task(client.get(URL))
+            await asyncio.sleep(0.01)
+            probe.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await probe
+        self.assertEqual(self.controller.state, "open")
+        self.assertEqual(self.controller.in_flight, 0)
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        upstream = Upstream()
+        upstream.gate = asyncio.Event()
+        async with self.client(upstream, initial_limit=1, min_limit=1) as client:
+            first = asyncio.create_task(client.get(URL))
+            await asyncio.sleep(0.01)
+            waiting = asyncio.create_task(client.get(URL))
+            await asyncio.sleep(0.01)
+            self.assertEqual((self.controller.in_flight, self.controller.queued), (1, 1))
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            self.assertEqual((self.controller.in_flight, self.controller.queued), (1, 0))
+            upstream.gate.set()
+            await first
+            self.assertEqual(self.controller.in_flight, 0)
+            self.assertEqual((await client.get(URL)).status_code, 200)
+        self.assertEqual(upstream.calls, 2)
+
+    async def test_waiter_times_out(self):
+        upstream = Upstream()
+        upstream.gate = asyncio.Event()
+        async with self.client(upstream, initial_limit=1, min_limit=1, queue_timeout=0.02) as client:
+            first = asyncio.create_task(client.get(URL))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(UpstreamOverloaded):
+                await client.get(URL)
+            self.assertEqual(self.controller.queued, 0)
+            upstream.gate.set()
+            await first
+        self.assertEqual(self.controller.counters["queue_timeouts"], 1)
+        self.assertEqual(self.controller.in_flight, 0)
+
+    async def test_opening_circuit_fails_waiters(self):
+        upstream = Upstream(status=503)
+        upstream.gate = asyncio.Event()
+        # the first failure cuts the limit to 1.8, so the waiter stays queued until the second opens the circuit
+        async with self.client(upstream, initial_limit=2, min_limit=1, breaker_window=2) as client:
+            failing = [asyncio.create_task(client.get(URL)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            waiting = asyncio.create_task(client.get(URL))
+            await asyncio.sleep(0.01)
+            upstream.gate.set()
+            await asyncio.gather(*failing)
+            with self.assertRaises(UpstreamOverloaded):
+                await waiting
+        self.assertEqual(self.controller.state, "open")
+        self.assertEqual((self.controller.in_flight, self.controller.queued), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Round trips through odata_batch: request encoding, multipart decoding and ODataBatch.read."""
+
+import json
+import re
+import unittest
+
+import httpx
+
+from odata_batch import ODataBatch, ReadOperation, decode_batch, encode_batch
+
+BOUNDARY = "batch_test"
+
+
+class FakeTool:
+    """Stands in for an ODataTool: builds the request OpenAPITool would, path parameters unencoded."""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+
+    async def build_request(self, arguments):
+        params = {name: value for name, value in arguments.items() if name.startswith("$")}
+        return {"method": "GET", "url": self.path.replace("{key}", arguments.get("key", "")), "params": params}
+
+    def parse(self, body):
+        return json.loads(body)
+
+
+def request_lines(body: bytes) -> list[str]:
+    return re.findall(r"^GET (\S+) HTTP/1\.1\r$", body.decode(), re.MULTILINE)
+
+
+def batch_response(parts: list[tuple[int, str]], newline: str = "\r\n", boundary: str = "changeset_x") -> httpx.Response:
+    """multipart/mixed response with one part per (status, body); newline may differ per response."""
+    chunks = []
+    for status, body in parts:
+        chunks.append(newline.join([
+            f"--{boundary}",
+            "Content-Type: application/http",
+            "Content-Transfer-Encoding: binary",
+            "",
+            f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}",
+            "Content-Type: application/json",
+            "",
+            body,
+        ]))
+    text = newline.join(chunks) + f"{newline}--{boundary}--{newline}"
+    return httpx.Response(200, headers={"content-type": f"multipart/mixed; boundary={boundary}"}, text=text)
+
+
+class EncodeDecodeTest(unittest.TestCase):
+    def test_encode_batch_has_one_get_part_per_url(self):
+        body = encode_batch(["A_SalesOrder('1')", "A_SalesOrder?$top=2"], BOUNDARY)
+        self.assertEqual(request_lines(body), ["A_SalesOrder('1')", "A_SalesOrder?$top=2"])
+        self.assertEqual(body.count(f"--{BOUNDARY}\r\n".encode()), 2)
+        self.assertTrue(body.endswith(f"--{BOUNDARY}--\r\n".encode()))
+
+    def test_decode_batch_keeps_part_order_and_error_parts(self):
+        error = json.dumps({"error": {"code": "X/1", "message": {"lang": "en", "value": "Not found"}}})
+        response = batch_response([(200, '{"d": {"id": 1}}'), (404, error), (200, '{"d": {"id": 3}}')])
+        self.assertEqual(decode_batch(response), [(200, '{"d": {"id": 1}}'), (404, error), (200, '{"d": {"id": 3}}')])
+
+    def test_decode_batch_accepts_lf_and_mixed_line_endings(self):
+        parts = [(200, '{"d": {"id": 1}}'), (500, "")]
+        self.assertEqual(decode_batch(batch_response(parts, newline="\n")), parts)
+        mixed = batch_response(parts).text.replace("binary\r\n\r\n", "binary\n\n", 1)
+        response = httpx.Response(200, headers={"content-type": "multipart/mixed; boundary=changeset_x"}, text=mixed)
+        self.assertEqual(decode_batch(response), parts)
+
+    def test_decode_batch_rejects_other_content_types(self):
+        with self.assertRaises(ValueError):
+            decode_batch(httpx.Response(200, json={"d": {}}))
+
+
+class ReadTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.sent: list[str] = []
+
+        def upstream(request: httpx.Request) -> httpx.Response:
+            if request.method == "GET":
+                return httpx.Response(200, headers={"x-csrf-token": "token"})
+            urls = request_lines(request.content)
+            self.sent.extend(urls)
+            parts = []
+            for url in urls:
+                if "missing" in url:
+                    parts.append((404, json.dumps({"error": {"message": {"value": f"{url} not found"}}})))
+                else:
+                    parts.append((200, json.dumps({"d": {"url": url}})))
+            return batch_response(parts, newline="\n" if len(urls) % 2 else "\r\n")
+
+        self.client = httpx.AsyncClient(base_url="http://upstream.test/sap/", transport=httpx.MockTransport(upstream))
+        tools = {"get_order": FakeTool("get_order", "/A_SalesOrder('{key}')"),
+                 "list_orders": FakeTool("list_orders", "/A_SalesOrder")}
+        self.batch = ODataBatch(self.client, tools, batch_size=2)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_results_come_back_in_order_with_errors_per_item(self):
+        results = await self.batch.read([
+            ReadOperation(tool="get_order", arguments={"key": "1"}),
+            ReadOperation(tool="unknown", arguments={}),
+            ReadOperation(tool="get_order", arguments={"key": "missing"}),
+            ReadOperation(tool="list_orders", arguments={"$top": 2, "$filter": "SoldToParty eq 'A B'"}),
+        ])
+        self.assertEqual([result["index"] for result in results], [0, 1, 2, 3])
+        self.assertEqual(results[0]["result"], {"d": {"url": "A_SalesOrder('1')"}})
+        self.assertEqual((results[1]["status"], results[1]["error"]), (None, "Unknown read tool 'unknown'"))
+        self.assertEqual((results[2]["status"], results[2]["error"]), (404, "A_SalesOrder('missing') not found"))
+        self.assertEqual(results[3]["result"], {"d": {"url": "A_SalesOrder?$top=2&$filter=SoldToParty%20eq%20'A%20B'"}})
+
+    async def test_keys_are_percent_encoded_in_the_request_line(self):
+        results = await self.batch.read([
+            ReadOperation(tool="get_order", arguments={"key": "a b#c?d"}),
+            ReadOperation(tool="get_order", arguments={"key": "100%"}),
+        ])
+        self.assertEqual(self.sent, ["A_SalesOrder('a%20b%23c%3Fd')", "A_SalesOrder('100%25')"])
+        self.assertTrue(all(result["status"] == 200 for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Invalidation of response_cache.ResponseCache entries by writes."""
+
+import unittest
+
+import httpx
+
+from response_cache import ResponseCache
+
+SERVICE = "http://upstream.test/sap/API_SALES_ORDER_SRV"
+
+
+class InvalidationTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = 0
+
+        def upstream(request: httpx.Request) -> httpx.Response:
+            self.calls += 1
+            return httpx.Response(200 if request.method == "GET" else 204, json={"call": self.calls})
+
+        self.cache = ResponseCache(ttls={"*": 60})
+        self.client = httpx.AsyncClient(transport=self.cache.layer(httpx.MockTransport(upstream)))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def read_twice(self, url: str) -> bool:
+        """Whether the second read of url was answered from the cache."""
+        first = (await self.client.get(url)).json()
+        return (await self.client.get(url)).json() == first
+
+    async def test_write_drops_reads_of_its_entity_set_only(self):
+        self.assertTrue(await self.read_twice(f"{SERVICE}/A_SalesOrder('1')"))
+        self.assertTrue(await self.read_twice(f"{SERVICE}/A_SalesOrderItem"))
+        await self.client.patch(f"{SERVICE}/A_SalesOrder('1')", json={})
+        self.assertEqual(self.cache.stats()["entity_sets"], {"A_SalesOrderItem": 1})
+
+    async def test_write_to_another_set_drops_navigation_reads(self):
+        navigation = f"{SERVICE}/A_SalesOrder('1')/to_Item"
+        self.assertTrue(await self.read_twice(navigation))
+        await self.client.post(f"{SERVICE}/A_SalesOrderItem", json={})
+        calls = self.calls
+        await self.client.get(navigation)
+        self.assertEqual(self.calls, calls + 1)
+
+    async def test_write_to_another_set_drops_expanded_reads(self):
+        expanded = f"{SERVICE}/A_SalesOrder?$expand=to_Item"
+        self.assertTrue(await self.read_twice(expanded))
+        await self.client.delete(f"{SERVICE}/A_SalesOrderItem(SalesOrder='1',SalesOrderItem='10')")
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    async def test_writes_to_another_service_keep_navigation_reads(self):
+        self.assertTrue(await self.read_twice(f"{SERVICE}/A_SalesOrder('1')/to_Item"))
+        await self.client.post("http://upstream.test/sap/API_PRODUCT_SRV/A_Product", json={})
+        self.assertEqual(self.cache.stats()["entries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
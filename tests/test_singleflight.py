@@ -0,0 +1,101 @@
+"""Coalescing and cancellation of singleflight.SingleFlight."""
+
+import asyncio
+import unittest
+
+import httpx
+
+from singleflight import SingleFlight
+
+URL = "http://upstream.test/A_SalesOrder"
+
+
+def get_key(request: httpx.Request) -> str | None:
+    return str(request.url) if request.method == "GET" else None
+
+
+class Upstream:
+    """Mock upstream whose requests wait for gate; records cancelled calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.gate = asyncio.Event()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return httpx.Response(200, content=f"call {self.calls}".encode())
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.upstream = Upstream()
+        self.flight = SingleFlight(get_key)
+        self.client = httpx.AsyncClient(transport=self.flight.layer(httpx.MockTransport(self.upstream.handle)))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_identical_requests_share_one_call(self):
+        requests = [asyncio.create_task(self.client.get(URL)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        self.upstream.gate.set()
+        responses = await asyncio.gather(*requests)
+        self.assertEqual([response.text for response in responses], ["call 1"] * 3)
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertEqual(self.flight.stats(), {"requests": 3, "upstream_calls": 1, "coalesced": 2,
+                                               "abandoned": 0, "errors": 0, "in_flight": 0})
+
+    async def test_requests_without_key_are_not_coalesced(self):
+        self.upstream.gate.set()
+        await asyncio.gather(*(self.client.post(URL) for _ in range(2)))
+        self.assertEqual(self.upstream.calls, 2)
+        self.assertEqual(self.flight.counters["requests"], 0)
+
+    async def test_cancelled_waiter_leaves_flight_to_others(self):
+        first = asyncio.create_task(self.client.get(URL))
+        second = asyncio.create_task(self.client.get(URL))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.upstream.gate.set()
+        self.assertEqual((await second).text, "call 1")
+        self.assertEqual((self.upstream.calls, self.upstream.cancelled), (1, 0))
+        self.assertEqual(self.flight.counters["abandoned"], 0)
+
+    async def test_last_waiter_cancels_flight(self):
+        requests = [asyncio.create_task(self.client.get(URL)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for request in requests:
+            request.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await request
+        await asyncio.sleep(0)
+        self.assertEqual(self.upstream.cancelled, 1)
+        self.assertEqual(self.flight.stats()["abandoned"], 1)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+        # the next identical request starts a flight of its own
+        self.upstream.gate.set()
+        self.assertEqual((await self.client.get(URL)).text, "call 2")
+
+    async def test_upstream_error_reaches_every_waiter(self):
+        async def refuse(request):
+            await asyncio.sleep(0.01)
+            raise httpx.ConnectError("refused", request=request)
+
+        client = httpx.AsyncClient(transport=self.flight.layer(httpx.MockTransport(refuse)))
+        async with client:
+            results = await asyncio.gather(*(client.get(URL) for _ in range(2)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, httpx.ConnectError) for result in results))
+        self.assertEqual(self.flight.stats()["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""Precomputed, ETag-versioned tools/list responses.
+
+FastMCP answers every tools/list by collecting the tools again (through the
+tool managers of mounted servers and the MCP middleware), converting each one
+to an mcp.types.Tool (pydantic validation of every schema) and serializing
+the result. The tool set of these servers is fixed once they are built, so
+ToolList does that work for the first tools/list only and keeps the result:
+
+* the MCP request handler returns the stored ListToolsResult, on every
+  transport;
+* on a stateless JSON streamable-HTTP app (stateless_http and json_response,
+  as the gateway backends run) an ASGI middleware answers tools/list POSTs
+  with the stored, already serialized bytes, splicing in the JSON-RPC id,
+  and sends an ETag (a hash of those bytes). A request with a matching
+  If-None-Match gets 304 Not Modified and no body.
+
+A tool added or removed after the first listing is only listed after
+invalidate(). The middleware sits inside the HTTP app's own middleware (auth
+included) and passes on every request it does not answer.
+
+    tool_list = ToolList(mcp)
+    app = mcp.http_app(path="/mcp", middleware=tool_list.middleware())
+
+Tuning via environment:
+    TOOL_LIST_CACHE   "false" to list tools the FastMCP way on every request (default true)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any
+
+import mcp.types as types
+from fastmcp import FastMCP
+from mcp.shared.version import SUPPORTED_PROTOCOL_VERSIONS
+from starlette.datastructures import Headers
+from starlette.middleware import Middleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TOOL_LIST_CACHE = os.getenv("TOOL_LIST_CACHE", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class _Listing:
+    result: types.ListToolsResult
+    body: bytes  # the serialized result member of the JSON-RPC response
+    etag: str
+
+
+class ToolList:
+    """The tools/list response of one FastMCP server, built once."""
+
+    def __init__(self, mcp: FastMCP, enabled: bool = TOOL_LIST_CACHE):
+        self.mcp = mcp
+        self.enabled = enabled
+        self._listing: _Listing | None = None
+        self._lock = asyncio.Lock()
+        self.counters = {"built": 0, "served": 0, "not_modified": 0}
+        if enabled:
+            mcp._mcp_server.request_handlers[types.ListToolsRequest] = self._handle
+
+    @property
+    def serves_http(self) -> bool:
+        """Whether the HTTP app answers each POST on its own, so the middleware may answer it."""
+        settings = self.mcp._deprecated_settings
+        return self.enabled and settings.stateless_http and settings.json_response
+
+    def invalidate(self) -> None:
+        self._listing = None
+
+    async def listing(self) -> _Listing:
+        if self._listing is None:
+            async with self._lock:
+                if self._listing is None:
+                    self._listing = await self._build()
+        return self._listing
+
+    async def _build(self) -> _Listing:
+        tools = await self.mcp._list_tools_mcp()
+        # what the low-level server's own handler records to validate tool calls against
+        server = self.mcp._mcp_server
+        server._tool_cache.clear()
+        server._tool_cache.update((tool.name, tool) for tool in tools)
+        result = types.ListToolsResult(tools=tools)
+        body = result.model_dump_json(by_alias=True, exclude_none=True).encode()
+        self.counters["built"] += 1
+        return _Listing(result, body, f'"{hashlib.sha256(body).hexdigest()[:24]}"')
+
+    async def _handle(self, request: types.ListToolsRequest | None) -> types.ServerResult:
+        listing = await self.listing()
+        self.counters["served"] += 1
+        return types.ServerResult(listing.result)
+
+    def middleware(self) -> list[Middleware]:
+        """The ASGI middleware for mcp.http_app / mcp.run(middleware=...)."""
+        return [Middleware(_ToolListMiddleware, tool_list=self)]
+
+    def stats(self) -> dict[str, Any]:
+        listing = self._listing
+        return {
+            "enabled": self.enabled,
+            "tools": len(listing.result.tools) if listing else None,
+            "bytes": len(listing.body) if listing else None,
+            "etag": listing.etag if listing else None,
+            **self.counters,
+        }
+
+
+def _list_request_id(body: bytes) -> int | str | None:
+    """The id of a tools/list JSON-RPC request without a cursor, else None."""
+    if b"tools/list" not in body:
+        return None
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get("method") != "tools/list" or message.get("jsonrpc") != "2.0":
+        return None
+    request_id = message.get("id")
+    if type(request_id) not in (int, str) or (message.get("params") or {}).get("cursor") is not None:
+        return None
+    return request_id
+
+
+class _ToolListMiddleware:
+    def __init__(self, app: ASGIApp, tool_list: ToolList):
+        self.app = app
+        self.tool_list = tool_list
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.tool_list.serves_http:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        version = headers.get("mcp-protocol-version")
+        # the requests the MCP transport would turn away get its own error response
+        if (
+            headers.get("content-type", "").split(";")[0].strip() != "application/json"
+            or not any(media.strip().startswith("application/json") for media in headers.get("accept", "").split(","))
+            or (version is not None and version not in SUPPORTED_PROTOCOL_VERSIONS)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        messages: list[Message] = []
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        request_id = _list_request_id(body)
+        if request_id is None:
+            replay = iter(messages)
+
+            async def replayed() -> Message:
+                return next(replay, None) or await receive()
+
+            await self.app(scope, replayed, send)
+            return
+
+        listing = await self.tool_list.listing()
+        if listing.etag in (tag.strip() for tag in headers.get("if-none-match", "").split(",")):
+            self.tool_list.counters["not_modified"] += 1
+            await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", listing.etag.encode())]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        self.tool_list.counters["served"] += 1
+        content = b'{"jsonrpc":"2.0","id":%s,"result":%s}' % (json.dumps(request_id).encode(), listing.body)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(content)).encode()),
+                (b"etag", listing.etag.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": content})
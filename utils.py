@@ -1,6 +1,7 @@
 import re
 from typing import Any
 from fastmcp.server.openapi import OpenAPITool
+from fastmcp.utilities.openapi import HTTPRoute
 from fastmcp.tools.tool_transform import ArgTransformConfig, ToolTransformConfig
 from fastmcp import FastMCP
 
@@ -17,8 +18,11 @@ def get_arg_transform_config(parameters: dict[str, Any]) -> dict[str, ArgTransfo
             transform_args[key] = ArgTransformConfig(description=remove_links(description))
     return transform_args
 
+def get_route_tags(route: HTTPRoute) -> set[str]:
+    return set([route.method, route.path[1:]])
+
 def get_tags(tool: OpenAPITool) -> set[str]:
-    return set([tool._route.method, tool._route.path[1:]])
+    return get_route_tags(tool._route)
 
 def get_tool_transform_config(tool: OpenAPITool) -> ToolTransformConfig:
     return ToolTransformConfig(description=remove_links(tool.description), arguments=get_arg_transform_config(tool.parameters), tags=get_tags(tool))
@@ -26,4 +30,33 @@ def get_tool_transform_config(tool: OpenAPITool) -> ToolTransformConfig:
 async def perform_tool_transformation(mcp_server: FastMCP) -> None:
     for tool_name in await mcp_server.get_tools():
         tool = await mcp_server.get_tool(tool_name)
-        mcp_server.add_tool_transformation(tool_name, get_tool_transform_config(tool))
\ No newline at end of file
+        # only the generated tools have a route (not fetch_results, the $batch tool, ...)
+        if isinstance(tool, OpenAPITool):
+            mcp_server.add_tool_transformation(tool_name, get_tool_transform_config(tool))
+
+def transform_catalog_entry(entry: dict[str, Any]) -> dict[str, Any]:
+    # get_tool_transform_config applied to a compiled catalog entry, once at build time
+    # (catalog.load_catalog(transform=...)) instead of wrapping every tool at runtime
+    properties = {
+        key: {**value, "description": remove_links(value["description"])} if value.get("description") else value
+        for key, value in entry["parameters"]["properties"].items()
+    }
+    return {
+        **entry,
+        "description": remove_links(entry["description"]),
+        "parameters": {**entry["parameters"], "properties": properties},
+        "tags": get_route_tags(entry["route"]),
+    }
+
+def ensure_operation_ids(spec: dict[str, Any]) -> dict[str, Any]:
+    # SAP specs ship without operationIds; derive one from method and path
+    for path, methods in spec.get("paths", {}).items():
+        for method, op in methods.items():
+            # skip if it's not an HTTP method definition
+            if not isinstance(op, dict):
+                continue
+
+            if "operationId" not in op:
+                clean_path = path.strip("/").replace("/", "_").replace("{", "").replace("}", "")
+                op["operationId"] = f"{method}_{clean_path or 'root'}"
+    return spec